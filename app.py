@@ -1,7 +1,14 @@
 import streamlit as st
+import html
 import os
 from datetime import datetime
 
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.memory_governor import govern_session
+from utils.tab_finder import get_tab_finder
+from utils.user_store import LINK_WARNING, get_user_store, session_user_id
+
 # Configure page
 st.set_page_config(
     page_title="Guitar Tab Finder AI",
@@ -9,6 +16,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Lets the memory governor account for this session's state and evict it when idle
+govern_session(get_script_run_ctx())
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -41,13 +51,26 @@ st.markdown("""
 # Initialize session state
 if "search_history" not in st.session_state:
     st.session_state.search_history = []
+
+# One TabFinder for every session, so a search warms the cache for everyone
+tab_finder = get_tab_finder()
+
+TAB_SOURCES = {"All Sources": "all", "Ultimate Guitar": "ultimate_guitar",
+               "Chordify": "chordify", "Tab Provider": "tab_provider"}
+DIFFICULTY_CLASSES = {"Beginner": "difficulty-easy", "Intermediate": "difficulty-medium",
+                      "Advanced": "difficulty-hard"}
+
+# Saved data is loaded from the user store on first access and written back item by item
+user_store = get_user_store()
+user_id = session_user_id(st.session_state, st.query_params)
 if "saved_tabs" not in st.session_state:
-    st.session_state.saved_tabs = []
+    st.session_state.saved_tabs = user_store.load_list(user_id, "saved_tabs")
 
 # Sidebar configuration
 with st.sidebar:
     st.image("https://cdn-icons-png.flaticon.com/512/1384/1384060.png", width=100)
     st.header("🎸 Controls")
+    st.caption(LINK_WARNING)
     
     st.markdown("---")
     st.subheader("Search Preferences")
@@ -100,66 +123,63 @@ with col2:
 
 # Search logic
 if search_button and user_query:
-    with st.spinner(f"🤖 Searching for tabs for '{user_query}'..."):
-        st.session_state.search_history.append({
-            "query": user_query,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
-        
-        # Placeholder for AI integration
-        st.success(f"✅ Found results for: {user_query}")
-        
-        # Display sample results (placeholder)
-        st.subheader(f"Results for '{user_query}'")
-        
-        tabs = st.tabs(["📊 Results", "📝 Details", "💾 Save"])
-        
-        with tabs[0]:
-            # Sample result cards
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown(f"""
-                <div class="tab-card">
-                    <h3>Wonderwall - Oasis</h3>
-                    <p><strong>Type:</strong> Chords</p>
-                    <p><strong>Difficulty:</strong> <span class="difficulty-easy">Beginner</span></p>
-                    <p><strong>Rating:</strong> ⭐⭐⭐⭐⭐ (4.8/5)</p>
-                    <p><strong>Source:</strong> Ultimate Guitar</p>
-                    <p><strong>Key:</strong> Em7 | Capo: 2nd fret</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if st.button("View Full Tab", key="tab1"):
-                    st.info("Tab preview would load here with chords and lyrics")
-            
-            with col2:
+    st.session_state.search_history.append({
+        "query": user_query,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+    # Kept so the results stay up while their buttons rerun the page
+    st.session_state.tab_query = user_query
+
+tab_query = st.session_state.get("tab_query")
+if tab_query:
+    with st.spinner(f"🤖 Searching for tabs for '{tab_query}'..."):
+        # Served from the process-wide cache when any session has searched this before
+        results = tab_finder.search_tabs(tab_query, TAB_SOURCES[tab_source])
+    results = [r for r in results if r["difficulty"] in difficulty]
+    
+    if results:
+        st.success(f"✅ Found {len(results)} results for: {tab_query}")
+    else:
+        st.warning(f"No tabs found for '{tab_query}' with the selected difficulty.")
+    
+    st.subheader(f"Results for '{tab_query}'")
+    
+    tabs = st.tabs(["📊 Results", "📝 Details", "💾 Save"])
+    
+    with tabs[0]:
+        cols = st.columns(2)
+        for i, result in enumerate(results):
+            with cols[i % 2]:
+                title = f"{result['song']} - {result['artist']}" if result["artist"] else result["song"]
                 st.markdown(f"""
                 <div class="tab-card">
-                    <h3>Wonderwall - Oasis</h3>
-                    <p><strong>Type:</strong> Full Tabs</p>
-                    <p><strong>Difficulty:</strong> <span class="difficulty-medium">Intermediate</span></p>
-                    <p><strong>Rating:</strong> ⭐⭐⭐⭐ (4.5/5)</p>
-                    <p><strong>Source:</strong> Tab Provider</p>
-                    <p><strong>Key:</strong> Em7 | Capo: 2nd fret</p>
+                    <h3>{html.escape(title)}</h3>
+                    <p><strong>Type:</strong> {result['type']}</p>
+                    <p><strong>Difficulty:</strong> <span class="{DIFFICULTY_CLASSES.get(result['difficulty'], '')}">{result['difficulty']}</span></p>
+                    <p><strong>Rating:</strong> {'⭐' * round(result['rating'])} ({result['rating']}/5, {result['votes']} votes)</p>
+                    <p><strong>Source:</strong> {result['source']}</p>
+                    <p><strong>Key:</strong> {result['key']} | Capo: {result['capo']}</p>
                 </div>
                 """, unsafe_allow_html=True)
                 
-                if st.button("View Full Tab", key="tab2"):
-                    st.info("Tab preview would load here with detailed fingering")
-        
-        with tabs[1]:
-            st.write("**Song Information:**")
-            st.write("- Artist: Oasis")
-            st.write("- Album: (What's the Story) Morning Glory?")
-            st.write("- Year: 1994")
-            st.write("- BPM: 86")
-            st.write("- Original Key: Em7")
-        
-        with tabs[2]:
-            if st.button("💾 Save to My Collection"):
-                st.session_state.saved_tabs.append(user_query)
-                st.success("✅ Tab saved!")
+                if st.button("View Full Tab", key=f"tab{result['id']}"):
+                    st.code(result["preview"], language=None)
+    
+    with tabs[1]:
+        if results:
+            details = tab_finder.get_tab_details(results[0]["id"])
+            st.write("**Tab Information:**")
+            st.write(f"- Chords: {', '.join(details['chords'])}")
+            st.write(f"- Tuning: {details['tuning']}")
+            st.write(f"- BPM: {details['bpm']}")
+            st.write(f"- Time Signature: {details['time_signature']}")
+    
+    with tabs[2]:
+        if st.button("💾 Save to My Collection"):
+            if tab_query not in st.session_state.saved_tabs:
+                st.session_state.saved_tabs.append(tab_query)
+                user_store.put(user_id, "saved_tabs", tab_query, tab_query)
+            st.success("✅ Tab saved!")
 
 # Display search history
 if st.session_state.search_history:
@@ -179,6 +199,7 @@ if st.session_state.saved_tabs:
             with col2:
                 if st.button("✕", key=f"remove_{tab}"):
                     st.session_state.saved_tabs.remove(tab)
+                    user_store.delete(user_id, "saved_tabs", tab)
                     st.rerun()
 
 # Info section
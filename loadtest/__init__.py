@@ -0,0 +1,3 @@
+"""
+Load testing tools: a local fake OpenAI server and a session load generator
+"""
@@ -0,0 +1,294 @@
+"""
+Fake OpenAI Server
+Local OpenAI-compatible endpoint with configurable latency, streaming, errors and rate limits
+
+Run standalone:
+    python -m loadtest.fake_openai_server --port 8765 --latency lognormal:800,0.5 --error-rate 0.02 --rpm 600
+
+Then point the app at it:
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+CANNED_ANSWER = (
+    "🎸 Here's a practical answer from the fake server. Start slowly with a metronome at 60 BPM, "
+    "focus on clean fretting, and practice the hardest chord change for five minutes a day. "
+    "Increase the tempo by 5 BPM once it feels comfortable."
+)
+
+
+def parse_latency(spec: str):
+    """
+    Build a latency sampler (seconds) from a spec string
+
+    Formats (values in milliseconds):
+        fixed:500
+        uniform:200,1200
+        normal:800,150
+        lognormal:800,0.5     (median, sigma)
+        bimodal:300,4000,0.1  (fast, slow, share of slow calls)
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    if kind == "bimodal":
+        return lambda: (values[1] if random.random() < values[2] else values[0]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class RateLimiter:
+    """Requests- and tokens-per-minute budgets, refilled continuously"""
+
+    def __init__(self, rpm: Optional[float], tpm: Optional[float]):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = rpm or 0.0
+        self.tokens = tpm or 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> Optional[float]:
+        """Take budget for a request; returns seconds to wait if over the limit"""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.updated
+            self.updated = now
+            if self.rpm:
+                self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+            if self.tpm:
+                self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+            if self.rpm and self.requests < 1:
+                return (1 - self.requests) * 60 / self.rpm
+            if self.tpm and self.tokens < tokens:
+                return (tokens - self.tokens) * 60 / self.tpm
+            if self.rpm:
+                self.requests -= 1
+            if self.tpm:
+                self.tokens -= tokens
+            return None
+
+
+class FakeOpenAIConfig:
+    """Behaviour of the fake server"""
+
+    def __init__(self, latency: str = "lognormal:600,0.4", error_rate: float = 0.0,
+                 rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 tokens_per_second: float = 200.0, completion_tokens: int = 120):
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limiter = RateLimiter(rpm, tpm)
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.stats = {"requests": 0, "completed": 0, "streamed": 0, "errors": 0, "rate_limited": 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+
+def example_from_schema(schema: Dict, words):
+    """Deterministic instance of a JSON schema, for structured-output requests"""
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: example_from_schema(sub, words) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {}), words) for _ in range(3)]
+    if kind == "integer":
+        return random.randint(1, 5)
+    if kind == "number":
+        return round(random.uniform(1, 5), 2)
+    if kind == "boolean":
+        return True
+    return " ".join(random.sample(words, min(len(words), 6)))
+
+
+def _estimate_prompt_tokens(body: Dict) -> int:
+    text = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Serves /v1/chat/completions, /v1/models and /stats"""
+
+    config: FakeOpenAIConfig = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "gpt-3.5-turbo", "object": "model", "owned_by": "fake"},
+                {"id": "gpt-4o-mini", "object": "model", "owned_by": "fake"},
+            ]})
+        elif self.path.rstrip("/") == "/stats":
+            with self.config.stats_lock:
+                self._send_json(200, dict(self.config.stats))
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        config = self.config
+        config.count("requests")
+
+        prompt_tokens = _estimate_prompt_tokens(body)
+        completion_tokens = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+
+        wait = config.rate_limiter.acquire(prompt_tokens + completion_tokens)
+        if wait is not None:
+            config.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                            {"Retry-After": f"{wait:.2f}"})
+            return
+
+        if random.random() < config.error_rate:
+            config.count("errors")
+            time.sleep(config.sample_latency() / 4)
+            self._send_json(random.choice([500, 503]), {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+
+        model = body.get("model", "gpt-3.5-turbo")
+        words = (CANNED_ANSWER + " ") * (completion_tokens // len(CANNED_ANSWER.split()) + 1)
+        words = words.split()[:completion_tokens]
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            words = json.dumps(example_from_schema(response_format["json_schema"]["schema"], words)).split(" ")
+        time.sleep(config.sample_latency())
+
+        if body.get("stream"):
+            self._stream(model, words, prompt_tokens)
+            return
+
+        config.count("completed")
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": " ".join(words)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                      "total_tokens": prompt_tokens + len(words)},
+        })
+
+    def _stream(self, model: str, words, prompt_tokens: int):
+        """Server-sent events, one token per chunk at `tokens_per_second`"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+
+        def send(payload):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        base = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        try:
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                send({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                if delay:
+                    time.sleep(delay)
+            send({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                  "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                            "total_tokens": prompt_tokens + len(words)}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.config.count("streamed")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_server(config: FakeOpenAIConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the fake server on a background thread
+
+    Returns:
+        The running server; its base URL is f"http://{host}:{server.server_port}/v1"
+    """
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local fake OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:600,0.4",
+                        help="fixed:MS | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA | bimodal:FAST,SLOW,P")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500/503")
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute before 429s")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute before 429s")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Streaming speed")
+    parser.add_argument("--completion-tokens", type=int, default=120)
+    return parser
+
+
+def config_from_args(args) -> FakeOpenAIConfig:
+    return FakeOpenAIConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+    )
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    server = start_server(config_from_args(args), args.host, args.port)
+    print(f"Fake OpenAI server on http://{args.host}:{server.server_port}/v1 (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,226 @@
+"""
+Load Generator
+Drives many concurrent simulated Streamlit sessions through AITabAdvisor
+
+Fully offline: by default a fake OpenAI server is started in-process.
+    python -m loadtest.load_generator --sessions 50 --duration 30 --latency lognormal:800,0.5
+    python -m loadtest.load_generator --base-url http://127.0.0.1:8765/v1 --sessions 100
+
+Scheduler check - batch plans saturating a 120 RPM quota while chat stays fast:
+    python -m loadtest.load_generator --client-rpm 120 --mix chat=0.3,generate_practice_plan=0.7
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Allow running from a checkout without installing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest.fake_openai_server import build_arg_parser, config_from_args, start_server
+
+QUERY_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "utils", "data", "sample_query_log.jsonl")
+
+TECHNIQUES = ["Barre Chord", "Fingerpicking", "Vibrato", "Tapping", "Sweep Picking", "Harmonics", "Hybrid Picking"]
+
+SONG_SHEET = """[Verse]
+Em7          G            Dsus4        A7sus4
+Today is gonna be the day that they're gonna throw it back to you
+Em7          G            Dsus4        A7sus4
+By now you should've somehow realized what you gotta do
+[Chorus]
+Cadd9        Dsus4        Em7
+And all the roads we have to walk are winding
+F            C/E          Bm7b5        E7
+"""
+
+# Share of each operation in a simulated session
+DEFAULT_MIX = {"chat": 0.55, "explain_technique": 0.2, "analyze_song_chords": 0.15, "generate_practice_plan": 0.1}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """"chat=0.5,generate_practice_plan=0.5" -> {"chat": 0.5, ...}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def load_queries() -> List[str]:
+    with open(QUERY_LOG, encoding="utf-8") as f:
+        return [json.loads(line)["query"] for line in f if line.strip()]
+
+
+class SessionSimulator(threading.Thread):
+    """One simulated browser session with its own AITabAdvisor (as in st.session_state)"""
+
+    def __init__(self, session_id: int, advisor_factory, deadline: float, think_time: float,
+                 mix: Dict[str, float], queries: List[str], results: List[Dict], lock: threading.Lock):
+        super().__init__(name=f"session-{session_id}", daemon=True)
+        self.session_id = session_id
+        self.advisor_factory = advisor_factory
+        self.deadline = deadline
+        self.think_time = think_time
+        self.mix = mix
+        self.queries = queries
+        self.results = results
+        self.lock = lock
+        self.rng = random.Random(session_id)
+
+    def run(self):
+        advisor = self.advisor_factory()
+        history = []
+        operations, weights = zip(*self.mix.items())
+        while time.time() < self.deadline:
+            operation = self.rng.choices(operations, weights)[0]
+            start = time.perf_counter()
+            error = None
+            try:
+                if operation == "chat":
+                    message = self.rng.choice(self.queries)
+                    response = advisor.chat(message, history=history[-20:])
+                    history += [{"role": "user", "content": message},
+                                {"role": "assistant", "content": response}]
+                elif operation == "explain_technique":
+                    advisor.explain_technique(self.rng.choice(TECHNIQUES))
+                elif operation == "generate_practice_plan":
+                    advisor.generate_practice_plan(f"Song {self.rng.randint(1, 500)}", "Artist",
+                                                   "Beginner", "Intermediate", self.rng.randint(1, 10),
+                                                   enrich=True)
+                else:
+                    advisor.analyze_song_chords(SONG_SHEET, "Load Test Song")
+            except Exception as e:
+                error = str(e)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.results.append({"operation": operation, "ms": elapsed_ms, "error": error,
+                                     "session": self.session_id})
+            if self.think_time:
+                time.sleep(self.rng.expovariate(1 / self.think_time))
+
+
+def summarize(results: List[Dict], duration: float) -> Dict:
+    """Throughput and latency percentiles per operation"""
+    report = {"duration_s": round(duration, 2), "requests": len(results),
+              "throughput_rps": round(len(results) / duration, 2) if duration else 0.0,
+              "operations": {}}
+    by_operation = {}
+    for result in results:
+        by_operation.setdefault(result["operation"], []).append(result)
+    for operation, items in sorted(by_operation.items()):
+        ms = np.array([r["ms"] for r in items])
+        report["operations"][operation] = {
+            "requests": len(items),
+            "throughput_rps": round(len(items) / duration, 2) if duration else 0.0,
+            "errors": sum(1 for r in items if r["error"]),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p90_ms": round(float(np.percentile(ms, 90)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1),
+            "max_ms": round(float(ms.max()), 1),
+        }
+    return report
+
+
+def run_load_test(sessions: int = 20, duration: float = 20.0, think_time: float = 0.5,
+                  base_url: str = None, server_config=None, hedge_budget: float = None,
+                  mix: Dict[str, float] = None, client_rpm: float = None,
+                  client_tpm: float = None) -> Dict:
+    """
+    Run a load test and return the report
+
+    Args:
+        sessions: Number of concurrent simulated sessions
+        duration: Seconds to run
+        think_time: Mean pause between a session's requests (exponential)
+        base_url: Existing OpenAI-compatible endpoint; a fake server is started when omitted
+        server_config: FakeOpenAIConfig for the in-process server
+        hedge_budget: Passed to AITabAdvisor (None keeps its default)
+        mix: Operation weights, defaults to DEFAULT_MIX
+        client_rpm: Scheduler requests-per-minute budget (AI_RATE_LIMIT_RPM)
+        client_tpm: Scheduler tokens-per-minute budget (AI_RATE_LIMIT_TPM)
+    """
+    server = None
+    if base_url is None:
+        server = start_server(server_config or config_from_args(build_arg_parser().parse_args([])), port=0)
+        base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    # AITabAdvisor picks these up when it creates its OpenAI client
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "fake-key"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    # Read when the process-wide scheduler is first created
+    if client_rpm:
+        os.environ["AI_RATE_LIMIT_RPM"] = str(client_rpm)
+    if client_tpm:
+        os.environ["AI_RATE_LIMIT_TPM"] = str(client_tpm)
+
+    from utils.ai_advisor import AITabAdvisor
+    from utils.scheduler import get_scheduler
+    from utils.telemetry import telemetry
+    telemetry.reset()
+
+    def advisor_factory():
+        return AITabAdvisor(hedge_budget=hedge_budget)
+
+    results, lock = [], threading.Lock()
+    queries = load_queries()
+    start = time.time()
+    deadline = start + duration
+    threads = [SessionSimulator(i, advisor_factory, deadline, think_time, mix or DEFAULT_MIX,
+                                queries, results, lock) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    report = summarize(results, elapsed)
+    report["sessions"] = sessions
+    report["advisor_paths"] = telemetry.summary("path")
+    report["advisor_routes"] = telemetry.summary("route")
+    report["scheduler"] = get_scheduler().snapshot()
+    if server is not None:
+        report["fake_server"] = dict(server.RequestHandlerClass.config.stats)
+        server.shutdown()
+    return report
+
+
+if __name__ == "__main__":
+    parser = build_arg_parser()
+    parser.description = "Load-test AITabAdvisor against a local fake OpenAI server"
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--think-time", type=float, default=0.5)
+    parser.add_argument("--base-url", default=None, help="Use a running endpoint instead of the in-process fake")
+    parser.add_argument("--hedge-budget", type=float, default=None)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="e.g. chat=0.5,generate_practice_plan=0.5")
+    parser.add_argument("--client-rpm", type=float, default=None, help="Scheduler requests-per-minute budget")
+    parser.add_argument("--client-tpm", type=float, default=None, help="Scheduler tokens-per-minute budget")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = run_load_test(
+        sessions=args.sessions,
+        duration=args.duration,
+        think_time=args.think_time,
+        base_url=args.base_url,
+        server_config=config_from_args(args),
+        hedge_budget=args.hedge_budget,
+        mix=args.mix,
+        client_rpm=args.client_rpm,
+        client_tpm=args.client_tpm,
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
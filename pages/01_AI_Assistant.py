@@ -4,16 +4,28 @@ Advanced chat interface for guitar-related questions and recommendations
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.memory_governor import govern_session
 from utils.ai_advisor import AITabAdvisor
+from utils.user_store import get_user_store, session_user_id
 
 st.set_page_config(page_title="AI Assistant", layout="wide")
 
+# Lets the memory governor account for this session's state and evict it when idle
+govern_session(get_script_run_ctx())
+
+# Messages shown per page of chat history
+CHAT_PAGE_SIZE = 20
+# Messages kept in session memory; past the limit the oldest are summarized away down to CHAT_MEMORY_KEEP
+CHAT_MEMORY_MESSAGES = 60
+CHAT_MEMORY_KEEP = 40
+
 st.title("🤖 AI Guitar Assistant")
 st.write("Ask me anything about guitar tabs, techniques, and learning strategies!")
 
@@ -29,12 +41,29 @@ if st.session_state.ai_advisor.is_configured():
 st.subheader("💬 Chat")
 chat_container = st.container()
 
-# Display conversation history
+# Display conversation history: only the latest CHAT_PAGE_SIZE messages, with paging back.
+# The chat is kept for this browser session only: the ?user= link is the only thing guarding saved
+# data, so conversations are not written to the user store until there are real accounts.
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
-
-for message in st.session_state.chat_history:
-    with chat_container:
+    # Drop conversations saved by earlier versions
+    user_store = get_user_store()
+    user_id = session_user_id(st.session_state, st.query_params)
+    for key in user_store.keys(user_id, "chat_history"):
+        user_store.delete(user_id, "chat_history", key)
+if "chat_window" not in st.session_state:
+    st.session_state.chat_window = CHAT_PAGE_SIZE
+
+total_messages = len(st.session_state.chat_history)
+
+with chat_container:
+    if total_messages > st.session_state.chat_window:
+        earlier = total_messages - st.session_state.chat_window
+        if st.button(f"⬆️ Load earlier messages ({earlier} more)", key="load_earlier"):
+            st.session_state.chat_window += CHAT_PAGE_SIZE
+    
+    first = max(0, total_messages - st.session_state.chat_window)
+    for message in st.session_state.chat_history[first:]:
         if message["role"] == "user":
             st.chat_message("user").write(message["content"])
         else:
@@ -46,13 +75,30 @@ user_input = st.chat_input("Ask me about guitar tabs, techniques, or learning...
 if user_input:
     # Display user message
     st.chat_message("user").write(user_input)
+    history = list(st.session_state.chat_history)
     st.session_state.chat_history.append({"role": "user", "content": user_input})
+    # Sending a message jumps back to the latest page
+    st.session_state.chat_window = CHAT_PAGE_SIZE
+    
+    # Get AI response (earlier turns are packed into a token budget)
+    # Stream the answer as it arrives (identical questions from other sessions share one request)
+    with st.chat_message("assistant"):
+        response = st.write_stream(st.session_state.ai_advisor.chat_stream(user_input, history=history))
+    st.session_state.chat_history.append({"role": "assistant", "content": response})
+    
+    # Archive older turns out of session memory (the context summary keeps their gist)
+    if len(st.session_state.chat_history) > CHAT_MEMORY_MESSAGES:
+        drop = len(st.session_state.chat_history) - CHAT_MEMORY_KEEP
+        st.session_state.ai_advisor.context.archive(st.session_state.chat_history, drop)
+        st.session_state.chat_history = st.session_state.chat_history[drop:]
     
-    # Get AI response
-    with st.spinner("🤔 Thinking..."):
-        response = st.session_state.ai_advisor.chat(user_input)
-        st.chat_message("assistant").write(response)
-        st.session_state.chat_history.append({"role": "assistant", "content": response})
+    context_stats = st.session_state.ai_advisor.context.last_stats
+    if history and context_stats:
+        st.caption(
+            f"🧠 Context: {context_stats['prompt_tokens']} prompt tokens sent "
+            f"({context_stats['tokens_saved']} saved by summarizing "
+            f"{context_stats['turns_summarized']} earlier messages)"
+        )
 
 # Quick action buttons
 st.markdown("---")
@@ -4,18 +4,28 @@ Personal collection of saved tabs and learning progress
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.memory_governor import govern_session
+from utils.user_store import get_user_store, session_user_id
 
 st.set_page_config(page_title="My Library", layout="wide")
 
+# Lets the memory governor account for this session's state and evict it when idle
+govern_session(get_script_run_ctx())
+
 st.title("📚 My Tab Library")
 
-# Initialize library in session state
+# Initialize library in session state (loaded from the user store on first access)
+user_store = get_user_store()
+user_id = session_user_id(st.session_state, st.query_params)
 if "library" not in st.session_state:
-    st.session_state.library = {
-        "favorites": [],
-        "learning": [],
-        "mastered": []
-    }
+    st.session_state.library = user_store.load_library(user_id)
 
 # Tabs for different collections
 tab1, tab2, tab3, tab4 = st.tabs(["⭐ Favorites", "🎓 Currently Learning", "✅ Mastered", "📊 Stats"])
@@ -33,6 +43,7 @@ with tab1:
             with col3:
                 if st.button("✕", key=f"remove_fav_{idx}"):
                     st.session_state.library["favorites"].pop(idx)
+                    user_store.delete(user_id, "library/favorites", tab)
                     st.rerun()
     else:
         st.info("No favorites yet. Start by searching for songs and adding them here!")
@@ -47,6 +58,7 @@ with tab2:
         if st.button("➕ Add", use_container_width=True):
             if new_song and new_song not in st.session_state.library["learning"]:
                 st.session_state.library["learning"].append(new_song)
+                user_store.put(user_id, "library/learning", new_song, new_song)
                 st.success("Added to learning list!")
                 st.rerun()
     
@@ -61,11 +73,14 @@ with tab2:
                 if st.button("✓", key=f"master_{idx}"):
                     st.session_state.library["mastered"].append(song)
                     st.session_state.library["learning"].pop(idx)
+                    user_store.put(user_id, "library/mastered", song, song)
+                    user_store.delete(user_id, "library/learning", song)
                     st.success("Moved to Mastered!")
                     st.rerun()
             with col4:
                 if st.button("✕", key=f"remove_learn_{idx}"):
                     st.session_state.library["learning"].pop(idx)
+                    user_store.delete(user_id, "library/learning", song)
                     st.rerun()
     else:
         st.info("No songs in your learning list yet.")
@@ -80,6 +95,7 @@ with tab3:
             with col2:
                 if st.button("Unmaster", key=f"unmaster_{idx}"):
                     st.session_state.library["mastered"].pop(idx)
+                    user_store.delete(user_id, "library/mastered", song)
                     st.rerun()
     else:
         st.info("Master a song to see it here!")
@@ -4,12 +4,18 @@ Tutorials, tips, and structured learning paths
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.memory_governor import govern_session
+from utils.local_planner import plan_segment, plan_learning_path
+from utils.practice_plans import (LEVELS, compose_learning_path, compose_practice_plan, render_learning_path,
+                                  render_practice_plan, split_song)
+
 try:
     from utils.ai_advisor import AITabAdvisor
     HAS_AI = True
@@ -19,6 +25,9 @@ except:
 
 st.set_page_config(page_title="Learning Hub", layout="wide")
 
+# Lets the memory governor account for this session's state and evict it when idle
+govern_session(get_script_run_ctx())
+
 st.title("📖 Guitar Learning Hub")
 
 # Initialize AI advisor
@@ -98,44 +107,29 @@ with tab3:
     
     hours_per_week = st.slider("Hours Available Per Week", 1, 20, 5)
     
+    enrich_plan = st.checkbox("✨ Enrich with AI exercises", value=False, key="enrich_plan",
+                              disabled=not (advisor and advisor.is_configured()),
+                              help="Adds OpenAI suggestions to the local plan (requires an API key)")
+    
     if st.button("Generate Practice Plan"):
         if not song_name or not artist_name:
             st.warning("Please enter a song name and artist!")
         else:
-            if advisor and advisor.is_configured():
-                with st.spinner("Creating your personalized plan..."):
-                    plan_text = advisor.generate_practice_plan(
-                        song_name, artist_name, current_level, goal_level, hours_per_week
+            with st.spinner("Creating your personalized plan..."):
+                if advisor:
+                    plan = advisor.build_practice_plan(
+                        song_name, artist_name, current_level, goal_level, hours_per_week, enrich=enrich_plan
                     )
-                    st.success("✅ Practice Plan Generated!")
-                    st.write(plan_text)
-            else:
-                st.success("✅ Practice Plan Generated!")
-                st.write(f"""
-                **4-Week Practice Plan for "{song_name}" by {artist_name}**
-                
-                **Week 1: Learn basic chord shapes**
-                - Daily practice: 30 minutes
-                - Focus: Chord transitions
-                - Exercises: Finger strength building
-                
-                **Week 2: Practice chord changes with rhythm**
-                - Daily practice: 40 minutes
-                - Focus: Metronome practice
-                - Exercises: Strumming patterns
-                
-                **Week 3: Full song playthrough**
-                - Daily practice: 45 minutes
-                - Focus: Tempo increase
-                - Exercises: Endurance building
-                
-                **Week 4: Master and perform**
-                - Daily practice: 50 minutes
-                - Focus: Dynamics and expression
-                - Exercises: Performance practice
-                
-                *To get AI-customized plans based on your specific goals, add your OpenAI API key in Settings!*
-                """)
+                else:
+                    # Plans are local, so they work without the AI advisor
+                    plan = compose_practice_plan(
+                        plan_segment(song_name, artist_name, current_level, goal_level, hours_per_week),
+                        current_level, goal_level, hours_per_week
+                    )
+            st.success("✅ Practice Plan Generated!")
+            st.markdown(render_practice_plan(plan))
+            if not (advisor and advisor.is_configured()):
+                st.caption("*Add your OpenAI API key in Settings to enrich plans with AI suggestions.*")
 
 with tab4:
     st.subheader("🎯 Learning Paths")
@@ -151,33 +145,35 @@ with tab4:
         ]
     )
     
+    col1, col2 = st.columns(2)
+    with col1:
+        path_level = st.selectbox("Current Level", LEVELS, key="path_level")
+    with col2:
+        path_hours = st.slider("Hours Available Per Week", 1, 20, 5, key="path_hours")
+    enrich_path = st.checkbox("✨ Enrich with AI exercises", value=False, key="enrich_path",
+                              disabled=not (advisor and advisor.is_configured()))
+    
     if learning_goal and st.button("Create Learning Path"):
-        if advisor and advisor.is_configured():
-            with st.spinner("Building your learning path..."):
-                path_text = advisor.get_learning_path(learning_goal)
-                st.write(path_text)
-        else:
-            with st.spinner("Building your learning path..."):
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Estimated Duration", "8-12 weeks")
-                with col2:
-                    st.metric("Skills Needed", "3")
-                with col3:
-                    st.metric("Recommended Songs", len(learning_goal))
-                
-                st.write("**Prerequisites:**")
-                st.write("- Basic open chords (Am, C, G, D, E)")
-                st.write("- Basic rhythm and timing")
-                st.write("- Finger dexterity exercises")
-                
-                st.write("**Your Learning Path:**")
-                for idx, song in enumerate(learning_goal, 1):
-                    st.write(f"{idx}. {song}")
-                
-                st.write("**Key Milestones:**")
-                st.checkbox("Learn first song")
-                st.checkbox("Improve timing")
-                st.checkbox("Add dynamics")
-                
-                st.info("*For a personalized learning path, add your OpenAI API key in Settings!*")
+        with st.spinner("Building your learning path..."):
+            goal = LEVELS[min(len(LEVELS) - 1, LEVELS.index(path_level) + 1)]
+            if advisor:
+                path = advisor.build_learning_path(learning_goal, path_level, goal, path_hours, enrich=enrich_path)
+            else:
+                path = compose_learning_path(
+                    plan_learning_path([split_song(s) for s in learning_goal], path_level, goal, path_hours),
+                    path_hours
+                )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Estimated Duration", f"{path['estimated_weeks']} weeks")
+        with col2:
+            st.metric("Skills Needed", len(path["prerequisites"]))
+        with col3:
+            st.metric("Recommended Songs", len(path["songs"]))
+        st.markdown(render_learning_path(path))
+        if advisor and enrich_path:
+            st.caption(f"{path['cached']} of {len(path['songs'])} songs reused from earlier AI plans")
+        
+        st.write("**Key Milestones:**")
+        for segment in path["songs"]:
+            st.checkbox(f"Learn {segment['song']}", key=f"milestone_{segment['song']}")
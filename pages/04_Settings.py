@@ -4,34 +4,70 @@ User configuration and API setup
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import sys
 import os
 
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.memory_governor import DERIVED_KEYS, govern_session, get_memory_governor, measure_state
+from utils.telemetry import telemetry
+from utils.scheduler import get_scheduler
+from utils.user_store import LINK_WARNING, get_user_store, session_user_id
+from utils.tab_finder import get_tab_finder
+from utils.semantic_cache import get_semantic_cache
+from utils.practice_plans import get_segment_cache
+from utils.chord_diagrams import cache_info as chord_diagram_cache_info
+from utils.single_flight import single_flight
+
 st.set_page_config(page_title="Settings", layout="wide")
 
+# Process-wide caches, other sessions' memory and the telemetry reset are only offered to
+# the operator; every visitor shares this page
+ADMIN_MODE = os.getenv("SETTINGS_ADMIN_MODE", "").lower() in ("1", "true", "yes")
+
+# Lets the memory governor account for this session's state and evict it when idle
+govern_session(get_script_run_ctx())
+
 st.title("⚙️ Settings & Preferences")
 
-# Initialize settings in session state
+DEFAULT_SETTINGS = {
+    "skill_level": "Intermediate",
+    "preferred_key": "G",
+    "tab_source": "All Sources",
+    "notifications": True,
+    "dark_mode": False,
+}
+
+# Initialize settings in session state (saved values from the user store over the defaults)
+user_store = get_user_store()
+user_id = session_user_id(st.session_state, st.query_params)
 if "user_settings" not in st.session_state:
-    st.session_state.user_settings = {
-        "skill_level": "Intermediate",
-        "preferred_key": "G",
-        "tab_source": "All Sources",
-        "notifications": True,
-        "dark_mode": False,
-    }
+    st.session_state.user_settings = {**DEFAULT_SETTINGS, **user_store.load_dict(user_id, "user_settings")}
+
+
+def set_setting(name, value):
+    """Update a setting; only changed values are written to the store"""
+    if st.session_state.user_settings.get(name) != value:
+        st.session_state.user_settings[name] = value
+        user_store.put(user_id, "user_settings", name, value)
+
 
 # Tabs for different settings categories
-tab1, tab2, tab3, tab4 = st.tabs(["👤 Profile", "🎸 Guitar", "🔗 API Keys", "📢 Notifications"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["👤 Profile", "🎸 Guitar", "🔗 API Keys", "📢 Notifications", "📈 Diagnostics"])
 
 with tab1:
     st.subheader("Profile Settings")
+    st.warning(LINK_WARNING)
     
+    skill_levels = ["Beginner", "Intermediate", "Advanced", "Professional"]
     skill_level = st.selectbox(
         "Your Skill Level",
-        ["Beginner", "Intermediate", "Advanced", "Professional"],
-        index=1
+        skill_levels,
+        index=skill_levels.index(st.session_state.user_settings["skill_level"])
     )
-    st.session_state.user_settings["skill_level"] = skill_level
+    set_setting("skill_level", skill_level)
     
     guitar_type = st.multiselect(
         "Guitar Types You Play",
@@ -56,19 +92,23 @@ with tab2:
         ["Standard (EADGBE)", "Drop D", "Open G", "Open D", "Half Step Down"]
     )
     
+    keys = ["C", "D", "E", "F", "G", "A", "B"]
     preferred_key = st.selectbox(
         "Preferred Key (for transposition)",
-        ["C", "D", "E", "F", "G", "A", "B"]
+        keys,
+        index=keys.index(st.session_state.user_settings["preferred_key"])
     )
-    st.session_state.user_settings["preferred_key"] = preferred_key
+    set_setting("preferred_key", preferred_key)
     
     default_capo = st.checkbox("Enable automatic capo recommendations")
     
+    tab_sources = ["All Sources", "Ultimate Guitar", "Chordify", "Tab Provider"]
     tab_source = st.radio(
         "Preferred Tab Source",
-        ["All Sources", "Ultimate Guitar", "Chordify", "Tab Provider"]
+        tab_sources,
+        index=tab_sources.index(st.session_state.user_settings["tab_source"])
     )
-    st.session_state.user_settings["tab_source"] = tab_source
+    set_setting("tab_source", tab_source)
     
     if st.button("Save Guitar Settings"):
         st.success("✅ Guitar settings updated!")
@@ -158,9 +198,9 @@ with tab4:
     
     notifications_enabled = st.checkbox(
         "Enable Notifications",
-        value=True
+        value=st.session_state.user_settings["notifications"]
     )
-    st.session_state.user_settings["notifications"] = notifications_enabled
+    set_setting("notifications", notifications_enabled)
     
     if notifications_enabled:
         st.write("**Notify me about:**")
@@ -183,6 +223,120 @@ with tab4:
     if st.button("Save Notification Settings"):
         st.success("✅ Notification settings updated!")
 
+with tab5:
+    st.subheader("📈 AI Call Diagnostics")
+    st.write("Latency, tokens and estimated cost of recent AI calls across all sessions.")
+    
+    totals = telemetry.totals
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Calls", int(totals["calls"]))
+    with col2:
+        st.metric("Prompt Tokens", int(totals["prompt_tokens"]))
+    with col3:
+        st.metric("Completion Tokens", int(totals["completion_tokens"]))
+    with col4:
+        st.metric("Estimated Cost", f"${totals['cost_usd']:.4f}")
+    
+    group_by = st.radio("Group by", ["path", "route", "model"], horizontal=True,
+                        help="route = task type in the model routing table")
+    summary = telemetry.summary(group_by)
+    if summary:
+        st.write(f"**By {group_by} (rolling window):**")
+        rows = []
+        for name, stats in summary.items():
+            rows.append({
+                group_by.title(): name,
+                "Calls": stats["calls"],
+                "Share": f"{stats['share']:.0%}",
+                "p50 ms": stats["wall_ms"]["p50"],
+                "p95 ms": stats["wall_ms"]["p95"],
+                "p99 ms": stats["wall_ms"]["p99"],
+                "TTFT p50 ms": stats["ttft_ms"]["p50"],
+                "Tokens": stats["prompt_tokens"] + stats["completion_tokens"],
+                "Retries": stats["retries"],
+                "Errors": stats["errors"],
+                "Cost $": stats["cost_usd"],
+            })
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        
+        with st.expander("🕐 Recent Calls"):
+            st.dataframe(list(reversed(telemetry.recent(50))), use_container_width=True, hide_index=True)
+    else:
+        st.info("No AI calls recorded yet. Ask the AI Assistant something to see data here.")
+    
+    with st.expander("🚦 Request Scheduler"):
+        snapshot = get_scheduler().snapshot()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Requests/min Available", snapshot["rpm_available"])
+        with col2:
+            st.metric("Tokens/min Available", snapshot["tpm_available"])
+        st.dataframe([
+            {"Priority": p, "Queued": snapshot["queued"][p], "Running": snapshot["running"][p],
+             "Avg Queue ms": snapshot["avg_queue_ms"][p]}
+            for p in snapshot["queued"]
+        ], use_container_width=True, hide_index=True)
+    
+    if ADMIN_MODE:
+        with st.expander("🗂️ Shared Caches"):
+            tab_cache = get_tab_finder().cache
+            answer_cache = get_semantic_cache()
+            segment_cache = get_segment_cache()
+            diagram_cache = chord_diagram_cache_info()
+            st.dataframe([
+                {"Cache": "Tab searches", "Entries": len(tab_cache), "Hits": tab_cache.stats["hits"],
+                 "Misses": tab_cache.stats["misses"], "Joined in-flight": tab_cache.stats["shared_loads"]},
+                {"Cache": "AI answers", "Entries": len(answer_cache), "Hits": answer_cache.stats["hits"],
+                 "Misses": answer_cache.stats["misses"], "Joined in-flight": single_flight.stats["followers"]},
+                {"Cache": "Practice plan segments", "Entries": len(segment_cache), "Hits": segment_cache.hits,
+                 "Misses": segment_cache.misses, "Joined in-flight": 0},
+                {"Cache": "Chord diagrams", "Entries": diagram_cache["entries"], "Hits": diagram_cache["hits"],
+                 "Misses": diagram_cache["misses"], "Joined in-flight": 0},
+            ], use_container_width=True, hide_index=True)
+            st.caption("Shared by every session: one user's search or question warms the cache for everyone.")
+        
+        with st.expander("🧠 Session Memory"):
+            memory = get_memory_governor().snapshot()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Sessions", memory["sessions"])
+            with col2:
+                st.metric("Session State", f"{memory['total_mb']} MB",
+                          help=f"Evicted from idle sessions past {memory['global_cap_mb']:g} MB in total")
+            with col3:
+                st.metric("Evictions", memory["stats"]["evictions"])
+            with col4:
+                st.metric("Restored", memory["stats"]["restores"])
+            st.caption(f"Per-session cap {memory['session_cap_mb']:g} MB; sessions idle for "
+                       f"{memory['idle_seconds'] / 60:g} min are evicted and reloaded from your saved data on return.")
+            st.dataframe([
+                {"Session": row["session"], "MB": row["mb"], "Idle s": row["idle_s"],
+                 "Running": row["running"], "Evicted": row["evicted"],
+                 "Largest": max(row["by_key_mb"], key=row["by_key_mb"].get) if row["by_key_mb"] else ""}
+                for row in memory["rows"][:50]
+            ], use_container_width=True, hide_index=True)
+    else:
+        with st.expander("🧠 Session Memory"):
+            own = measure_state(st.session_state)
+            st.metric("This Session", f"{sum(own.values()) / (1024 * 1024):.2f} MB")
+            st.caption("Idle sessions give this memory back and reload it from your saved data on return.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "⬇️ Export Telemetry (JSON)",
+            data=telemetry.export(),
+            file_name="ai_telemetry.json",
+            mime="application/json",
+            use_container_width=True
+        )
+    with col2:
+        # The collector is shared by every session
+        if ADMIN_MODE and st.button("Reset Telemetry", use_container_width=True):
+            telemetry.reset()
+            st.rerun()
+
 # Danger Zone
 st.markdown("---")
 st.subheader("⚠️ Danger Zone")
@@ -190,19 +344,24 @@ st.subheader("⚠️ Danger Zone")
 col1, col2 = st.columns(2)
 
 with col1:
-    if st.button("Clear Cache"):
-        st.cache_data.clear()
+    if st.button("Clear Cache", help="Drops this session's cached search results and song data"):
+        # Only this session's state; it is rebuilt (or reloaded from your saved data) on next use
+        for key in DERIVED_KEYS + ("tab_query",):
+            st.session_state.pop(key, None)
+        if "ai_advisor" in st.session_state:
+            st.session_state.ai_advisor.release_memory()
         st.info("Cache cleared! Refresh the app to see changes.")
+    if ADMIN_MODE and st.button("Clear Shared Caches", help="Tab, AI answer and plan caches of every session"):
+        st.cache_data.clear()
+        get_tab_finder().cache.clear()
+        get_semantic_cache().clear()
+        get_segment_cache().clear()
+        st.info("Shared caches cleared for every session.")
 
 with col2:
     if st.button("Reset to Defaults"):
         st.warning("Are you sure? This will reset all settings to defaults.")
         if st.button("Yes, reset everything"):
-            st.session_state.user_settings = {
-                "skill_level": "Intermediate",
-                "preferred_key": "G",
-                "tab_source": "All Sources",
-                "notifications": True,
-                "dark_mode": False,
-            }
+            for name, value in DEFAULT_SETTINGS.items():
+                set_setting(name, value)
             st.success("✅ Settings reset to defaults!")
@@ -4,16 +4,29 @@ Upload and analyze songs with chord progression analysis
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.memory_governor import govern_session
 from utils.ai_advisor import AITabAdvisor
+from utils.batch_analysis import expand_uploads, analyze_batch, song_name as song_name_from_file
+from utils.ingest import ingest_song, read_preview, MAX_STORED_CHARS
+from utils.song_model import parse_song, render_song, transpose_song, section_outline
+from utils.user_store import get_user_store, session_user_id
+from utils.song_index import SongIndex, song_terms
 
 st.set_page_config(page_title="My Songs", layout="wide")
 
+# Lets the memory governor account for this session's state and evict it when idle
+govern_session(get_script_run_ctx())
+
+# Songs listed per page of the collection
+SONGS_PER_PAGE = 20
+
 st.title("🎵 My Songs")
 st.write("Upload your song files to analyze chords and get personalized learning tips!")
 
@@ -21,9 +34,40 @@ st.write("Upload your song files to analyze chords and get personalized learning
 if "ai_advisor" not in st.session_state:
     st.session_state.ai_advisor = AITabAdvisor()
 
-# Initialize my songs in session state
-if "my_songs" not in st.session_state:
-    st.session_state.my_songs = []
+# Songs live in the user store; the session only holds their names and search terms
+user_store = get_user_store()
+user_id = session_user_id(st.session_state, st.query_params)
+
+
+def song_index():
+    """Search index of the collection, built from the stored terms on first use and then kept in step with it"""
+    if "song_index" not in st.session_state:
+        terms = user_store.load_dict(user_id, "my_songs/terms")
+        index = SongIndex()
+        for name in user_store.keys(user_id, "my_songs"):
+            if name not in terms:
+                # Saved before its terms were stored: index it from the song once
+                terms[name] = song_terms(user_store.get(user_id, "my_songs", name))
+                user_store.put(user_id, "my_songs/terms", name, terms[name])
+            index.add_terms(name, terms[name])
+        st.session_state.song_index = index
+    return st.session_state.song_index
+
+
+def save_song(song):
+    """Add or update a song in the collection's store and search index"""
+    terms = song_terms(song)
+    user_store.put(user_id, "my_songs", song["name"], song)
+    user_store.put(user_id, "my_songs/terms", song["name"], terms)
+    song_index().add_terms(song["name"], terms)
+
+
+def delete_song(name):
+    """Remove a song from the store and the search index"""
+    user_store.delete(user_id, "my_songs", name)
+    user_store.delete(user_id, "my_songs/terms", name)
+    song_index().remove(name)
+
 
 # File upload section
 st.subheader("📤 Upload Your Song")
@@ -31,10 +75,11 @@ st.subheader("📤 Upload Your Song")
 col1, col2 = st.columns([3, 1])
 
 with col1:
-    uploaded_file = st.file_uploader(
-        "Choose a song file (TXT, MD, or paste text)",
-        type=["txt", "md"],
-        help="Upload a file with song lyrics and chords"
+    uploaded_files = st.file_uploader(
+        "Choose song files (TXT, MD, a ZIP songbook, or paste text)",
+        type=["txt", "md", "zip"],
+        accept_multiple_files=True,
+        help="Upload one or more files with song lyrics and chords, or a ZIP of them"
     )
 
 with col2:
@@ -46,6 +91,15 @@ with col2:
 song_content = None
 song_name = None
 
+# A single song file keeps the preview flow; several files or a ZIP are imported as a batch
+uploaded_file = None
+batch_files = []
+if uploaded_files:
+    if len(uploaded_files) == 1 and not uploaded_files[0].name.lower().endswith(".zip"):
+        uploaded_file = uploaded_files[0]
+    else:
+        batch_files = uploaded_files
+
 if use_text_input:
     st.subheader("Paste Your Song Here")
     song_name = st.text_input("Song name", placeholder="e.g., Wonderwall")
@@ -67,8 +121,8 @@ He let us in...""",
                 st.markdown(analysis)
                 
                 # Save to my songs
-                if song_name not in [s["name"] for s in st.session_state.my_songs]:
-                    st.session_state.my_songs.append({
+                if song_name not in song_index():
+                    save_song({
                         "name": song_name,
                         "content": song_content,
                         "analysis": analysis
@@ -78,42 +132,155 @@ He let us in...""",
             st.warning("Please enter both a song name and content!")
 
 elif uploaded_file:
-    song_name = uploaded_file.name.replace(".txt", "").replace(".md", "")
-    song_content = uploaded_file.read().decode("utf-8")
+    song_name = song_name_from_file(uploaded_file.name)
     
     st.subheader(f"📋 Analyzing: {song_name}")
     
-    # Show file preview
+    # Show file preview (reads only the first few KB)
     with st.expander("📄 File Preview"):
-        st.text(song_content[:500] + "..." if len(song_content) > 500 else song_content)
+        preview = read_preview(uploaded_file)
+        st.text(preview + "..." if uploaded_file.size > len(preview.encode()) else preview)
     
     # Analyze button
     if st.button("🔍 Analyze Chords", type="primary", use_container_width=True):
+        progress = st.progress(0.0, text="Reading file...")
+        # Decoded and tokenized chunk by chunk; only the beginning of very long files is stored
+        ingested = ingest_song(
+            uploaded_file, uploaded_file.size,
+            progress=lambda fraction: progress.progress(fraction, text=f"Reading file... {fraction:.0%}")
+        )
+        progress.empty()
         with st.spinner("🤖 Analyzing chords..."):
-            analysis = st.session_state.ai_advisor.analyze_song_chords(song_content, song_name)
+            analysis = st.session_state.ai_advisor.analyze_song_tokens(ingested["tokens"], song_name)
             st.markdown(analysis)
+            if ingested["truncated"]:
+                st.caption(f"Analyzed the whole file ({ingested['bytes'] / (1024 * 1024):.1f} MB); "
+                           f"only the first {MAX_STORED_CHARS // 1024} KB of text is kept in your collection.")
             
             # Save to my songs
-            if song_name not in [s["name"] for s in st.session_state.my_songs]:
-                st.session_state.my_songs.append({
+            if song_name not in song_index():
+                save_song({
                     "name": song_name,
-                    "content": song_content,
-                    "analysis": analysis
+                    "content": ingested["content"],
+                    "analysis": analysis,
+                    "truncated": ingested["truncated"]
                 })
                 st.success(f"✅ '{song_name}' saved to your collection!")
 
+elif batch_files:
+    # Expanded once per set of uploaded files, not on every rerun while they stay in the uploader.
+    # Only the song names are kept; the texts are read from the uploader again when analyzed.
+    upload_ids = tuple(f.file_id for f in batch_files)
+    if st.session_state.get("batch_upload", {}).get("ids") != upload_ids:
+        batch_songs, skipped = expand_uploads((f.name, f.getvalue()) for f in batch_files)
+        st.session_state.batch_upload = {"ids": upload_ids, "names": [name for name, _ in batch_songs],
+                                         "skipped": skipped}
+        del batch_songs
+    batch_names, skipped = st.session_state.batch_upload["names"], st.session_state.batch_upload["skipped"]
+    
+    # Songs already in the collection (or repeated in the upload) are not analyzed again
+    existing = song_index()
+    new_names = list(dict.fromkeys(name for name in batch_names if name not in existing))
+    
+    st.subheader(f"📦 Batch Import: {len(batch_names)} songs")
+    st.caption(f"{len(new_names)} new, {len(batch_names) - len(new_names)} already in your collection")
+    if skipped:
+        with st.expander(f"⚠️ Skipped {len(skipped)} files"):
+            for note in skipped:
+                st.write(f"- {note}")
+    
+    if new_names and st.button("🔍 Analyze All", type="primary", use_container_width=True):
+        wanted = set(new_names)
+        new_songs = {}
+        for name, content in expand_uploads((f.name, f.getvalue()) for f in batch_files)[0]:
+            if name in wanted and name not in new_songs:
+                new_songs[name] = content
+        total = len(new_songs)
+        progress = st.progress(0.0, text="Starting analysis workers...")
+        with st.status(f"🤖 Analyzing {total} songs...", expanded=True) as status:
+            failed = 0
+            for done, result in enumerate(analyze_batch(list(new_songs.items())), 1):
+                if "error" in result:
+                    failed += 1
+                    st.write(f"⚠️ {result['name']}: {result['error']}")
+                else:
+                    # Saved as soon as it finishes, so a stopped import keeps the songs done so far.
+                    # The whole song is analyzed; only its beginning is stored, as for single uploads
+                    content = new_songs.pop(result["name"])
+                    truncated = len(content) > MAX_STORED_CHARS
+                    save_song({
+                        "name": result["name"],
+                        "content": content[:MAX_STORED_CHARS],
+                        "analysis": result["analysis"],
+                        "truncated": truncated
+                    })
+                    st.write(f"✅ {result['name']}" + (f" (first {MAX_STORED_CHARS // 1024} KB kept)"
+                                                      if truncated else ""))
+                progress.progress(done / total, text=f"{done} of {total} songs analyzed")
+            status.update(label=f"✅ {total - failed} songs saved to your collection"
+                                + (f", {failed} failed" if failed else ""),
+                          state="complete", expanded=False)
+        del new_songs
+
 # My Songs Collection
 st.markdown("---")
 st.subheader("📚 Your Song Collection")
 
-if st.session_state.my_songs:
-    # Tabs for each song
-    song_names = [song["name"] for song in st.session_state.my_songs]
-    tabs = st.tabs([f"🎵 {name}" for name in song_names])
+index = song_index()
+if len(index):
+    # Searchable, paginated list; only the selected song is read from the store and rendered
+    search_col, count_col = st.columns([3, 1])
+    with search_col:
+        query = st.text_input("🔎 Search your songs", placeholder="Song name, chord (e.g. F#m) or lyric",
+                              key="song_search")
+    matches = index.search(query)
+    with count_col:
+        st.write("")  # Spacing
+        st.caption(f"{len(matches)} of {len(index)} songs")
     
-    for idx, tab in enumerate(tabs):
-        with tab:
-            song = st.session_state.my_songs[idx]
+    # A new search starts from the first page
+    if st.session_state.get("song_search_last") != query:
+        st.session_state.song_search_last = query
+        st.session_state.song_page = 0
+    
+    if not matches:
+        st.info("No songs match your search.")
+    else:
+        page_count = (len(matches) - 1) // SONGS_PER_PAGE + 1
+        page = min(st.session_state.get("song_page", 0), page_count - 1)
+        page_names = matches[page * SONGS_PER_PAGE:(page + 1) * SONGS_PER_PAGE]
+        
+        list_col, song_col = st.columns([1, 3])
+        
+        with list_col:
+            selected = st.session_state.get("selected_song")
+            selected = st.radio(
+                "Songs", page_names, label_visibility="collapsed",
+                index=page_names.index(selected) if selected in page_names else 0,
+                format_func=lambda name: f"🎵 {name}"
+            )
+            st.session_state.selected_song = selected
+            if page_count > 1:
+                prev_col, page_col, next_col = st.columns([1, 2, 1])
+                with prev_col:
+                    if st.button("◀", key="song_page_prev", disabled=page == 0):
+                        st.session_state.song_page = page - 1
+                        st.rerun()
+                with page_col:
+                    st.caption(f"Page {page + 1} of {page_count}")
+                with next_col:
+                    if st.button("▶", key="song_page_next", disabled=page == page_count - 1):
+                        st.session_state.song_page = page + 1
+                        st.rerun()
+        
+        with song_col:
+            song = user_store.get(user_id, "my_songs", selected)
+            if song is None:
+                # Deleted from another tab
+                index.remove(selected)
+                st.rerun()
+            # Widget keys follow the song, not its place in the list
+            idx = song["name"]
             
             col1, col2, col3 = st.columns([3, 1, 1])
             
@@ -121,20 +288,51 @@ if st.session_state.my_songs:
                 st.write(f"**Song:** {song['name']}")
             
             with col2:
-                if st.button("📝 Edit", key=f"edit_{idx}"):
+                # Songs stored as an excerpt cannot be edited without losing the rest
+                if st.button("📝 Edit", key=f"edit_{idx}", disabled=song.get("truncated", False),
+                             help="Only the beginning of this song is stored" if song.get("truncated") else None):
                     st.session_state.editing = idx
             
             with col3:
                 if st.button("🗑️ Delete", key=f"delete_{idx}"):
-                    st.session_state.my_songs.pop(idx)
+                    delete_song(song["name"])
+                    st.session_state.editing = None
                     st.rerun()
             
+            # Edit in place; only the changed lines are re-analyzed
+            if st.session_state.get("editing") == idx:
+                edited = st.text_area("Edit song", value=song["content"], height=300, key=f"edit_content_{idx}")
+                save_col, cancel_col = st.columns(2)
+                with save_col:
+                    if st.button("💾 Save", key=f"save_{idx}", type="primary", use_container_width=True):
+                        if edited != song["content"]:
+                            song["analysis"] = st.session_state.ai_advisor.analyze_song_chords(
+                                edited, song["name"], previous_content=song["content"]
+                            )
+                            song["content"] = edited
+                            # Songs saved with their parsed model drop it; it is rebuilt from the text
+                            song.pop("model", None)
+                            save_song(song)
+                        st.session_state.editing = None
+                        st.rerun()
+                with cancel_col:
+                    if st.button("Cancel", key=f"cancel_{idx}", use_container_width=True):
+                        st.session_state.editing = None
+                        st.rerun()
+            
             # Show analysis
             st.markdown(song["analysis"])
             
-            # Show content
+            # Show content, rendered from the song parsed on load (only the text is stored)
             with st.expander("📄 Show Full Content"):
-                st.text(song["content"])
+                model = parse_song(song["content"])
+                if song.get("truncated"):
+                    st.caption(f"Showing the first {MAX_STORED_CHARS // 1024} KB of the song")
+                if len(model["sections"]) > 1:
+                    st.caption("**Sections:** " + " → ".join(section_outline(model)))
+                semitones = st.select_slider("Transpose (semitones)", options=list(range(-6, 7)), value=0,
+                                             key=f"transpose_{idx}")
+                st.text(render_song(transpose_song(model, semitones)) if semitones else render_song(model))
 
 else:
     st.info("""
@@ -158,9 +356,11 @@ with col1:
     **Supported Formats:**
     - Plain text (.txt)
     - Markdown (.md)
+    - ZIP songbooks of .txt/.md files
     - Pasted text
     
-    **File Size:** Up to 200MB
+    **File Size:** Up to 200MB (read in chunks; songs
+    over 512 KB keep only their beginning in your collection)
     """)
 
 with col2:
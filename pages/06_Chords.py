@@ -4,380 +4,37 @@ Browse 30+ guitar chords with visual diagrams and finger positions
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.memory_governor import govern_session
+from utils.knowledge_base import get_knowledge_base
+from utils.chord_diagrams import chord_shapes, describe_fingering, render_ascii, render_svg
+from utils.chord_parser import parse_chord
+
 st.set_page_config(page_title="🎸 Chords Library", layout="wide")
 
+# Lets the memory governor account for this session's state and evict it when idle
+govern_session(get_script_run_ctx())
+
 st.title("🎸 Guitar Chords Library")
 st.write("Explore 30+ guitar chords with visual diagrams, finger positions, and tips!")
 
-# Chord database with detailed information
-CHORDS_DB = {
-    # Major Chords
-    "C Major": {
-        "category": "Major Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (1st fret A string) | 2nd finger (2nd fret D string) | 3rd finger (3rd fret B string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ 1 2 │ 3 │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - X 3 2 0 1 0
-        """,
-        "tips": "Start with this chord! One of the easiest open chords.",
-        "used_in": "Wonderwall, Knockin' On Heaven's Door, Blackbird"
-    },
-    
-    "G Major": {
-        "category": "Major Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (2nd fret A string) | 2nd finger (3rd fret high E string) | 3rd finger (3rd fret low B string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ 3 │ │ │ 2 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ 1 │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 3 2 0 0 0 3
-        """,
-        "tips": "Great for rock and pop songs. Practice smooth transitions.",
-        "used_in": "Three Little Birds, Horse With No Name, Brown Eyed Girl"
-    },
-    
-    "D Major": {
-        "category": "Major Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (1st fret D string) | 2nd finger (2nd fret high E string) | 3rd finger (2nd fret B string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ │ 1 2 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ 3 │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - X X 0 2 3 2
-        """,
-        "tips": "Essential beginner chord. Great for folk and acoustic.",
-        "used_in": "Wonderwall, To Build a Home, House of the Rising Sun"
-    },
-    
-    "A Major": {
-        "category": "Major Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (1st fret D string) | 2nd finger (2nd fret G string) | 3rd finger (2nd fret B string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ 1 │ │ 2 3 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 0 0 2 2 2 0
-        """,
-        "tips": "Very common chord. Practice smooth transitions with E.",
-        "used_in": "Smells Like Teen Spirit, Sweet Home Alabama, Zombie"
-    },
-    
-    "E Major": {
-        "category": "Major Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (1st fret G string) | 2nd finger (2nd fret D string) | 3rd finger (2nd fret B string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ 2 1 3 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 0 2 2 1 0 0
-        """,
-        "tips": "Powerful open chord. Great for rock and blues.",
-        "used_in": "House of the Rising Sun, Sweet Home Chicago, Layla"
-    },
-    
-    # Minor Chords
-    "A Minor": {
-        "category": "Minor Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (1st fret B string) | 2nd finger (2nd fret G string) | 3rd finger (2nd fret D string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ 2 1 3 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 0 0 2 2 1 0
-        """,
-        "tips": "Easiest minor chord! Great starting point.",
-        "used_in": "Wonderwall, House of the Rising Sun, Zombie"
-    },
-    
-    "E Minor": {
-        "category": "Minor Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (2nd fret A string) | 2nd finger (2nd fret D string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ 1 2 │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 0 2 2 0 0 0
-        """,
-        "tips": "Only 2 fingers! Very easy and sounds beautiful.",
-        "used_in": "Wonderwall, Hallelujah, Fade to Black"
-    },
-    
-    "D Minor": {
-        "category": "Minor Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (1st fret high E string) | 2nd finger (2nd fret G string) | 3rd finger (3rd fret B string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ 1 │ │ 2 │ 3 │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - X X 0 2 3 1
-        """,
-        "tips": "Great warm sound. Common in folk and rock.",
-        "used_in": "House of the Rising Sun, Mad World, Creep"
-    },
-    
-    # Seventh Chords
-    "G7": {
-        "category": "Seventh Chords",
-        "difficulty": "Intermediate",
-        "finger_positions": "1st finger (2nd fret A string) | 2nd finger (3rd fret high E string) | 3rd finger (3rd fret B string) | 4th finger (3rd fret D string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ 3 │ 4 │ 2 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ 1 │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 3 2 0 0 0 1
-        """,
-        "tips": "Bluesy sound. Perfect for blues and rock.",
-        "used_in": "Johnny B Goode, Sweet Home Chicago, Ramblin' Man"
-    },
-    
-    "D7": {
-        "category": "Seventh Chords",
-        "difficulty": "Intermediate",
-        "finger_positions": "1st finger (1st fret high E string) | 2nd finger (2nd fret high B string) | 3rd finger (2nd fret D string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ 1 │ │ 2 3 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - X X 0 2 1 2
-        """,
-        "tips": "Often used before G in blues progressions.",
-        "used_in": "All blues songs, Dust in the Wind, Bad Moon Rising"
-    },
-    
-    "A7": {
-        "category": "Seventh Chords",
-        "difficulty": "Intermediate",
-        "finger_positions": "1st finger (1st fret D string) | 2nd finger (2nd fret G string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ 1 2 │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 0 0 2 0 2 0
-        """,
-        "tips": "Great blues chord. Common progression: A7 - D7 - E7",
-        "used_in": "Mannish Boy, Stormy Monday, All Blues Tunes"
-    },
-    
-    # Barre Chords (Intermediate)
-    "F Major": {
-        "category": "Barre Chords",
-        "difficulty": "Advanced",
-        "finger_positions": "1st finger (1st fret - all strings, barre) | 2nd finger (2nd fret A string) | 3rd finger (3rd fret D string) | 4th finger (3rd fret high E string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ 1 1 1 1 1 1 │ (Barre!)
-        │ ├─┼─┼─┼─┼─┤
-        │ │ 2 │ │ 3 │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ 4 │ │ │
-        │ └─────────────┘
-        
-        Barre 1st - 1 3 3 2 1 1
-        """,
-        "tips": "THE challenging barre chord! Practice 15 min daily. Worth it!",
-        "used_in": "Wonderwall (capo 2), Pink Floyd songs, Many classics"
-    },
-    
-    "B Minor": {
-        "category": "Barre Chords",
-        "difficulty": "Advanced",
-        "finger_positions": "1st finger (2nd fret - barre) | 2nd finger (3rd fret A string) | 3rd finger (4th fret D string) | 4th finger (4th fret high E string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ 1 1 1 1 1 │ (Barre!)
-        │ ├─┼─┼─┼─┼─┤
-        │ │ 2 │ │ 3 │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ 4 │ │ │
-        │ └─────────────┘
-        
-        Barre 2nd - 2 4 4 3 2 2
-        """,
-        "tips": "Easier than F. Progress after mastering F chord.",
-        "used_in": "Come Together, Angie, Black Hole Sun"
-    },
-    
-    # Power Chords
-    "E5 (Power Chord)": {
-        "category": "Power Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "1st finger (root note) | 2nd finger (5th fret up on adjacent string)",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ 1 │ │ 2 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Low E string - 0 2 2
-        """,
-        "tips": "Easy and powerful! Perfect for rock and metal.",
-        "used_in": "Smoke on the Water, Enter Sandman, Iron Man"
-    },
-    
-    # Additional Chords
-    "Cmaj7": {
-        "category": "Jazz/Extended",
-        "difficulty": "Intermediate",
-        "finger_positions": "Simple open position with added finger",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ │ │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ 1 2 │ 3 │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - X 3 2 0 0 0
-        """,
-        "tips": "Beautiful jazz chord. Adds sophistication.",
-        "used_in": "Make It With You, Girl from Ipanema, Standard Jazz"
-    },
-    
-    "Am7": {
-        "category": "Extended Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "Similar to Am, open position",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ │ 1 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ 2 │ │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - 0 0 2 0 1 0
-        """,
-        "tips": "Softer than Am. Used in Wonderwall!",
-        "used_in": "Wonderwall, Smooth Criminal, Black Hole Sun"
-    },
-    
-    "Dm7": {
-        "category": "Extended Chords",
-        "difficulty": "Beginner",
-        "finger_positions": "Open position variation",
-        "diagram": """
-        E A D G B e
-        ┌─────────────┐
-        │ │ │ │ │ 1 │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ 2 3 │ │
-        │ ├─┼─┼─┼─┼─┤
-        │ │ │ │ │ │ │
-        │ └─────────────┘
-        
-        Open - X X 0 2 1 1
-        """,
-        "tips": "Great chord for modern songs.",
-        "used_in": "Creep, Zombie, Paranoid Android"
-    },
-}
-
-# Organize chords by category
-categories = {}
-for chord_name, chord_data in CHORDS_DB.items():
-    category = chord_data["category"]
-    if category not in categories:
-        categories[category] = []
-    categories[category].append(chord_name)
+# Chord database and category index, loaded once per process
+knowledge_base = get_knowledge_base()
+CHORDS_DB = knowledge_base.chords
+categories = knowledge_base.chord_categories
 
 # Sidebar - Quick search
 with st.sidebar:
     st.subheader("🔍 Quick Chord Search")
     
     # Dropdown to select a chord
-    chord_names = list(CHORDS_DB.keys())
+    chord_names = knowledge_base.chord_names
     selected_chord_dropdown = st.selectbox(
         "Choose a chord to learn:",
         chord_names,
@@ -401,7 +58,7 @@ st.subheader("📚 Browse All Chords")
 
 # Filter chords based on category selection
 if selected_category == "All Chords":
-    filtered_chords = list(CHORDS_DB.keys())
+    filtered_chords = knowledge_base.chord_names
 else:
     filtered_chords = categories[selected_category]
 
@@ -444,13 +101,18 @@ if "selected_chord" in st.session_state:
     
     col1, col2 = st.columns([1, 2])
     
+    # Drawn from the chord's frets, so the diagram and the instructions always agree
+    frets, fingers = chord_data["frets"], chord_data.get("fingers")
+    
     with col1:
         st.markdown("**Visual Diagram:**")
-        st.code(chord_data["diagram"], language="text")
+        st.image(render_svg(frets, fingers, chord_name))
+        with st.expander("Text diagram"):
+            st.code(render_ascii(frets, fingers), language="text")
     
     with col2:
         st.write("**How to Play:**")
-        st.write(chord_data["finger_positions"])
+        st.markdown("\n".join(f"- {line}" for line in describe_fingering(frets, fingers)))
         
         st.write("\n**🎯 Pro Tips:**")
         st.success(chord_data["tips"])
@@ -501,6 +163,22 @@ if "selected_chord" in st.session_state:
         else:
             st.info(f"ℹ️ {chord_name} is already in your favorites")
 
+# Diagrams for any chord name, drawn on demand from its known voicings
+st.markdown("---")
+st.subheader("🔎 Diagram Any Chord")
+chord_query = st.text_input("Chord name", placeholder="e.g. F#m7, Bb, Csus4", key="any_chord")
+if chord_query:
+    any_chord = parse_chord(chord_query.strip()) or parse_chord(chord_query.strip().capitalize())
+    shapes = chord_shapes(any_chord) if any_chord else []
+    if not shapes:
+        st.warning(f"No voicing known for \"{chord_query}\"")
+    else:
+        st.caption(f"{len(shapes)} voicing{'s' if len(shapes) != 1 else ''} of {any_chord}, easiest first")
+        for col, shape in zip(st.columns(max(3, len(shapes))), shapes):
+            with col:
+                st.image(render_svg(shape, title=any_chord))
+                st.caption(" ".join("x" if fret < 0 else str(fret) for fret in shape))
+
 # Favorites section
 if "favorite_chords" in st.session_state and st.session_state.favorite_chords:
     st.markdown("---")
@@ -0,0 +1,137 @@
+"""
+Batch Analysis Module
+Chord analysis of many songs (multi-file uploads and ZIP songbooks) across a
+process pool, yielding each song's result as soon as it finishes
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .ingest import decode_song
+
+SONG_EXTENSIONS = (".txt", ".md")
+
+# Worker processes (defaults to one per core)
+BATCH_WORKERS = int(os.getenv("BATCH_ANALYSIS_WORKERS", "0")) or os.cpu_count() or 2
+
+# Songbook entries larger than this are skipped (chord sheets are a few KB)
+MAX_SONG_BYTES = 2 * 1024 * 1024
+MAX_ZIP_SONGS = 2000
+
+
+def song_name(filename: str) -> str:
+    """"songs/Wonderwall.txt" -> "Wonderwall" """
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def expand_uploads(uploads: Iterable[Tuple[str, bytes]]) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Songs in a set of uploaded files; ZIP archives are opened and their .txt/.md entries read
+
+    Args:
+        uploads: (filename, bytes) pairs
+
+    Returns:
+        ([(song name, content), ...], [skipped entry notes])
+    """
+    songs, skipped = [], []
+    for filename, data in uploads:
+        if filename.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile:
+                skipped.append(f"{filename}: not a valid ZIP archive")
+                continue
+            with archive:
+                for entry in archive.infolist():
+                    name = entry.filename
+                    if entry.is_dir() or "__MACOSX" in name or os.path.basename(name).startswith("."):
+                        continue
+                    if not name.lower().endswith(SONG_EXTENSIONS):
+                        skipped.append(f"{name}: not a .txt or .md file")
+                    elif entry.file_size > MAX_SONG_BYTES:
+                        skipped.append(f"{name}: larger than {MAX_SONG_BYTES // (1024 * 1024)} MB")
+                    elif len(songs) >= MAX_ZIP_SONGS:
+                        skipped.append(f"{name}: songbook limit of {MAX_ZIP_SONGS} songs reached")
+                    else:
+                        songs.append((song_name(name), decode_song(archive.read(entry))))
+        elif filename.lower().endswith(SONG_EXTENSIONS):
+            songs.append((song_name(filename), decode_song(data)))
+        else:
+            skipped.append(f"{filename}: not a .txt, .md or .zip file")
+    return songs, skipped
+
+
+# One advisor per worker process; song analysis is local and never calls OpenAI
+_worker_advisor = None
+
+
+def analyze_song(name: str, content: str) -> Dict:
+    """Analyze one song (runs in a worker process)"""
+    global _worker_advisor
+    if _worker_advisor is None:
+        from .ai_advisor import AITabAdvisor
+        _worker_advisor = AITabAdvisor()
+    return {"name": name, "analysis": _worker_advisor.analyze_song_chords(content, name)}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    """Process-wide worker pool, started on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned workers do not inherit the server's threads and locks
+                _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def analyze_batch(songs: List[Tuple[str, str]]) -> Iterator[Dict]:
+    """
+    Analyze songs across the process pool
+
+    Yields:
+        {"name", "analysis"} per song in completion order, or {"name", "error"} if it failed
+    """
+    done = set()
+    try:
+        pool = get_batch_pool()
+        futures = {pool.submit(analyze_song, name, content): i for i, (name, content) in enumerate(songs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                result = {"name": songs[i][0], "error": str(e)}
+            done.add(i)
+            yield result
+    except (BrokenProcessPool, OSError) as e:
+        # A worker died or processes cannot be started here: finish the rest in this process
+        print(f"Batch analysis pool error, continuing in-process: {e}")
+        _reset_pool()
+        for i, (name, content) in enumerate(songs):
+            if i in done:
+                continue
+            try:
+                yield analyze_song(name, content)
+            except Exception as e:
+                yield {"name": name, "error": str(e)}
@@ -0,0 +1,244 @@
+"""
+Chord Diagrams Module
+Chord diagrams (SVG, with a plain-text fallback) drawn from a voicing's fret
+and finger arrays, so a diagram always agrees with its fingering
+
+Rendered diagrams are memoized per voicing in an LRU cache shared by every
+session; diagrams for any chord name come from the voicing table on demand.
+"""
+
+import functools
+from html import escape
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .chord_parser import split_chord
+from .voicings import MUTED, chord_voicings, get_voicing_table
+
+STRING_NAMES = ("E", "A", "D", "G", "B", "e")
+STRING_LABELS = ("low E", "A", "D", "G", "B", "high e")
+FINGER_NAMES = {1: "Index", 2: "Middle", 3: "Ring", 4: "Pinky"}
+
+# Fret rows drawn; voicings reaching past them start at their lowest fret ("5fr")
+MIN_FRETS = 4
+# More fretted strings than fingers: the index finger lies across the lowest fret
+BARRE_STRINGS = 4
+
+DIAGRAM_CACHE_ENTRIES = 512
+
+# SVG geometry (px)
+STRING_GAP = 20
+FRET_GAP = 24
+LEFT = 30
+TOP = 48
+DOT_RADIUS = 8
+
+
+def assign_fingers(frets: Sequence[int]) -> List[int]:
+    """
+    Fretting finger per string (1-4, 0 for open or muted strings)
+
+    A barre takes the lowest fret when more than four strings are fretted;
+    the other notes get the next fingers in order of fret, then string.
+    """
+    fingers = [0] * len(frets)
+    fretted = [(fret, string) for string, fret in enumerate(frets) if fret > 0]
+    if not fretted:
+        return fingers
+    finger = 1
+    if len(fretted) > BARRE_STRINGS:
+        lowest = min(fret for fret, _ in fretted)
+        for fret, string in fretted:
+            if fret == lowest:
+                fingers[string] = 1
+        fretted = [(fret, string) for fret, string in fretted if fret > lowest]
+        finger = 2
+    for _, string in sorted(fretted):
+        fingers[string] = min(finger, 4)
+        finger += 1
+    return fingers
+
+
+def _layout(frets: Tuple[int, ...], fingers: Tuple[int, ...]) -> Dict:
+    """Shared geometry of both renderers: first fret shown, rows, notes and barres"""
+    fretted = [fret for fret in frets if fret > 0]
+    highest = max(fretted, default=0)
+    base = 1 if highest <= MIN_FRETS else min(fretted)
+    rows = max(MIN_FRETS, highest - base + 1)
+
+    # A finger on one fret across several strings is a barre
+    strings_by_finger: Dict[Tuple[int, int], List[int]] = {}
+    for string, (fret, finger) in enumerate(zip(frets, fingers)):
+        if fret > 0 and finger:
+            strings_by_finger.setdefault((finger, fret), []).append(string)
+    barres = [{"finger": finger, "fret": fret, "first": min(strings), "last": max(strings)}
+              for (finger, fret), strings in strings_by_finger.items() if len(strings) > 1]
+    return {"base": base, "rows": rows, "barres": barres}
+
+
+@functools.lru_cache(maxsize=DIAGRAM_CACHE_ENTRIES)
+def _render_svg(frets: Tuple[int, ...], fingers: Tuple[int, ...], title: str) -> str:
+    layout = _layout(frets, fingers)
+    base, rows = layout["base"], layout["rows"]
+    right = LEFT + STRING_GAP * (len(frets) - 1)
+    bottom = TOP + FRET_GAP * rows
+    width, height = right + LEFT, bottom + 26
+
+    def x(string: int) -> int:
+        return LEFT + STRING_GAP * string
+
+    def y(fret: int) -> float:
+        return TOP + FRET_GAP * (fret - base + 0.5)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}" font-family="sans-serif" role="img" '
+             f'aria-label="{escape(title or "Chord")} diagram">']
+    if title:
+        parts.append(f'<text x="{width / 2}" y="16" text-anchor="middle" font-size="15" '
+                     f'font-weight="bold">{escape(title)}</text>')
+
+    for row in range(rows + 1):
+        parts.append(f'<line x1="{LEFT}" y1="{TOP + FRET_GAP * row}" x2="{right}" '
+                     f'y2="{TOP + FRET_GAP * row}" stroke="#555" stroke-width="1"/>')
+    if base == 1:
+        parts.append(f'<line x1="{LEFT - 1}" y1="{TOP}" x2="{right + 1}" y2="{TOP}" '
+                     f'stroke="#222" stroke-width="5"/>')
+    else:
+        parts.append(f'<text x="{LEFT - 8}" y="{y(base) + 4}" text-anchor="end" '
+                     f'font-size="11">{base}fr</text>')
+
+    for string, fret in enumerate(frets):
+        parts.append(f'<line x1="{x(string)}" y1="{TOP}" x2="{x(string)}" y2="{bottom}" '
+                     f'stroke="#555" stroke-width="1"/>')
+        # Open and muted markers above the nut, string names below the last fret
+        if fret == MUTED:
+            parts.append(f'<text x="{x(string)}" y="{TOP - 8}" text-anchor="middle" '
+                         f'font-size="13">×</text>')
+        elif fret == 0:
+            parts.append(f'<circle cx="{x(string)}" cy="{TOP - 12}" r="5" fill="none" '
+                         f'stroke="#222" stroke-width="1.5"/>')
+        parts.append(f'<text x="{x(string)}" y="{bottom + 18}" text-anchor="middle" '
+                     f'font-size="11" fill="#777">{STRING_NAMES[string]}</text>')
+
+    covered = set()
+    for barre in layout["barres"]:
+        left, top = x(barre["first"]) - DOT_RADIUS, y(barre["fret"]) - DOT_RADIUS
+        span = x(barre["last"]) - x(barre["first"]) + 2 * DOT_RADIUS
+        parts.append(f'<rect x="{left}" y="{top}" width="{span}" height="{2 * DOT_RADIUS}" '
+                     f'rx="{DOT_RADIUS}" fill="#222"/>')
+        parts.append(f'<text x="{x(barre["first"])}" y="{y(barre["fret"]) + 4}" text-anchor="middle" '
+                     f'font-size="11" fill="#fff">{barre["finger"]}</text>')
+        covered.update((string, barre["fret"]) for string in range(barre["first"], barre["last"] + 1))
+
+    for string, (fret, finger) in enumerate(zip(frets, fingers)):
+        if fret <= 0 or (string, fret) in covered:
+            continue
+        parts.append(f'<circle cx="{x(string)}" cy="{y(fret)}" r="{DOT_RADIUS}" fill="#222"/>')
+        if finger:
+            parts.append(f'<text x="{x(string)}" y="{y(fret) + 4}" text-anchor="middle" '
+                         f'font-size="11" fill="#fff">{finger}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+@functools.lru_cache(maxsize=DIAGRAM_CACHE_ENTRIES)
+def _render_ascii(frets: Tuple[int, ...], fingers: Tuple[int, ...], title: str) -> str:
+    layout = _layout(frets, fingers)
+    base, rows = layout["base"], layout["rows"]
+    cells = {}
+    for barre in layout["barres"]:
+        for string in range(barre["first"], barre["last"] + 1):
+            cells[(string, barre["fret"])] = str(barre["finger"])
+    for string, (fret, finger) in enumerate(zip(frets, fingers)):
+        if fret > 0:
+            cells.setdefault((string, fret), str(finger) if finger else "●")
+
+    lines = [title] if title else []
+    lines.append(" ".join("x" if fret == MUTED else "o" if fret == 0 else " " for fret in frets).rstrip())
+    lines.append("╒═╤═╤═╤═╤═╕" if base == 1 else "┌─┬─┬─┬─┬─┐")
+    for row in range(rows):
+        fret = base + row
+        line = " ".join(cells.get((string, fret), "│") for string in range(len(frets)))
+        lines.append(line + (f" {base}fr" if row == 0 and base > 1 else ""))
+        lines.append("├─┼─┼─┼─┼─┤" if row < rows - 1 else "└─┴─┴─┴─┴─┘")
+    lines.append(" ".join(STRING_NAMES))
+    return "\n".join(lines)
+
+
+def _voicing(frets: Sequence[int], fingers: Optional[Sequence[int]]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Hashable (frets, fingers) key of a voicing; fingers are assigned when not given"""
+    if len(frets) != len(STRING_NAMES):
+        raise ValueError(f"Expected {len(STRING_NAMES)} frets, low E to high e, got {len(frets)}")
+    frets = tuple(int(fret) for fret in frets)
+    fingers = tuple(int(f) for f in fingers) if fingers else tuple(assign_fingers(frets))
+    return frets, fingers
+
+
+def render_svg(frets: Sequence[int], fingers: Optional[Sequence[int]] = None, title: str = "") -> str:
+    """
+    SVG chord diagram of a voicing
+
+    Args:
+        frets: Six fret numbers, low E to high e (-1 muted, 0 open)
+        fingers: Finger per string (1-4, 0 none); assigned from the frets when omitted
+        title: Chord name drawn above the diagram
+    """
+    return _render_svg(*_voicing(frets, fingers), title)
+
+
+def render_ascii(frets: Sequence[int], fingers: Optional[Sequence[int]] = None, title: str = "") -> str:
+    """Plain-text chord diagram of a voicing (same arguments as render_svg)"""
+    return _render_ascii(*_voicing(frets, fingers), title)
+
+
+def _ordinal(n: int) -> str:
+    return f"{n}{'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')}"
+
+
+def describe_fingering(frets: Sequence[int], fingers: Optional[Sequence[int]] = None) -> List[str]:
+    """
+    How to play a voicing, one line per finger, then open and muted strings:
+    "Index (1): barre across the 1st fret, low E to high e", "Open: D, high e"
+    """
+    frets, fingers = _voicing(frets, fingers)
+    lines = []
+    for finger in sorted(set(fingers) - {0}):
+        notes = [(string, fret) for string, fret in enumerate(frets) if fret > 0 and fingers[string] == finger]
+        name = f"{FINGER_NAMES.get(finger, 'Finger')} ({finger})"
+        if len({fret for _, fret in notes}) == 1 and len(notes) > 1:
+            first, last = notes[0][0], notes[-1][0]
+            lines.append(f"{name}: barre across the {_ordinal(notes[0][1])} fret, "
+                         f"{STRING_LABELS[first]} to {STRING_LABELS[last]}")
+        else:
+            lines.append(f"{name}: " + ", ".join(f"{_ordinal(fret)} fret {STRING_LABELS[string]} string"
+                                                  for string, fret in notes))
+    for label, value in (("Open", 0), ("Muted", MUTED)):
+        strings = [STRING_LABELS[string] for string, fret in enumerate(frets) if fret == value]
+        if strings:
+            lines.append(f"{label}: " + ", ".join(strings))
+    return lines
+
+
+def chord_shapes(chord: str) -> List[List[int]]:
+    """Frets of every known voicing of a chord name, easiest first ([] if unplayable)"""
+    record = get_voicing_table().chord(chord)
+    if record is None:
+        return []
+    root, quality, _ = split_chord(chord)
+    shapes = [list(record["frets"])]
+    for shape in chord_voicings(root, quality):
+        if shape not in shapes:
+            shapes.append(shape)
+    return shapes
+
+
+def cache_info() -> Dict[str, int]:
+    """Hits, misses and size of the diagram caches (for diagnostics)"""
+    svg, text = _render_svg.cache_info(), _render_ascii.cache_info()
+    return {"hits": svg.hits + text.hits, "misses": svg.misses + text.misses,
+            "entries": svg.currsize + text.currsize, "max_entries": 2 * DIAGRAM_CACHE_ENTRIES}
+
+
+def clear_cache():
+    """Drop every memoized diagram"""
+    _render_svg.cache_clear()
+    _render_ascii.cache_clear()
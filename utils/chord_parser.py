@@ -0,0 +1,408 @@
+"""
+Chord Parser Module
+Chord-grammar tokenizer for chord sheets: tells chord lines from lyric lines and
+returns the ordered chord sequence with positions and counts in one pass, or
+keeps them up to date line by line across edits (SheetTokens)
+
+Benchmark:
+    python -m utils.chord_parser --size-mb 20
+"""
+
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Full chord grammar: root, quality, extension, suspension, alterations/additions, slash bass
+CHORD_RE = re.compile(r"""
+    (?P<root>[A-G][#b♯♭]?)
+    (?P<quality>
+        (?:maj|Maj|M|Δ|min|mi|m|-|dim|°|aug|\+|ø)?     # triad quality or maj-7 marker
+        \(?(?:maj|Maj|M|Δ)?(?:6/9|69|13|11|9|7|6|5|4|2)?\)?       # extension, e.g. m(maj7)
+        (?:sus[24]?)?                                                   # suspension
+        (?:\(?(?:add|no|b|\#|\+|-|♭|♯)?(?:13|11|9|6|5|4|2)\)?)*  # alterations, e.g. b5, add9, (#11)
+    )
+    (?:/(?P<bass>[A-G][#b♯♭]?))?
+    """, re.X)
+
+# Tokens allowed on a chord line besides chords: bar lines, repeats, no-chord marks
+FILLER_RE = re.compile(r"^(?:[|:\-/%*.~]+|\(?[xX]\d+\)?|\(?\d+[xX]\)?|N\.?C\.?|[()])$")
+
+NOTE_RE = re.compile(r"[A-G][#b]?")
+
+INLINE_RE = re.compile(r"\[([^\]\s]+)\]")
+
+# Characters stripped from a token before matching: "[Am]", "(C)", "|G", "D|"
+TOKEN_STRIP = "[]()|{}*,"
+
+_QUALITY_SPELLINGS = [
+    ("Δ", "maj"), ("Maj", "maj"), ("min", "m"), ("mi", "m"),
+    ("°", "dim"), ("ø", "m7b5"), ("♭", "b"), ("♯", "#"),
+]
+
+# token -> normalized chord name, or None if the token is not a chord
+_token_cache: Dict[str, Optional[str]] = {}
+
+
+def normalize_chord(root: str, quality: str, bass: Optional[str]) -> str:
+    """Canonical spelling: "Amin7" -> "Am7", "CM7" -> "Cmaj7", "B♭" -> "Bb", "E7(#9)" -> "E7#9", "Dm(maj7)" -> "DmMaj7" """
+    root = root.replace("♯", "#").replace("♭", "b")
+    quality = quality.replace("(", "").replace(")", "")
+    for spelling, canonical in _QUALITY_SPELLINGS:
+        quality = quality.replace(spelling, canonical)
+    if quality.startswith("-"):
+        quality = "m" + quality[1:]
+    elif quality.startswith("+"):
+        quality = "aug" + quality[1:]
+    if quality.startswith("M"):
+        quality = ("maj" + quality[1:]) if quality[1:2].isdigit() else quality[1:]
+    # Minor-major: "m(maj7)", "mM7", "minMaj7" -> "mMaj7"
+    if quality.startswith("mmaj"):
+        quality = "mMaj" + quality[4:]
+    elif quality.startswith("mM"):
+        quality = "mMaj" + quality[2:]
+    name = root + quality
+    if bass:
+        name += "/" + bass.replace("♯", "#").replace("♭", "b")
+    return name
+
+
+def parse_chord(token: str) -> Optional[str]:
+    """Normalized chord name for a token, or None if it is not a chord (memoized)"""
+    try:
+        return _token_cache[token]
+    except KeyError:
+        pass
+    match = CHORD_RE.fullmatch(token.strip(TOKEN_STRIP))
+    chord = normalize_chord(match.group("root"), match.group("quality"), match.group("bass")) if match else None
+    if len(_token_cache) < 100000:
+        _token_cache[token] = chord
+    return chord
+
+
+def split_chord(chord: str) -> Tuple[str, str, Optional[str]]:
+    """Normalized chord name -> (root, quality, bass); "C6/9" is a quality, not a bass note"""
+    name, _, bass = chord.rpartition("/")
+    if not name or not NOTE_RE.fullmatch(bass):
+        name, bass = chord, ""
+    split = 2 if len(name) > 1 and name[1] in "#b" else 1
+    return name[:split], name[split:], bass or None
+
+
+def tokenize_line(line: str, _cached=_token_cache.get, _filler=FILLER_RE.match) -> Tuple[bool, List[Tuple[str, int]]]:
+    """
+    Chords on one line
+
+    A chord line holds only chords and filler tokens; other lines are lyrics,
+    where only inline ChordPro chords ("I [Am]love you") count.
+
+    Returns:
+        (is_chord_line, [(chord, column), ...])
+    """
+    events = []
+    position = 0
+    for token in line.split():
+        chord = _cached(token, False)
+        if chord is False:
+            chord = parse_chord(token)
+        position = line.find(token, position)
+        if chord is not None:
+            events.append((chord, position))
+        elif not _filler(token):
+            break
+        position += len(token)
+    else:
+        return bool(events), events
+
+    if "[" not in line:
+        return False, []
+    return False, [(chord, m.start()) for m in INLINE_RE.finditer(line)
+                   if (chord := parse_chord(m.group(1))) is not None]
+
+
+def tokenize_chords(text: str) -> Dict:
+    """
+    Tokenize a chord sheet
+
+    Returns:
+        {"sequence": [(chord, line, column), ...] in reading order,
+         "counts": {chord: occurrences},
+         "chords": distinct chords in order of first appearance,
+         "chord_lines": int, "lyric_lines": int}
+    """
+    sequence = []
+    counts = {}
+    chord_lines = lyric_lines = 0
+    for line_no, line in enumerate(text.splitlines()):
+        if not line.strip():
+            continue
+        is_chord_line, events = tokenize_line(line)
+        if is_chord_line:
+            chord_lines += 1
+        else:
+            lyric_lines += 1
+        for chord, column in events:
+            sequence.append((chord, line_no, column))
+            counts[chord] = counts.get(chord, 0) + 1
+    return {
+        "sequence": sequence,
+        "counts": counts,
+        "chords": list(counts),
+        "chord_lines": chord_lines,
+        "lyric_lines": lyric_lines,
+    }
+
+
+def transitions(sequence: List[Tuple]) -> Dict[Tuple[str, str], int]:
+    """Counts of consecutive chord changes (repeated chords are not a change)"""
+    counts = {}
+    previous = None
+    for event in sequence:
+        chord = event[0]
+        if previous is not None and chord != previous:
+            pair = (previous, chord)
+            counts[pair] = counts.get(pair, 0) + 1
+        previous = chord
+    return counts
+
+
+def _add_changes(counts: Dict[Tuple[str, str], int], chain: List[str], sign: int):
+    previous = None
+    for chord in chain:
+        if previous is not None and chord != previous:
+            pair = (previous, chord)
+            counts[pair] = counts.get(pair, 0) + sign
+            if not counts[pair]:
+                del counts[pair]
+        previous = chord
+
+
+class SheetTokens:
+    """
+    Tokenized chord sheet kept up to date across edits
+
+    Per-line results are kept alongside aggregate counts. update() only
+    re-tokenizes the lines between the unchanged prefix and suffix, subtracts
+    the old lines' contributions and adds the new ones, so the cost of an
+    edit follows the size of the edit rather than the size of the song.
+    """
+
+    def __init__(self, text: str = ""):
+        self.lines: List[str] = []
+        # Per line: (True chord line / False lyric line / None blank, [(chord, column), ...])
+        self.line_events: List[Tuple[Optional[bool], List[Tuple[str, int]]]] = []
+        self.counts: Dict[str, int] = {}
+        self.changes: Dict[Tuple[str, str], int] = {}
+        self.chord_lines = 0
+        self.lyric_lines = 0
+        self.hits = 0
+        # Results derived from the chord sequence (e.g. modulations); cleared whenever it changes
+        self.derived: Dict = {}
+        if text:
+            self.update(text)
+
+    def _neighbour_chord(self, start: int, step: int) -> Optional[str]:
+        i = start
+        while 0 <= i < len(self.line_events):
+            events = self.line_events[i][1]
+            if events:
+                return events[0][0] if step > 0 else events[-1][0]
+            i += step
+        return None
+
+    def update(self, text: str) -> int:
+        """
+        Bring the tokens in line with the new text
+
+        Returns:
+            Number of lines that were re-tokenized
+        """
+        old, new = self.lines, text.splitlines()
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+            suffix += 1
+        old_end, new_end = len(old) - suffix, len(new) - suffix
+        if prefix == old_end and prefix == new_end:
+            return 0
+
+        before = self._neighbour_chord(prefix - 1, -1)
+        after = self._neighbour_chord(old_end, 1)
+        removed = self.line_events[prefix:old_end]
+        added = []
+        for line in new[prefix:new_end]:
+            added.append(tokenize_line(line) if line.strip() else (None, []))
+
+        old_chain = [chord for _, events in removed for chord, _ in events]
+        new_chain = [chord for _, events in added for chord, _ in events]
+        for sign, results in ((-1, removed), (1, added)):
+            for kind, events in results:
+                if kind is True:
+                    self.chord_lines += sign
+                elif kind is False:
+                    self.lyric_lines += sign
+                for chord, _ in events:
+                    self.counts[chord] = self.counts.get(chord, 0) + sign
+                    if not self.counts[chord]:
+                        del self.counts[chord]
+                self.hits += sign * len(events)
+
+        if old_chain != new_chain:
+            head = [before] if before else []
+            tail = [after] if after else []
+            _add_changes(self.changes, head + old_chain + tail, -1)
+            _add_changes(self.changes, head + new_chain + tail, 1)
+            self.derived.clear()
+
+        self.lines = new
+        self.line_events[prefix:old_end] = added
+        return len(added)
+
+    def sequence(self) -> List[Tuple[str, int, int]]:
+        """[(chord, line, column), ...] in reading order (built on demand)"""
+        return [(chord, line_no, column)
+                for line_no, (_, events) in enumerate(self.line_events) for chord, column in events]
+
+    def chord_sequence(self) -> List[str]:
+        """Chord names in reading order (built on demand)"""
+        return [chord for _, events in self.line_events for chord, _ in events]
+
+    def tokens(self) -> Dict:
+        """
+        Aggregates without walking the song
+
+        Returns:
+            {"counts", "chords" (sorted), "changes", "hits", "first", "last",
+             "chord_lines", "lyric_lines"}
+        """
+        return {
+            "counts": self.counts,
+            "chords": sorted(self.counts),
+            "changes": self.changes,
+            "hits": self.hits,
+            "first": self._neighbour_chord(0, 1),
+            "last": self._neighbour_chord(len(self.line_events) - 1, -1),
+            "chord_lines": self.chord_lines,
+            "lyric_lines": self.lyric_lines,
+        }
+
+
+# Chords of a streamed sheet kept in order for modulation tracking; counts cover the whole sheet
+MAX_STREAM_SEQUENCE = 200000
+
+
+class ChordStream:
+    """
+    Chord tokens of a sheet fed in text chunks, without keeping the text
+
+    Memory stays bounded by the chord vocabulary and MAX_STREAM_SEQUENCE,
+    whatever the size of the sheet. Offers the same tokens() and
+    chord_sequence() views as SheetTokens.
+    """
+
+    def __init__(self, max_sequence: int = MAX_STREAM_SEQUENCE):
+        self.max_sequence = max_sequence
+        self.counts: Dict[str, int] = {}
+        self.changes: Dict[Tuple[str, str], int] = {}
+        self.chord_lines = 0
+        self.lyric_lines = 0
+        self.hits = 0
+        self.first: Optional[str] = None
+        self.last: Optional[str] = None
+        self.derived: Dict = {}
+        self._sequence: List[str] = []
+        self._partial = ""
+
+    def feed(self, text: str):
+        """Tokenize the complete lines of a chunk; a trailing partial line waits for the next chunk"""
+        lines = (self._partial + text).splitlines(keepends=True)
+        self._partial = ""
+        if lines and lines[-1].splitlines()[0] == lines[-1]:
+            self._partial = lines.pop()
+        for line in lines:
+            self._feed_line(line.splitlines()[0])
+
+    def close(self):
+        """Tokenize the last line (call once the stream is exhausted)"""
+        if self._partial:
+            self._feed_line(self._partial)
+            self._partial = ""
+
+    def _feed_line(self, line: str):
+        if not line.strip():
+            return
+        is_chord_line, events = tokenize_line(line)
+        if is_chord_line:
+            self.chord_lines += 1
+        else:
+            self.lyric_lines += 1
+        previous = self.last
+        for chord, _ in events:
+            self.counts[chord] = self.counts.get(chord, 0) + 1
+            if previous is not None and chord != previous:
+                pair = (previous, chord)
+                self.changes[pair] = self.changes.get(pair, 0) + 1
+            previous = chord
+            if len(self._sequence) < self.max_sequence:
+                self._sequence.append(chord)
+        if events:
+            self.hits += len(events)
+            self.first = self.first or events[0][0]
+            self.last = previous
+            self.derived.clear()
+
+    def chord_sequence(self) -> List[str]:
+        """Chord names in reading order (the first max_sequence of them)"""
+        return self._sequence
+
+    def tokens(self) -> Dict:
+        """Aggregates in the same shape as SheetTokens.tokens()"""
+        return {
+            "counts": self.counts,
+            "chords": sorted(self.counts),
+            "changes": self.changes,
+            "hits": self.hits,
+            "first": self.first,
+            "last": self.last,
+            "chord_lines": self.chord_lines,
+            "lyric_lines": self.lyric_lines,
+        }
+
+
+SAMPLE_SHEET = """[Intro]
+Em7  G  Dsus4  A7sus4   x2
+
+[Verse]
+Em7          G            Dsus4        A7sus4
+Today is gonna be the day that they're gonna throw it back to you
+Em7          G            Dsus4        A7sus4
+By now you should've somehow realized what you gotta do
+| Cadd9 | D/F# | Bm7b5 | E7(#9) |
+I [Am]don't believe that [F]anybody [C/G]feels the way I [G6]do
+C#m  Bbmaj7  F#m7  Absus2  Gadd9  N.C.
+"""
+
+
+def benchmark(size_mb: float = 10.0) -> Dict:
+    """Tokenize a synthetic sheet of `size_mb` megabytes and report throughput"""
+    repeats = max(1, int(size_mb * 1024 * 1024 / len(SAMPLE_SHEET.encode())))
+    text = SAMPLE_SHEET * repeats
+    start = time.perf_counter()
+    result = tokenize_chords(text)
+    elapsed = time.perf_counter() - start
+    megabytes = len(text.encode()) / (1024 * 1024)
+    return {
+        "megabytes": round(megabytes, 2),
+        "seconds": round(elapsed, 3),
+        "mb_per_second": round(megabytes / elapsed, 1),
+        "chords": len(result["sequence"]),
+        "distinct": len(result["chords"]),
+    }
+
+
+if __name__ == "__main__":
+    size = float(sys.argv[sys.argv.index("--size-mb") + 1]) if "--size-mb" in sys.argv else 10.0
+    print(benchmark(size))
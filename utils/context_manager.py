@@ -0,0 +1,211 @@
+"""
+Conversation Context Module
+Packs multi-turn chat history into a fixed token budget with a rolling summary
+"""
+
+import re
+from typing import Callable, Dict, List, Optional
+
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Count tokens with tiktoken when installed, otherwise ~4 characters per token"""
+    global _encoding
+    if not text:
+        return 0
+    if HAS_TIKTOKEN:
+        try:
+            if _encoding is None:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            return len(_encoding.encode(text))
+        except Exception:
+            pass
+    return max(1, (len(text) + 3) // 4)
+
+
+def _first_sentence(text: str, limit: int = 160) -> str:
+    """First sentence or heading of a message, stripped of markdown decoration"""
+    for line in text.splitlines():
+        line = re.sub(r"[*_#`>]+", "", line).strip(" -🎸")
+        if line:
+            sentence = re.split(r"(?<=[.!?])\s", line, maxsplit=1)[0]
+            return sentence[:limit]
+    return ""
+
+
+def summarize_turns(previous_summary: str, turns: List[Dict], token_budget: int) -> str:
+    """
+    Local extractive summarizer: one line per folded turn, oldest lines dropped first
+
+    Args:
+        previous_summary: Summary produced by earlier folds
+        turns: Chat messages being folded into the summary
+        token_budget: Maximum size of the resulting summary
+
+    Returns:
+        Updated summary text
+    """
+    lines = [line for line in previous_summary.splitlines() if line.strip()]
+    for turn in turns:
+        gist = _first_sentence(turn.get("content", ""))
+        if not gist:
+            continue
+        prefix = "User asked" if turn.get("role") == "user" else "Assistant covered"
+        lines.append(f"- {prefix}: {gist}")
+
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > token_budget:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationContext:
+    """Token-budgeted view over a chat history with a rolling summary of older turns"""
+
+    def __init__(self, token_budget: int = 1500, summary_budget: int = 300,
+                 summarizer: Optional[Callable[[str, List[Dict], int], str]] = None):
+        """
+        Args:
+            token_budget: Maximum prompt tokens (system + summary + turns + message)
+            summary_budget: Maximum tokens spent on the rolling summary
+            summarizer: Callable(previous_summary, turns, budget) -> summary
+        """
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.summarizer = summarizer or summarize_turns
+
+        # Rolling summary covers history[:summarized_count]
+        self.summary = ""
+        self.summarized_count = 0
+
+        # Token counts per history message, extended incrementally
+        self._token_counts = []
+        self._history_tokens = 0
+        self._last_counted = None
+        # Turns the caller archived and their tokens (still counted as history in the stats)
+        self._archived_count = 0
+        self._archived_tokens = 0
+
+        self.last_stats = {}
+        self.total_tokens_saved = 0
+
+    def reset(self):
+        """Forget the summary and cached counts (e.g. after the history is cleared)"""
+        self.summary = ""
+        self.summarized_count = 0
+        self._token_counts = []
+        self._history_tokens = 0
+        self._last_counted = None
+        self._archived_count = 0
+        self._archived_tokens = 0
+
+    def archive(self, history: List[Dict], count: int):
+        """
+        The caller is about to drop history[:count] from memory; fold any of
+        those turns not yet summarized into the summary and re-base the
+        counters, so the next build_messages() sees the shortened history
+        as a continuation rather than an edit
+        """
+        count = min(count, len(history))
+        if count <= 0:
+            return
+        counts = self._message_tokens(history)
+        if count > self.summarized_count:
+            self.summary = self.summarizer(
+                self.summary, history[self.summarized_count:count], self.summary_budget
+            )
+            self.summarized_count = count
+        archived = sum(counts[:count])
+        self._archived_count += count
+        self._archived_tokens += archived
+        self._history_tokens -= archived
+        del self._token_counts[:count]
+        self.summarized_count -= count
+        if not self._token_counts:
+            self._last_counted = None
+
+    def _message_tokens(self, history: List[Dict]) -> List[int]:
+        """Token count per history message, only counting messages not seen before"""
+        known = len(self._token_counts)
+        if known > len(history) or (known and history[known - 1].get("content") != self._last_counted):
+            # History was edited or cleared - start over
+            self.reset()
+            known = 0
+
+        for msg in history[known:]:
+            content = msg.get("content", "")
+            tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+            self._token_counts.append(tokens)
+            self._history_tokens += tokens
+            self._last_counted = content
+        return self._token_counts
+
+    def build_messages(self, history: List[Dict], message: str, system_msg: str) -> List[Dict]:
+        """
+        Build the chat messages for the next request within the token budget
+
+        Args:
+            history: Earlier turns ({"role", "content"} dicts), oldest first,
+                not including the current message
+            message: The new user message
+            system_msg: System prompt
+
+        Returns:
+            Messages list ready for the chat completions API
+        """
+        counts = self._message_tokens(history)
+        fixed = (estimate_tokens(system_msg) + estimate_tokens(message)
+                 + 2 * MESSAGE_OVERHEAD_TOKENS)
+        window_budget = max(0, self.token_budget - fixed - self.summary_budget)
+
+        # Walk back from the newest turn until the window is full
+        keep_from = len(history)
+        used = 0
+        while keep_from > self.summarized_count and used + counts[keep_from - 1] <= window_budget:
+            keep_from -= 1
+            used += counts[keep_from]
+
+        if keep_from > self.summarized_count:
+            # Fold down to a low-water mark so summarization runs every few turns, not every turn
+            low_water = window_budget // 2
+            while keep_from < len(history) and used > low_water:
+                used -= counts[keep_from]
+                keep_from += 1
+            self.summary = self.summarizer(
+                self.summary, history[self.summarized_count:keep_from], self.summary_budget
+            )
+            self.summarized_count = keep_from
+        keep_from = max(keep_from, self.summarized_count)
+
+        messages = [{"role": "system", "content": system_msg}]
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.summary}"
+            })
+        for msg in history[keep_from:]:
+            messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.append({"role": "user", "content": message})
+
+        summary_tokens = estimate_tokens(self.summary) + MESSAGE_OVERHEAD_TOKENS if self.summary else 0
+        sent = fixed + summary_tokens + sum(counts[keep_from:])
+        full = fixed + self._archived_tokens + self._history_tokens
+        saved = max(0, full - sent)
+        self.total_tokens_saved += saved
+        self.last_stats = {
+            "prompt_tokens": sent,
+            "full_history_tokens": full,
+            "tokens_saved": saved,
+            "turns_sent": len(history) - keep_from,
+            "turns_summarized": self._archived_count + self.summarized_count,
+        }
+        return messages
@@ -0,0 +1,111 @@
+"""
+Ingest Module
+Streaming song-file ingestion: detects the encoding, decodes in fixed-size
+chunks and feeds the chord tokenizer as it goes, so memory stays bounded by
+the chunk size and the stored excerpt rather than the file size
+"""
+
+import codecs
+from typing import BinaryIO, Callable, Dict, Optional
+
+from .chord_parser import ChordStream
+
+CHUNK_BYTES = 1024 * 1024
+
+# Text kept for display and editing; longer songs keep this much of their beginning
+MAX_STORED_CHARS = 512 * 1024
+
+PREVIEW_CHARS = 500
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def detect_encoding(head: bytes) -> str:
+    """
+    Encoding of a song file from its first bytes
+
+    A byte-order mark wins; otherwise UTF-8 if the head decodes as UTF-8
+    (a character cut off at the end is fine), else Windows-1252, the usual
+    encoding of older chord sheets.
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def decode_song(data: bytes) -> str:
+    """Song file bytes as text in their detected encoding (undecodable bytes replaced)"""
+    return data.decode(detect_encoding(data[:CHUNK_BYTES]), errors="replace")
+
+
+def read_preview(stream: BinaryIO, chars: int = PREVIEW_CHARS) -> str:
+    """First characters of a song file, reading only the bytes needed (rewinds the stream)"""
+    stream.seek(0)
+    head = stream.read(chars * 4)
+    stream.seek(0)
+    return head.decode(detect_encoding(head), errors="replace")[:chars]
+
+
+def ingest_song(stream: BinaryIO, total_bytes: Optional[int] = None,
+                progress: Optional[Callable[[float], None]] = None,
+                chunk_bytes: int = CHUNK_BYTES, max_stored_chars: int = MAX_STORED_CHARS) -> Dict:
+    """
+    Stream a song file through the chord tokenizer
+
+    Args:
+        stream: Binary file object (e.g. a Streamlit UploadedFile), read from the start
+        total_bytes: File size, for progress reporting
+        progress: Called with the fraction read after every chunk
+
+    Returns:
+        {"tokens": ChordStream over the whole file, "content": the first max_stored_chars
+         characters, "truncated": bool, "encoding": str, "bytes": int}
+    """
+    stream.seek(0)
+    chunk = stream.read(chunk_bytes)
+    encoding = detect_encoding(chunk)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    tokens = ChordStream()
+    stored, stored_chars, truncated = [], 0, False
+    read = 0
+
+    while chunk:
+        read += len(chunk)
+        text = decoder.decode(chunk)
+        tokens.feed(text)
+        if stored_chars < max_stored_chars:
+            piece = text[:max_stored_chars - stored_chars]
+            stored.append(piece)
+            stored_chars += len(piece)
+            truncated = truncated or len(piece) < len(text)
+        elif text:
+            truncated = True
+        if progress and total_bytes:
+            progress(min(1.0, read / total_bytes))
+        chunk = stream.read(chunk_bytes)
+
+    tail = decoder.decode(b"", final=True)
+    tokens.feed(tail)
+    tokens.close()
+    if tail:
+        truncated = truncated or stored_chars >= max_stored_chars
+        if not truncated:
+            stored.append(tail)
+    return {
+        "tokens": tokens,
+        "content": "".join(stored),
+        "truncated": truncated,
+        "encoding": encoding,
+        "bytes": read,
+    }
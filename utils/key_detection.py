@@ -0,0 +1,228 @@
+"""
+Key Detection Module
+Chord-sequence key estimation against the 24 major/minor key profiles, with
+sliding-window modulation tracking and batch scoring (NumPy, no network needed)
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .chord_parser import split_chord
+
+NOTE_NAMES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+NOTE_INDEX = {
+    "C": 0, "B#": 0, "C#": 1, "Db": 1, "D": 2, "D#": 3, "Eb": 3, "E": 4, "Fb": 4, "E#": 5, "F": 5,
+    "F#": 6, "Gb": 6, "G": 7, "G#": 8, "Ab": 8, "A": 9, "A#": 10, "Bb": 10, "B": 11, "Cb": 11,
+}
+
+# Krumhansl-Kessler probe-tone profiles, tonic first
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+KEY_NAMES = [f"{NOTE_NAMES[i]} major" for i in range(12)] + [f"{NOTE_NAMES[i]} minor" for i in range(12)]
+
+
+def _zscore(matrix: np.ndarray) -> np.ndarray:
+    centered = matrix - matrix.mean(axis=-1, keepdims=True)
+    norm = np.linalg.norm(centered, axis=-1, keepdims=True)
+    return centered / np.where(norm == 0, 1.0, norm)
+
+
+# 24 x 12: every rotation of both profiles, normalized so a matmul gives Pearson correlations
+KEY_PROFILES = _zscore(np.stack([np.roll(MAJOR_PROFILE, i) for i in range(12)]
+                                + [np.roll(MINOR_PROFILE, i) for i in range(12)]))
+
+# Chord tone weights
+ROOT_WEIGHT = 1.5
+BASS_WEIGHT = 0.5
+
+_vector_cache: Dict[str, np.ndarray] = {}
+
+
+def chord_intervals(quality: str) -> List[int]:
+    """Semitone intervals above the root for a normalized chord quality ("m7b5" -> [0, 3, 6, 10])"""
+    third, fifth = 4, 7
+    q = quality
+    if q.startswith("m") and not q.startswith("maj"):
+        third, q = 3, q[1:]
+    elif q.startswith("dim"):
+        third, fifth, q = 3, 6, q[3:]
+    elif q.startswith("aug"):
+        fifth, q = 8, q[3:]
+
+    if "sus2" in q:
+        third = 2
+    elif "sus" in q:
+        third = 5
+    if q.startswith("5"):
+        third = None
+
+    intervals = {0, fifth} if third is None else {0, third, fifth}
+    if q.startswith(("maj", "Maj")) and any(d in q for d in ("7", "9", "11", "13")):
+        intervals.add(11)
+    elif quality.startswith("dim") and q.startswith("7"):
+        intervals.add(9)
+    elif any(q.startswith(d) for d in ("7", "9", "11", "13")):
+        intervals.add(10)
+    if "6" in q:
+        intervals.add(9)
+    if "9" in q and "b9" not in q and "#9" not in q:
+        intervals.add(2)
+    if "add2" in q:
+        intervals.add(2)
+    if "11" in q and "#11" not in q:
+        intervals.add(5)
+    if "13" in q and "b13" not in q:
+        intervals.add(9)
+    for alteration, old, new in (("b5", 7, 6), ("#5", 7, 8)):
+        if alteration in q:
+            intervals.discard(old)
+            intervals.add(new)
+    for alteration, interval in (("b9", 1), ("#9", 3), ("#11", 6), ("b13", 8)):
+        if alteration in q:
+            intervals.add(interval)
+    return sorted(intervals)
+
+
+def chord_vector(chord: str) -> np.ndarray:
+    """Weighted 12-bin pitch-class vector of a normalized chord name (memoized)"""
+    vector = _vector_cache.get(chord)
+    if vector is None:
+        root, quality, bass = split_chord(chord)
+        vector = np.zeros(12)
+        if root in NOTE_INDEX:
+            r = NOTE_INDEX[root]
+            for interval in chord_intervals(quality):
+                vector[(r + interval) % 12] += 1.0
+            vector[r] += ROOT_WEIGHT - 1.0
+            if bass in NOTE_INDEX:
+                vector[NOTE_INDEX[bass]] += BASS_WEIGHT
+        _vector_cache[chord] = vector
+    return vector
+
+
+def sequence_matrix(chords: Sequence[str]) -> np.ndarray:
+    """len(chords) x 12 pitch-class matrix"""
+    if not chords:
+        return np.zeros((0, 12))
+    # Stack each distinct chord once, then expand by index
+    vocabulary: Dict[str, int] = {}
+    ids = [vocabulary.setdefault(c, len(vocabulary)) for c in chords]
+    return np.stack([chord_vector(c) for c in vocabulary])[ids]
+
+
+def histogram(chords: Sequence[str]) -> np.ndarray:
+    """Pitch-class histogram of a chord sequence; the first and last chords count extra (tonic hints)"""
+    matrix = sequence_matrix(chords)
+    if not len(matrix):
+        return np.zeros(12)
+    hist = matrix.sum(axis=0)
+    hist += 0.5 * (matrix[0] + matrix[-1])
+    return hist
+
+
+def _describe(scores: np.ndarray) -> Dict:
+    order = np.argsort(scores)[::-1]
+    best, second = int(order[0]), int(order[1])
+    return {
+        "key": KEY_NAMES[best],
+        "tonic": NOTE_NAMES[best % 12],
+        "mode": "major" if best < 12 else "minor",
+        "correlation": round(float(scores[best]), 3),
+        # Gap to the runner-up; relative major/minor pairs are often close
+        "confidence": round(float(scores[best] - scores[second]), 3),
+        "runner_up": KEY_NAMES[second],
+    }
+
+
+def detect_keys(sequences: List[Sequence[str]]) -> List[Optional[Dict]]:
+    """
+    Keys of many chord sequences at once
+
+    All histograms are built with one scatter-add over a shared chord
+    vocabulary, then scored with one (n x 12) @ (12 x 24) multiply.
+
+    Returns:
+        One dict per sequence (key, tonic, mode, correlation, confidence, runner_up),
+        None for sequences without chords
+    """
+    if not sequences:
+        return []
+    vocabulary, chord_ids, song_ids, weights = {}, [], [], []
+    for song, chords in enumerate(sequences):
+        last = len(chords) - 1
+        for position, chord in enumerate(chords):
+            chord_ids.append(vocabulary.setdefault(chord, len(vocabulary)))
+            song_ids.append(song)
+            # The first and last chords count extra (tonic hints)
+            weights.append(1.5 if position == 0 or position == last else 1.0)
+
+    if not vocabulary:
+        return [None] * len(sequences)
+
+    counts = np.zeros((len(sequences), len(vocabulary)))
+    np.add.at(counts, (np.array(song_ids), np.array(chord_ids)), weights)
+    histograms = counts @ sequence_matrix(list(vocabulary))
+    scores = _zscore(histograms) @ KEY_PROFILES.T
+    return [_describe(row) if len(s) else None for row, s in zip(scores, sequences)]
+
+
+def detect_key(chords: Sequence[str]) -> Optional[Dict]:
+    """Key of one chord sequence (see detect_keys)"""
+    return detect_keys([chords])[0]
+
+
+def key_from_counts(counts: Dict[str, int], first: Optional[str] = None, last: Optional[str] = None) -> Optional[Dict]:
+    """
+    Key from chord occurrence counts (see detect_keys)
+
+    Gives the same answer as detect_key on the full sequence without walking
+    it, for callers that keep running counts (chord_parser.SheetTokens).
+    """
+    if not counts:
+        return None
+    hist = sum(count * chord_vector(chord) for chord, count in counts.items())
+    # A one-chord song's first chord is also its last: one position, one bonus
+    for chord in (first, last) if sum(counts.values()) > 1 else (first or last,):
+        if chord:
+            hist = hist + 0.5 * chord_vector(chord)
+    return _describe(_zscore(hist) @ KEY_PROFILES.T)
+
+
+def detect_modulations(chords: Sequence[str], window: int = 8, min_run: Optional[int] = None) -> List[Dict]:
+    """
+    Key changes along a sequence
+
+    Every window of `window` chords is scored in one multiply (window sums come
+    from a cumulative sum); a new key must hold for `min_run` consecutive
+    windows (default half a window) to count, which ignores passing borrowed
+    chords and pivot regions.
+
+    Returns:
+        [{"index": chord position where the key starts, "key": ...}, ...] - the first entry is the opening key
+    """
+    min_run = min_run or max(2, window // 2)
+    if len(chords) < window:
+        key = detect_key(chords)
+        return [{"index": 0, "key": key["key"]}] if key else []
+
+    cumulative = np.vstack([np.zeros(12), np.cumsum(sequence_matrix(chords), axis=0)])
+    windows = cumulative[window:] - cumulative[:-window]
+    keys = np.argmax(_zscore(windows) @ KEY_PROFILES.T, axis=1)
+
+    regions = [{"index": 0, "key": KEY_NAMES[int(keys[0])]}]
+    current, run_start = int(keys[0]), None
+    for i in range(1, len(keys)):
+        k = int(keys[i])
+        if k == current:
+            run_start = None
+            continue
+        if run_start is None or int(keys[run_start]) != k:
+            run_start = i
+        if i - run_start + 1 >= min_run:
+            current = k
+            # Windows overlapping the change are mixed, so the first window in the new key starts near it
+            regions.append({"index": run_start, "key": KEY_NAMES[k]})
+            run_start = None
+    return regions
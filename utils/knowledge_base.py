@@ -0,0 +1,96 @@
+"""
+Knowledge Base Module
+Static guitar content - technique guides, rule-based answers and the chord library -
+loaded from utils/data/knowledge_base.json once per process
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "knowledge_base.json")
+
+
+def _index_key(name: str) -> str:
+    """"Hammer-On", "hammer on", "HAMMER ON" -> "hammer on" """
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+
+
+def render_technique(name: str, defn: Dict) -> str:
+    """Markdown guide for a technique definition"""
+    explanation = f"""
+# 🎸 {name.upper()}
+
+## Definition
+{defn['definition']}
+
+## Step-by-Step Instructions
+"""
+    for i, step in enumerate(defn['steps'], 1):
+        explanation += f"\n{i}. {step}"
+
+    explanation += "\n\n## Common Mistakes to Avoid\n"
+    for mistake in defn['mistakes']:
+        explanation += f"- ❌ {mistake}\n"
+
+    explanation += "\n## Practice Tips\n"
+    for tip in defn['tips']:
+        explanation += f"- ✅ {tip}\n"
+
+    explanation += "\n## Songs Using This Technique\n"
+    for song in defn['songs']:
+        explanation += f"- 🎵 {song}\n"
+
+    return explanation
+
+
+class KnowledgeBase:
+    """
+    Indexed static content; shared by every session, so treat the returned
+    dicts and lists as read-only
+    """
+
+    def __init__(self, path: str = DATA_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.techniques: Dict[str, Dict] = data["techniques"]
+        self.rule_responses: Dict[str, str] = data["rule_responses"]
+        self.chords: Dict[str, Dict] = data["chords"]
+
+        self._technique_names = {_index_key(name): name for name in self.techniques}
+        self._technique_markdown = {name: render_technique(name, defn) for name, defn in self.techniques.items()}
+
+        self.chord_names: List[str] = list(self.chords)
+        self.chord_categories: Dict[str, List[str]] = {}
+        for chord_name, chord_data in self.chords.items():
+            self.chord_categories.setdefault(chord_data["category"], []).append(chord_name)
+
+    def technique_name(self, technique: str) -> Optional[str]:
+        """Canonical name of a technique, matched ignoring case and punctuation"""
+        return self._technique_names.get(_index_key(technique))
+
+    def technique_markdown(self, technique: str) -> Optional[str]:
+        """Pre-rendered guide for a technique (None if it is not in the knowledge base)"""
+        name = self.technique_name(technique)
+        return self._technique_markdown[name] if name else None
+
+    def rule_response(self, intent: Optional[str]) -> str:
+        """Canned answer for a rule-based intent (the general answer for None or unknown intents)"""
+        return self.rule_responses.get(intent or "default", self.rule_responses["default"])
+
+
+_knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """Process-wide knowledge base, loaded on first use"""
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                _knowledge_base = KnowledgeBase()
+    return _knowledge_base
@@ -0,0 +1,270 @@
+"""
+Local Planner Module
+Deterministic practice plans and learning paths from chord vocabularies (no network needed)
+"""
+
+import bisect
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .chord_parser import parse_chord
+from .practice_plans import LEVELS, PRACTICE_DAYS, segment_key
+from .voicings import chord_difficulty, transition_cost
+
+# Chord vocabularies and techniques of songs offered in the app
+SONG_CATALOG = {
+    segment_key(song, artist, "", ""): {"song": song, "artist": artist, "chords": chords, "techniques": techniques}
+    for song, artist, chords, techniques in [
+        ("Wonderwall", "Oasis", ["Em7", "G", "Dsus4", "A7sus4", "Cadd9"], ["Strumming", "Capo"]),
+        ("Knockin' On Heaven's Door", "Bob Dylan", ["G", "D", "Am", "C"], ["Strumming"]),
+        ("Horse With No Name", "America", ["Em", "Dadd9"], ["Strumming"]),
+        ("Let It Be", "The Beatles", ["C", "G", "Am", "F", "Fmaj7", "C/E", "Dm"], ["Strumming", "Barre Chord"]),
+        ("Sweet Home Alabama", "Lynyrd Skynyrd", ["D", "Cadd9", "G", "C"], ["Strumming", "Hammer-On"]),
+        ("Stairway to Heaven", "Led Zeppelin",
+         ["Am", "Am/G", "D/F#", "Fmaj7", "G", "C", "D", "Dsus4", "Em"], ["Fingerpicking", "Hammer-On", "Bends"]),
+        ("Hotel California", "Eagles", ["Bm", "F#", "A", "E", "G", "D", "Em", "F#7"], ["Barre Chord", "Fingerpicking", "Bends"]),
+        ("Comfortably Numb", "Pink Floyd", ["Bm", "A", "G", "Em", "D", "C"], ["Barre Chord", "Bends", "Vibrato"]),
+        ("Cliffs of Dover", "Eric Johnson", ["G", "D", "Em", "C", "Am", "Bm", "D/F#"],
+         ["Hybrid Picking", "Legato", "Alternate Picking", "Vibrato"]),
+        ("Eruption", "Van Halen", ["A5", "E5"], ["Tapping", "Tremolo Picking", "Vibrato"]),
+        ("Capriccio Diabolico", "Jason Becker", ["Am", "Dm", "E", "E7"], ["Sweep Picking", "Alternate Picking", "Legato"]),
+    ]
+}
+
+# 1 (easy) to 5 (hard)
+TECHNIQUE_LEVELS = {
+    "Strumming": 1, "Capo": 1, "Fingerpicking": 2, "Hammer-On": 2, "Pull-Off": 2, "Slide": 2,
+    "Barre Chord": 3, "Bends": 3, "Vibrato": 3, "Palm Muting": 2, "Alternate Picking": 3,
+    "Legato": 4, "Hybrid Picking": 4, "Tremolo Picking": 4, "Tapping": 5, "Sweep Picking": 5,
+}
+
+# Voicing scores (see utils/voicings.py) separating chord tiers 1-4: easy open, harder open, barre, hard barre
+CHORD_TIER_LIMITS = (2.5, 3.5, 6.0)
+
+# Chords a player at each level is assumed to know (maximum chord score)
+KNOWN_CHORD_SCORE = {"Beginner": 0, "Intermediate": 2, "Advanced": 3}
+
+# Minutes of practice needed per unit of work
+MINUTES_PER_CHORD_POINT = 40
+MINUTES_PER_TECHNIQUE_POINT = 60
+MINUTES_PER_DIFFICULTY = 90
+
+# Fallback vocabulary for songs without known chords
+DEFAULT_CHORDS = ["G", "C", "D", "Em"]
+
+
+def chord_score(chord: str) -> int:
+    """Fretting difficulty of a chord name, 1 (open) to 4 (complex or high barre), from its easiest voicing"""
+    name = parse_chord(chord)
+    record = chord_difficulty(name) if name else None
+    if record is None:
+        return 3
+    return 1 + bisect.bisect_right(CHORD_TIER_LIMITS, record["score"])
+
+
+def song_difficulty(chords: List[str], techniques: Iterable[str]) -> int:
+    """1-5 from the hardest chords and techniques in a song"""
+    scores = sorted((chord_score(c) for c in chords), reverse=True)
+    chord_level = round(sum(scores[:3]) / len(scores[:3])) if scores else 1
+    if len(chords) > 8:
+        chord_level += 1
+    technique_level = max((TECHNIQUE_LEVELS.get(t, 3) for t in techniques), default=1)
+    return min(5, max(1, chord_level, technique_level))
+
+
+def lookup_song(song: str, artist: str) -> Optional[Dict]:
+    """Catalog entry for a song (artist optional)"""
+    entry = SONG_CATALOG.get(segment_key(song, artist, "", ""))
+    if entry is None and not artist:
+        title = segment_key(song, "", "", "").split("|")[0]
+        entry = next((e for key, e in SONG_CATALOG.items() if key.split("|")[0] == title), None)
+    return entry
+
+
+def known_for_level(level: str, chords: Iterable[str], techniques: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+    """Chords and techniques a player at `level` is assumed to have learned already"""
+    max_score = KNOWN_CHORD_SCORE.get(level, 0)
+    level_index = LEVELS.index(level) if level in LEVELS else 0
+    return ({c for c in chords if chord_score(c) <= max_score},
+            {t for t in techniques if TECHNIQUE_LEVELS.get(t, 3) <= level_index + 1})
+
+
+def allocate_week(week: int, weeks: int, has_new_chords: bool, has_new_techniques: bool,
+                  minutes_per_day: int) -> Dict[str, int]:
+    """
+    Daily minutes per activity for one week
+
+    New material dominates the first weeks and gives way to playing the song.
+    """
+    progress = (week - 1) / max(1, weeks - 1)
+    weights = {
+        "New chords": (0.4 * (1 - progress)) if has_new_chords else 0.0,
+        "Chord changes": 0.3 - 0.15 * progress,
+        "Technique": (0.25 - 0.1 * progress) if has_new_techniques else 0.0,
+        "Warm-up": 0.1,
+    }
+    weights["Song practice"] = max(0.0, 1.0 - sum(weights.values()))
+    total = sum(weights.values())
+    allocation = {name: int(minutes_per_day * w / total) for name, w in weights.items() if w > 0}
+    # Rounding leftovers go to playing the song
+    allocation["Song practice"] = allocation.get("Song practice", 0) + minutes_per_day - sum(allocation.values())
+    return {name: minutes for name, minutes in allocation.items() if minutes > 0}
+
+
+def transition_pairs(chords: List[str], limit: int = 3) -> List[Tuple[str, str]]:
+    """Consecutive chord changes, hardest first by fingering transition cost"""
+    pairs = list(zip(chords, chords[1:] + chords[:1])) if len(chords) > 1 else []
+    pairs.sort(key=lambda p: transition_cost(parse_chord(p[0]) or p[0], parse_chord(p[1]) or p[1]) or 0.0,
+               reverse=True)
+    return pairs[:limit]
+
+
+def plan_segment(song: str, artist: str, current_level: str, goal_level: str, hours_per_week: int,
+                 chords: Optional[List[str]] = None, techniques: Optional[List[str]] = None,
+                 known_chords: Optional[Set[str]] = None, known_techniques: Optional[Set[str]] = None) -> Dict:
+    """
+    Plan segment for one song, in the practice_plans segment format plus a daily time allocation
+
+    Args:
+        chords / techniques: Override or supply the song's vocabulary (catalog is used otherwise)
+        known_chords / known_techniques: Already learned, e.g. from earlier songs in a path
+    """
+    entry = lookup_song(song, artist) or {}
+    chords = list(chords or entry.get("chords") or DEFAULT_CHORDS)
+    techniques = list(techniques or entry.get("techniques") or ["Strumming"])
+    level_chords, level_techniques = known_for_level(current_level, chords, techniques)
+    known_chords = level_chords | (known_chords or set())
+    known_techniques = level_techniques | (known_techniques or set())
+
+    new_chords = sorted((c for c in chords if c not in known_chords), key=chord_score)
+    new_techniques = [t for t in techniques if t not in known_techniques]
+    difficulty = song_difficulty(chords, techniques)
+
+    # Goal above the current level adds polishing work
+    level_gap = max(0, LEVELS.index(goal_level) - LEVELS.index(current_level)) \
+        if goal_level in LEVELS and current_level in LEVELS else 0
+    needed = (sum(chord_score(c) for c in new_chords) * MINUTES_PER_CHORD_POINT
+              + sum(TECHNIQUE_LEVELS.get(t, 3) for t in new_techniques) * MINUTES_PER_TECHNIQUE_POINT
+              + difficulty * MINUTES_PER_DIFFICULTY * (1 + 0.5 * level_gap))
+    weekly_minutes = max(30, hours_per_week * 60)
+    weeks = min(12, max(1, math.ceil(needed / weekly_minutes)))
+    minutes_per_day = round(weekly_minutes / PRACTICE_DAYS)
+
+    hardest = transition_pairs(chords)
+    plan_weeks = []
+    for week in range(1, weeks + 1):
+        allocation = allocate_week(week, weeks, bool(new_chords), bool(new_techniques), minutes_per_day)
+        # Introduce new chords and techniques over the first half of the plan
+        share = max(1, math.ceil(weeks / 2))
+        week_chords = new_chords[(week - 1) * len(new_chords) // share: week * len(new_chords) // share] \
+            if week <= share else []
+        week_techniques = new_techniques[(week - 1) * len(new_techniques) // share: week * len(new_techniques) // share] \
+            if week <= share else []
+
+        exercises = []
+        if week_chords:
+            exercises.append(f"Fret each new chord cleanly, one string at a time: {', '.join(week_chords)}")
+        if hardest:
+            a, b = hardest[(week - 1) % len(hardest)]
+            exercises.append(f"One-minute changes: {a} ↔ {b} (count clean changes, beat your score)")
+        if week_techniques:
+            exercises.append(f"Technique drills: {', '.join(week_techniques)} at 60 BPM")
+        tempo = min(100, 60 + round(40 * week / weeks))
+        exercises.append(f"Play along with the song at {tempo}% speed" if week < weeks
+                         else "Full playthrough at tempo, record yourself and review")
+
+        if week_chords:
+            focus = f"Learn {', '.join(week_chords)}"
+        elif week == weeks:
+            focus = "Full song at tempo"
+        elif week_techniques:
+            focus = f"{', '.join(week_techniques)} and chord changes"
+        else:
+            focus = "Smooth chord changes in time"
+        plan_weeks.append({"focus": focus, "exercises": exercises, "allocation": allocation})
+
+    return {
+        "song": song,
+        "artist": artist,
+        "difficulty": difficulty,
+        "estimated_weeks": weeks,
+        "chords": chords,
+        "new_chords": new_chords,
+        "prerequisites": [f"{c} chord" for c in chords if c in level_chords and chord_score(c) > 1]
+                         or ["Basic open chords (Am, C, G, D, E)"],
+        "techniques": techniques,
+        "weeks": plan_weeks,
+        "source": "local",
+    }
+
+
+def order_songs(songs: List[Dict], known: Optional[Set[str]] = None) -> List[Dict]:
+    """
+    Greedy learning order: next is the song that adds the fewest new chords
+    and techniques relative to everything learned so far, weighted by its difficulty
+
+    Args:
+        songs: Dicts with "chords", "techniques" and "difficulty" (segments or catalog entries)
+        known: Chords and techniques learned before the first song
+    """
+    remaining = list(songs)
+    learned = set(known or ())
+    ordered = []
+    while remaining:
+        def cost(song):
+            chords = set(song["chords"])
+            new_points = (sum(chord_score(c) for c in chords - learned)
+                          + sum(TECHNIQUE_LEVELS.get(t, 3) for t in set(song["techniques"]) - learned))
+            overlap = len(chords & learned) / len(chords) if chords else 0.0
+            return (song["difficulty"] * 4 + new_points - overlap, song["difficulty"])
+        best = min(remaining, key=cost)
+        remaining.remove(best)
+        ordered.append(best)
+        learned |= set(best["chords"]) | set(best["techniques"])
+    return ordered
+
+
+def plan_learning_path(songs: List[Tuple[str, str]], current_level: str, goal_level: str,
+                       hours_per_week: int, song_chords: Optional[Dict[Tuple[str, str], List[str]]] = None) -> List[Dict]:
+    """
+    Ordered per-song segments for a learning path; chords learned in earlier
+    songs are not taught again
+
+    Args:
+        songs: (song, artist) pairs
+        song_chords: Chord vocabularies for songs not in the catalog
+    """
+    song_chords = song_chords or {}
+    candidates = []
+    for song, artist in songs:
+        entry = lookup_song(song, artist) or {}
+        # The catalog's chords win; supplied chords only fill in songs it does not know
+        chords = entry.get("chords") or song_chords.get((song, artist)) or DEFAULT_CHORDS
+        techniques = entry.get("techniques") or ["Strumming"]
+        candidates.append({"song": song, "artist": artist, "chords": chords, "techniques": techniques,
+                           "difficulty": song_difficulty(chords, techniques)})
+
+    segments = []
+    learned_chords, learned_techniques = set(), set()
+    for candidate in order_songs(candidates):
+        segment = plan_segment(candidate["song"], candidate["artist"], current_level, goal_level, hours_per_week,
+                               candidate["chords"], candidate["techniques"], learned_chords, learned_techniques)
+        segments.append(segment)
+        learned_chords |= set(segment["chords"])
+        learned_techniques |= set(segment["techniques"])
+    return segments
+
+
+def enrich_segment(local: Dict, generated: Optional[Dict]) -> Dict:
+    """Merge an LLM segment's exercises and techniques into the local plan's structure"""
+    if not generated:
+        return local
+    enriched = dict(local)
+    enriched["weeks"] = [dict(week) for week in local["weeks"]]
+    for week, extra in zip(enriched["weeks"], generated["weeks"]):
+        week["exercises"] = week["exercises"] + [e for e in extra["exercises"] if e not in week["exercises"]]
+    enriched["techniques"] = local["techniques"] + [t for t in generated["techniques"] if t not in local["techniques"]]
+    enriched["prerequisites"] = local["prerequisites"] + [p for p in generated["prerequisites"]
+                                                           if p not in local["prerequisites"]]
+    enriched["source"] = "local+openai"
+    return enriched
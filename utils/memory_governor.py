@@ -0,0 +1,309 @@
+"""
+Memory Governor Module
+Tracks how much memory each Streamlit session's heavy state holds and
+enforces per-session and global caps by evicting it from idle sessions
+
+Evicted state is restored transparently: user collections are reloaded from
+the user store by the page that next needs them, derived state is rebuilt,
+and the AI advisor's caches refill. The store is flushed before a sweep
+evicts, and a session whose user still has uncommitted writes is kept.
+"""
+
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from .user_store import get_user_store
+
+MB = 1024 * 1024
+
+SESSION_CAP_BYTES = int(float(os.getenv("SESSION_MEMORY_CAP_MB", "64")) * MB)
+GLOBAL_CAP_BYTES = int(float(os.getenv("SESSION_MEMORY_GLOBAL_CAP_MB", "1024")) * MB)
+IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "600"))
+SWEEP_SECONDS = 30.0
+# How long a sweep waits for the user store to commit before evicting
+STORE_FLUSH_SECONDS = 5.0
+# Records of sessions that were evicted and released are forgotten after this long
+RECORD_SECONDS = 24 * 3600.0
+
+# Session-state keys that are dropped on eviction; pages reload them from the user store
+# (chat history is session-only and bounded by the chat page, so it stays)
+STORED_KEYS = ("library", "saved_tabs")
+# Derived from the stored keys (or the file uploader) and rebuilt on next use
+DERIVED_KEYS = ("song_index", "batch_upload")
+# Kept on eviction, but its caches are released (see AITabAdvisor.release_memory)
+ADVISOR_KEY = "ai_advisor"
+
+
+def deep_size(obj: Any) -> int:
+    """
+    Approximate bytes held by an object graph (containers, strings, NumPy
+    arrays and plain objects; modules, classes and functions are not followed)
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            total += item.nbytes + sys.getsizeof(np.empty(0))
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        elif not callable(item) and not isinstance(item, type(sys)):
+            if hasattr(item, "__dict__"):
+                stack.append(item.__dict__)
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def measure_state(state) -> Dict[str, int]:
+    """Bytes per heavy key of one session's state"""
+    sizes = {}
+    for key in STORED_KEYS + DERIVED_KEYS:
+        if key in state:
+            sizes[key] = deep_size(state[key])
+    if ADVISOR_KEY in state:
+        sizes[ADVISOR_KEY] = deep_size(list(state[ADVISOR_KEY].memory_parts().values()))
+    return sizes
+
+
+class _Session:
+    __slots__ = ("session_id", "state", "thread_ref", "last_active", "measured_at",
+                 "sizes", "evict_on_touch", "evicted")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # The session's own SessionState (it outlives each run's SafeSessionState wrapper)
+        self.state = None
+        self.thread_ref = None
+        self.last_active = 0.0
+        self.measured_at = 0.0
+        self.sizes: Dict[str, int] = {}
+        # Over its cap while running: evicted at the start of its next run
+        self.evict_on_touch = False
+        self.evicted = False
+
+    @property
+    def running(self) -> bool:
+        # The thread that last touched the session runs the script; it ends when the run does
+        thread = self.thread_ref() if self.thread_ref else None
+        return thread is not None and thread.is_alive()
+
+    @property
+    def bytes(self) -> int:
+        return sum(self.sizes.values())
+
+
+class MemoryGovernor:
+    """
+    Per-session accounting of heavy session state with idle eviction
+
+    Pages call touch() at the top of every run. A background sweep measures
+    sessions that ran since the last sweep, evicts sessions idle longer than
+    `idle_seconds`, then evicts the least recently active sessions while the
+    total is over `global_cap`. A session over `session_cap` is evicted as
+    soon as it is not running. Running scripts are never evicted from under
+    them: the running check and the eviction happen under the same lock as
+    touch().
+
+    The governor holds each session's state until the session is evicted
+    while idle or has closed (per `session_active`, when set), then lets go of it.
+    """
+
+    def __init__(self, session_cap: int = SESSION_CAP_BYTES, global_cap: int = GLOBAL_CAP_BYTES,
+                 idle_seconds: float = IDLE_SECONDS, sweep_seconds: float = SWEEP_SECONDS,
+                 session_active: Optional[Callable[[str], bool]] = None):
+        self.session_cap = session_cap
+        self.global_cap = global_cap
+        self.idle_seconds = idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self.session_active = session_active
+        self._sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self.stats = {"evictions": 0, "restores": 0, "bytes_evicted": 0, "sweeps": 0}
+
+        threading.Thread(target=self._sweep_loop, name="memory-governor", daemon=True).start()
+
+    def touch(self, session_id: str, state):
+        """Record a run of a session (call before the page reads its state)"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(session_id)
+            session.state = state
+            session.thread_ref = weakref.ref(threading.current_thread())
+            session.last_active = time.time()
+            if session.evicted:
+                # The page reloads what it needs from here on
+                session.evicted = False
+                self.stats["restores"] += 1
+            if session.evict_on_touch:
+                # Before the page reads its state, so nothing is dropped from under it
+                self._evict(session)
+
+    @staticmethod
+    def _committed(state) -> bool:
+        """True if the stored keys held by a session can be reloaded from the user store"""
+        if not any(key in state for key in STORED_KEYS):
+            return True
+        user_id = state["user_id"] if "user_id" in state else None
+        return user_id is not None and not get_user_store().has_pending(user_id)
+
+    def _evict(self, session: _Session, release: bool = False) -> bool:
+        """Drop a session's heavy state (call with the lock held); False if it had to be kept"""
+        state = session.state
+        if state is not None and not session.evicted and not self._committed(state):
+            # Its writes have not reached the store yet; tried again on the next sweep
+            return False
+        if release:
+            session.state = None
+        if state is None or session.evicted:
+            return True
+        freed = 0
+        for key in STORED_KEYS + DERIVED_KEYS:
+            if key in state:
+                freed += session.sizes.get(key, 0)
+                del state[key]
+        if ADVISOR_KEY in state:
+            freed += session.sizes.get(ADVISOR_KEY, 0)
+            state[ADVISOR_KEY].release_memory()
+        session.sizes = {}
+        session.evict_on_touch = False
+        session.evicted = True
+        self.stats["evictions"] += 1
+        self.stats["bytes_evicted"] += freed
+        return True
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Memory governor sweep error: {e}")
+
+    def sweep(self):
+        """Measure changed sessions and enforce the idle timeout and caps"""
+        now = time.time()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self.stats["sweeps"] += 1
+
+        live = []
+        for session in sessions:
+            state = session.state
+            if state is None:
+                # Evicted and released; forget it once it has been gone a long time
+                if now - session.last_active > RECORD_SECONDS:
+                    with self._lock:
+                        if session.state is None:
+                            self._sessions.pop(session.session_id, None)
+                continue
+            if self.session_active is not None and not self.session_active(session.session_id):
+                # The browser session was closed: drop its state and the record
+                with self._lock:
+                    if not session.running:
+                        self._evict(session, release=True)
+                        self._sessions.pop(session.session_id, None)
+                continue
+            live.append(session)
+            if session.last_active > session.measured_at and not session.evicted:
+                try:
+                    session.sizes = measure_state(state)
+                    session.measured_at = now
+                except RuntimeError:
+                    # Changed while being measured; measured again next sweep
+                    pass
+
+        # Evicted collections are reloaded from the store, so let queued writes land first
+        get_user_store().flush(STORE_FLUSH_SECONDS)
+        for session in live:
+            with self._lock:
+                idle = now - session.last_active > self.idle_seconds
+                if session.running:
+                    if not session.evicted and (idle or session.bytes > self.session_cap):
+                        session.evict_on_touch = True
+                elif idle:
+                    self._evict(session, release=True)
+                elif not session.evicted and session.bytes > self.session_cap:
+                    self._evict(session)
+
+        total = sum(session.bytes for session in live)
+        for session in sorted(live, key=lambda s: s.last_active):
+            if total <= self.global_cap:
+                break
+            with self._lock:
+                size = session.bytes
+                if size and not session.running and self._evict(session):
+                    total -= size
+
+    def snapshot(self) -> Dict:
+        """Totals and per-session usage for diagnostics, largest sessions first"""
+        now = time.time()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            stats = dict(self.stats)
+        rows = []
+        for session in sorted(sessions, key=lambda s: -s.bytes):
+            rows.append({
+                "session": session.session_id[:8],
+                "mb": round(session.bytes / MB, 2),
+                "idle_s": round(now - session.last_active),
+                "running": session.running,
+                "evicted": session.evicted,
+                "by_key_mb": {key: round(size / MB, 2) for key, size in session.sizes.items()},
+            })
+        return {
+            "sessions": len(sessions),
+            "total_mb": round(sum(session.bytes for session in sessions) / MB, 2),
+            "session_cap_mb": round(self.session_cap / MB, 1),
+            "global_cap_mb": round(self.global_cap / MB, 1),
+            "idle_seconds": self.idle_seconds,
+            "stats": stats,
+            "rows": rows,
+        }
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """Process-wide governor (caps from SESSION_MEMORY_CAP_MB / SESSION_MEMORY_GLOBAL_CAP_MB)"""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = MemoryGovernor()
+    return _governor
+
+
+def govern_session(ctx: Optional[Any]):
+    """touch() for a Streamlit script run context (no-op outside a Streamlit run)"""
+    if ctx is None:
+        return
+    governor = get_memory_governor()
+    if governor.session_active is None:
+        from streamlit.runtime import Runtime
+        if Runtime.exists():
+            governor.session_active = Runtime.instance().is_active_session
+    # ctx.session_state is a wrapper made for each run; the SessionState inside lives as long as the session
+    governor.touch(ctx.session_id, getattr(ctx.session_state, "_state", ctx.session_state))
@@ -0,0 +1,54 @@
+"""
+Model Router Module
+Per-task model, output-length budget, temperature and timeout for LLM calls
+"""
+
+import json
+import os
+from typing import Dict
+
+# task -> request settings; short answers get short budgets and a smaller, faster model
+DEFAULT_ROUTES = {
+    "chat": {"model": "gpt-3.5-turbo", "max_tokens": 500, "temperature": 0.7, "timeout": 20.0},
+    "get_tab_recommendation": {"model": "gpt-4o-mini", "max_tokens": 300, "temperature": 0.7, "timeout": 15.0},
+    "analyze_chord_progression": {"model": "gpt-4o-mini", "max_tokens": 350, "temperature": 0.4, "timeout": 15.0},
+    "explain_technique": {"model": "gpt-4o-mini", "max_tokens": 450, "temperature": 0.5, "timeout": 20.0},
+    # Plans request one JSON segment per song, which needs a structured-output model
+    "generate_practice_plan": {"model": "gpt-4o-mini", "max_tokens": 700, "temperature": 0.6, "timeout": 60.0},
+    "get_learning_path": {"model": "gpt-4o-mini", "max_tokens": 700, "temperature": 0.6, "timeout": 60.0},
+    "summary": {"model": "gpt-4o-mini", "max_tokens": 300, "temperature": 0.2, "timeout": 20.0},
+}
+
+
+class ModelRouter:
+    """
+    Looks up the request settings for a task
+
+    Overrides come from the AI_MODEL_ROUTES environment variable (JSON, e.g.
+    '{"chat": {"model": "gpt-4o-mini"}}') and AI_DEFAULT_MODEL, which replaces
+    the model of every route not overridden explicitly.
+    """
+
+    def __init__(self, routes: Dict[str, Dict] = None):
+        self.routes = {task: dict(settings) for task, settings in (routes or DEFAULT_ROUTES).items()}
+
+        default_model = os.getenv("AI_DEFAULT_MODEL")
+        if default_model:
+            for settings in self.routes.values():
+                settings["model"] = default_model
+
+        overrides = os.getenv("AI_MODEL_ROUTES")
+        if overrides:
+            try:
+                for task, settings in json.loads(overrides).items():
+                    self.update(task, **settings)
+            except (ValueError, AttributeError, TypeError) as e:
+                print(f"Ignoring invalid AI_MODEL_ROUTES: {e}")
+
+    def route(self, task: str) -> Dict:
+        """Settings for a task (unknown tasks use the chat route)"""
+        return dict(self.routes.get(task, self.routes["chat"]))
+
+    def update(self, task: str, **settings):
+        """Change or add a route, e.g. update("chat", model="gpt-4o-mini", max_tokens=400)"""
+        self.routes.setdefault(task, dict(self.routes["chat"])).update(settings)
@@ -0,0 +1,207 @@
+"""
+Practice Plans Module
+Structured per-song plan segments, a segment cache, and plans / learning paths composed from them
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+
+# JSON schema of one song's segment, sent as the OpenAI structured-output schema
+SEGMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "difficulty": {"type": "integer", "description": "1 (easiest) to 5 (hardest)"},
+        "estimated_weeks": {"type": "integer", "description": "Weeks to learn the song"},
+        "chords": {"type": "array", "items": {"type": "string"}},
+        "prerequisites": {"type": "array", "items": {"type": "string"}},
+        "techniques": {"type": "array", "items": {"type": "string"}},
+        "weeks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "focus": {"type": "string"},
+                    "exercises": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["focus", "exercises"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["difficulty", "estimated_weeks", "chords", "prerequisites", "techniques", "weeks"],
+    "additionalProperties": False,
+}
+
+# Practice days per week used to turn hours_per_week into daily minutes
+PRACTICE_DAYS = 5
+
+
+def split_song(entry: str) -> Tuple[str, str]:
+    """"Wonderwall - Oasis" -> ("Wonderwall", "Oasis")"""
+    song, sep, artist = entry.rpartition(" - ")
+    return (song.strip(), artist.strip()) if sep else (entry.strip(), "")
+
+
+def segment_key(song: str, artist: str, current_level: str, goal_level: str) -> str:
+    """Cache key of a song segment; case and punctuation do not matter"""
+    normalize = lambda text: re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+    return f"{normalize(song)}|{normalize(artist)}|{current_level.lower()}|{goal_level.lower()}"
+
+
+def validate_segment(data) -> Optional[Dict]:
+    """
+    Check a segment against SEGMENT_SCHEMA
+
+    Returns:
+        The segment with values clamped to sane ranges, or None if it does not match
+    """
+    if not isinstance(data, dict):
+        return None
+    try:
+        weeks = [{"focus": str(w["focus"]), "exercises": [str(e) for e in w["exercises"]]}
+                 for w in data["weeks"]]
+        segment = {
+            "difficulty": min(5, max(1, int(data["difficulty"]))),
+            "estimated_weeks": min(52, max(1, int(data["estimated_weeks"]))),
+            "chords": [str(c) for c in data["chords"]],
+            "prerequisites": [str(p) for p in data["prerequisites"]],
+            "techniques": [str(t) for t in data["techniques"]],
+            "weeks": weeks,
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+    return segment if weeks else None
+
+
+class SegmentCache:
+    """Thread-safe LRU cache of per-song plan segments"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            segment = self._entries.get(key)
+            if segment is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(segment)
+
+    def put(self, key: str, segment: Dict):
+        with self._lock:
+            self._entries[key] = dict(segment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_segment_cache = None
+_segment_cache_lock = threading.Lock()
+
+
+def get_segment_cache() -> SegmentCache:
+    """Process-wide segment cache; a song's plan segment is reused by every session"""
+    global _segment_cache
+    if _segment_cache is None:
+        with _segment_cache_lock:
+            if _segment_cache is None:
+                _segment_cache = SegmentCache()
+    return _segment_cache
+
+
+def compose_practice_plan(segment: Dict, current_level: str, goal_level: str,
+                          hours_per_week: int) -> Dict:
+    """Practice plan for one song: the segment's weeks with daily minutes (and allocation, if planned locally)"""
+    minutes_per_day = round(hours_per_week * 60 / PRACTICE_DAYS)
+    return {
+        "song": segment["song"],
+        "artist": segment["artist"],
+        "current_level": current_level,
+        "goal_level": goal_level,
+        "hours_per_week": hours_per_week,
+        "minutes_per_day": minutes_per_day,
+        "weeks": [{"week": i, "focus": w["focus"], "exercises": w["exercises"], "minutes_per_day": minutes_per_day,
+                   "allocation": w.get("allocation", {})}
+                  for i, w in enumerate(segment["weeks"], 1)],
+        "segment": segment,
+    }
+
+
+def compose_learning_path(segments: List[Dict], hours_per_week: int, generated: int = 0, cached: int = 0) -> Dict:
+    """
+    Learning path over several songs
+
+    Args:
+        segments: One segment per song, in learning order
+        generated: Segments produced by LLM calls for this path
+        cached: Segments reused from the cache
+    """
+    ordered = list(segments)
+    prerequisites, techniques = [], []
+    for segment in ordered:
+        prerequisites += [p for p in segment["prerequisites"] if p not in prerequisites]
+        techniques += [t for t in segment["techniques"] if t not in techniques]
+    return {
+        "songs": ordered,
+        "prerequisites": prerequisites,
+        "techniques": techniques,
+        "estimated_weeks": sum(s["estimated_weeks"] for s in ordered),
+        "hours_per_week": hours_per_week,
+        "generated": generated,
+        "cached": cached,
+    }
+
+
+def render_practice_plan(plan: Dict) -> str:
+    """Markdown for a practice plan"""
+    lines = [f"**{len(plan['weeks'])}-Week Practice Plan for \"{plan['song']}\""
+             + (f" by {plan['artist']}**" if plan["artist"] else "**"),
+             f"*{plan['current_level']} → {plan['goal_level']}, {plan['hours_per_week']} hours per week*", ""]
+    for week in plan["weeks"]:
+        lines.append(f"**Week {week['week']}: {week['focus']}**")
+        lines.append(f"- Daily practice: {week['minutes_per_day']} minutes")
+        if week["allocation"]:
+            lines.append("  - " + ", ".join(f"{name} {minutes} min" for name, minutes in week["allocation"].items()))
+        lines += [f"- {exercise}" for exercise in week["exercises"]]
+        lines.append("")
+    if plan["segment"]["techniques"]:
+        lines.append(f"**Key techniques:** {', '.join(plan['segment']['techniques'])}")
+    return "\n".join(lines)
+
+
+def render_learning_path(path: Dict) -> str:
+    """Markdown for a learning path"""
+    lines = [f"**Estimated timeline:** {path['estimated_weeks']} weeks", ""]
+    if path["prerequisites"]:
+        lines.append("**Prerequisites:**")
+        lines += [f"- {p}" for p in path["prerequisites"]]
+        lines.append("")
+    lines.append("**Recommended order:**")
+    for i, segment in enumerate(path["songs"], 1):
+        title = f"{segment['song']} - {segment['artist']}" if segment["artist"] else segment["song"]
+        lines.append(f"{i}. **{title}** - difficulty {segment['difficulty']}/5, ~{segment['estimated_weeks']} weeks")
+        if segment.get("new_chords"):
+            lines.append(f"   - New chords: {', '.join(segment['new_chords'])}")
+        if segment["techniques"]:
+            lines.append(f"   - Techniques: {', '.join(segment['techniques'])}")
+    if path["techniques"]:
+        lines += ["", f"**Key techniques to focus on:** {', '.join(path['techniques'])}"]
+    return "\n".join(lines)
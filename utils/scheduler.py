@@ -0,0 +1,270 @@
+"""
+LLM Scheduler Module
+Priority classes, RPM/TPM token buckets and fair queuing across sessions for outbound LLM calls
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Priority classes, highest first
+PRIORITIES = ("interactive", "prefetch", "batch")
+
+# Share of each bucket that only interactive requests may use
+INTERACTIVE_RESERVE = 0.25
+
+
+class TokenBucket:
+    """Continuously refilled budget of `per_minute` units, capped at one minute's worth"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` in the bucket"""
+        # Requests larger than the bucket are allowed once it is full
+        needed = min(amount + reserve, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class _Job:
+    __slots__ = ("fn", "priority", "session_id", "tokens", "stream", "future", "enqueued")
+
+    def __init__(self, fn, priority, session_id, tokens, stream):
+        self.fn = fn
+        self.priority = priority
+        self.session_id = session_id
+        self.tokens = tokens
+        self.stream = stream
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class HeldStream:
+    """
+    Streamed response that keeps its scheduler slot until it is exhausted,
+    fails or is closed (or garbage-collected); other attributes pass through
+    """
+
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._release = release
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        release, self._release = getattr(self, "_release", None), None
+        if release is None:
+            return
+        try:
+            close = getattr(self._stream, "close", None)
+            if close:
+                close()
+        finally:
+            release()
+
+    def __del__(self):
+        self.close()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._stream, name)
+
+
+class LLMScheduler:
+    """
+    Dispatches LLM calls by priority class, within requests-per-minute and
+    tokens-per-minute budgets, round-robin across sessions within a class
+
+    Interactive requests may use the whole budget; prefetch and batch work
+    stops short of INTERACTIVE_RESERVE, so chat stays fast when batch jobs
+    saturate the quota. Batch work also gets at most half the worker slots.
+    A streamed call holds its slot until its stream is consumed or closed.
+    """
+
+    def __init__(self, rpm: float = 3500, tpm: float = 90000, max_concurrency: int = 16):
+        if rpm <= 0 or tpm <= 0 or max_concurrency < 1:
+            raise ValueError(f"Scheduler limits must be positive (rpm={rpm}, tpm={tpm}, "
+                             f"max_concurrency={max_concurrency})")
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.batch_concurrency = max(1, max_concurrency // 2)
+
+        # priority -> session_id -> deque of jobs; session order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._running = {p: 0 for p in PRIORITIES}
+        self._cond = threading.Condition()
+        self.stats = {p: {"submitted": 0, "completed": 0, "queue_ms_total": 0.0} for p in PRIORITIES}
+
+        threading.Thread(target=self._dispatch_loop, name="llm-scheduler", daemon=True).start()
+
+    def submit(self, fn: Callable[[], Any], priority: str = "interactive",
+               session_id: Optional[str] = None, tokens: int = 1000, stream: bool = False) -> Future:
+        """
+        Queue a call
+
+        Args:
+            fn: Performs the upstream request
+            priority: "interactive", "prefetch" or "batch"
+            session_id: Requests are queued fairly per session
+            tokens: Estimated prompt + completion tokens, charged to the TPM bucket
+            stream: fn() returns a stream; it comes back as a HeldStream that
+                keeps the slot until it is consumed or closed
+
+        Returns:
+            Future with the result of fn()
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        job = _Job(fn, priority, session_id or "anonymous", tokens, stream)
+        with self._cond:
+            self._queues[priority].setdefault(job.session_id, deque()).append(job)
+            self.stats[priority]["submitted"] += 1
+            self._cond.notify_all()
+        return job.future
+
+    def run(self, fn: Callable[[], Any], priority: str = "interactive",
+            session_id: Optional[str] = None, tokens: int = 1000, stream: bool = False) -> Any:
+        """submit() and wait for the result"""
+        return self.submit(fn, priority, session_id, tokens, stream).result()
+
+    def adjust_tokens(self, delta: int):
+        """Correct the TPM bucket once the actual usage of a call is known"""
+        with self._cond:
+            self.tokens.take(delta)
+
+    def _next_job(self):
+        """Pick the next dispatchable job, or return the seconds to wait"""
+        self.requests.refill()
+        self.tokens.refill()
+        wait = 1.0
+        for priority in PRIORITIES:
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            running = sum(self._running.values())
+            if running >= self.max_concurrency:
+                return None, 0.05
+            if priority == "batch" and self._running["batch"] >= self.batch_concurrency:
+                continue
+
+            session_id, jobs = next(iter(sessions.items()))
+            job = jobs[0]
+            reserve = 0.0 if priority == "interactive" else INTERACTIVE_RESERVE
+            job_wait = max(self.requests.wait_time(1, reserve * self.requests.capacity),
+                           self.tokens.wait_time(job.tokens, reserve * self.tokens.capacity))
+            if job_wait > 0:
+                # Lower classes may not overtake a waiting higher class
+                return None, min(job_wait, 1.0)
+
+            jobs.popleft()
+            # Round-robin: the session goes to the back of its class
+            del sessions[session_id]
+            if jobs:
+                sessions[session_id] = jobs
+            self.requests.take(1)
+            self.tokens.take(job.tokens)
+            return job, 0.0
+        return None, wait
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                job, wait = self._next_job()
+                if job is None:
+                    self._cond.wait(wait)
+                    continue
+                self._running[job.priority] += 1
+                self.stats[job.priority]["queue_ms_total"] += (time.monotonic() - job.enqueued) * 1000
+            threading.Thread(target=self._run_job, args=(job,), name=f"llm-{job.priority}", daemon=True).start()
+
+    def _run_job(self, job: _Job):
+        if job.future.set_running_or_notify_cancel():
+            try:
+                result = job.fn()
+                if job.stream:
+                    # Not holding the job, whose future holds the stream, so dropping it frees the slot
+                    priority = job.priority
+                    job.future.set_result(HeldStream(result, lambda: self._release(priority)))
+                    return
+                job.future.set_result(result)
+            except BaseException as e:
+                job.future.set_exception(e)
+        self._release(job.priority)
+
+    def _release(self, priority: str):
+        with self._cond:
+            self._running[priority] -= 1
+            self.stats[priority]["completed"] += 1
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        """Queue depths, running calls and bucket levels for diagnostics"""
+        with self._cond:
+            self.requests.refill()
+            self.tokens.refill()
+            return {
+                "queued": {p: sum(len(q) for q in self._queues[p].values()) for p in PRIORITIES},
+                "running": dict(self._running),
+                "rpm_available": round(self.requests.level, 1),
+                "tpm_available": round(self.tokens.level),
+                "avg_queue_ms": {
+                    p: round(s["queue_ms_total"] / s["completed"], 1) if s["completed"] else 0.0
+                    for p, s in self.stats.items()
+                },
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _positive_env(name: str, default: float) -> float:
+    try:
+        value = float(os.getenv(name, default))
+    except ValueError:
+        value = 0
+    if value <= 0:
+        print(f"Ignoring invalid {name}: must be a positive number (using {default})")
+        return default
+    return value
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler (limits from AI_RATE_LIMIT_RPM / AI_RATE_LIMIT_TPM)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                rpm=_positive_env("AI_RATE_LIMIT_RPM", 3500),
+                tpm=_positive_env("AI_RATE_LIMIT_TPM", 90000),
+                max_concurrency=int(_positive_env("AI_MAX_CONCURRENCY", 16)),
+            )
+        return _scheduler
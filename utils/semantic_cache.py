@@ -0,0 +1,334 @@
+"""
+Semantic Cache Module
+Local similarity cache for near-duplicate guitar questions (no network needed)
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Words that carry no meaning for matching guitar questions
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "do", "does", "how", "can", "to", "play",
+    "playing", "is", "it", "on", "of", "for", "in", "what", "whats", "please",
+    "help", "with", "you", "should", "way", "best", "guitar", "tips", "tip",
+    "some", "give", "show", "tell", "about", "and", "or", "am", "are", "be",
+    "learn", "learning", "make", "get", "good", "any", "there", "this", "that",
+}
+
+# Phrasings that mean the same thing
+SYNONYMS = {
+    "fingering": "", "fingerings": "", "shape": "", "shapes": "", "chord": "",
+    "chords": "", "major": "", "maj": "", "bar": "barre", "bars": "barre",
+    "barres": "barre", "fingerpicking": "fingerpick",
+    "fingerstyle": "fingerpick", "picking": "pick", "songs": "song", "beginners": "beginner", "newbie": "beginner", "novice": "beginner",
+    "easy": "beginner", "simple": "beginner", "starter": "beginner",
+    "transitions": "change", "transition": "change", "changes": "change",
+    "switch": "change", "switching": "change", "changing": "change",
+    "hurt": "pain", "hurts": "pain", "sore": "pain", "painful": "pain",
+}
+
+
+CHORD_QUALITY_WORDS = {
+    "minor": "m", "min": "m", "m": "m", "major": "", "maj": "", "chord": "",
+    "7": "7", "seventh": "7", "maj7": "maj7", "m7": "m7", "sus2": "sus2",
+    "sus4": "sus4", "dim": "dim", "aug": "aug", "5": "5", "power": "5",
+}
+
+AMBIGUOUS_CHORD_WORDS = {"a", "am"}
+# After these, a lowercase "a minor" / "a 7" names the chord rather than using the article
+CHORD_VERBS = {"play", "playing", "learn", "learning", "practice", "practise", "practicing", "strum",
+               "strumming", "fret", "fretting", "finger", "form", "hold", "switch", "change", "to", "from"}
+# ... but "play a chord", "learn a major chord" or "A power chord..." still mean any chord
+ARTICLE_WORDS = {"chord", "major", "maj", "power", "5"}
+# Contractions are kept whole ("I'd" -> "id", never a "d" chord); these carry no meaning
+CONTRACTIONS = {"id", "im", "ive", "ill", "youre", "youve", "its", "lets", "hows", "wheres", "thats"}
+
+
+def normalize_query(text: str) -> List[str]:
+    """
+    Lowercase, strip punctuation, drop stopwords and map synonyms
+
+    Chord names are folded into a single "chord:<name>" token ("F minor",
+    "Fm chord" -> "chord:fm") so questions about different chords never match.
+    """
+    raw = re.findall(r"[A-Za-z0-9#]+(?:['’][A-Za-z]+)*", text)
+    words = [re.sub(r"['’]", "", word.lower()) for word in raw]
+    tokens = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        prev = words[i - 1] if i else ""
+        nxt = words[i + 1] if i + 1 < len(words) else ""
+        chord = re.fullmatch(r"([a-g])(#|b)?(m|maj7|m7|7|sus2|sus4|dim|aug|5)?", word)
+        # English words spelled like chords ("a", "I am") only count when followed by a chord
+        # word: "A minor" when capitalized, "a minor" only after a verb like "play" (not "what is a
+        # minor chord"); "Am" also counts when capitalized as a chord and not after "I"
+        if chord and word == "a":
+            is_chord = nxt in CHORD_QUALITY_WORDS and (
+                (raw[i] == "A" and (i > 0 or nxt not in ARTICLE_WORDS))
+                or (prev in CHORD_VERBS and nxt not in ARTICLE_WORDS))
+        elif chord and word in AMBIGUOUS_CHORD_WORDS:
+            is_chord = nxt in CHORD_QUALITY_WORDS or (raw[i] == "Am" and prev != "i")
+        else:
+            is_chord = bool(chord)
+        if is_chord:
+            quality = CHORD_QUALITY_WORDS.get(nxt) if nxt in CHORD_QUALITY_WORDS else None
+            if quality is not None and not chord.group(3):
+                word += quality
+                i += 1
+            tokens.append(f"chord:{word}")
+            i += 1
+            continue
+
+        word = SYNONYMS.get(word, word)
+        if word and word not in STOPWORDS and word not in CONTRACTIONS:
+            tokens.append(word)
+        i += 1
+    return tokens
+
+
+FOLLOW_UP_WORDS = {"it", "that", "this", "those", "them", "these", "again", "instead", "also", "else", "more"}
+
+
+def is_standalone(message: str) -> bool:
+    """True if a question can be answered without the earlier conversation"""
+    words = re.findall(r"[a-z']+", message.lower())
+    if not words or words[0] in ("and", "but", "so", "then"):
+        return False
+    if " ".join(words[:2]) in ("what about", "how about"):
+        return False
+    return not FOLLOW_UP_WORDS.intersection(words)
+
+
+class SemanticCache:
+    """Cosine-similarity cache over hashed TF-IDF word and character n-gram vectors"""
+
+    def __init__(self, threshold: float = 0.55, max_entries: int = 500,
+                 n_features: int = 2048, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a cached answer to be served
+            max_entries: Least recently used entries are evicted beyond this
+            n_features: Size of the hashed feature space
+            ttl_seconds: Optional lifetime of an entry
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.n_features = n_features
+        self.ttl_seconds = ttl_seconds
+
+        self._tf = np.zeros((0, n_features), dtype=np.float32)
+        self._entries = []  # dict per row, None for a free row
+        self._free_rows = []
+        self._df = np.zeros(n_features, dtype=np.float32)
+        self._weighted = None  # normalized TF-IDF matrix, rebuilt lazily
+        self._lock = threading.RLock()
+
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _vectorize(self, text: str) -> np.ndarray:
+        """Hashed term counts: whole words plus character 3-grams of each word"""
+        vec = np.zeros(self.n_features, dtype=np.float32)
+        for word in normalize_query(text):
+            if word.startswith("chord:"):
+                # Chord names only ever match exactly
+                vec[zlib.crc32(word.encode()) % self.n_features] += 4.0
+                continue
+            vec[zlib.crc32(f"w:{word}".encode()) % self.n_features] += 2.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vec[zlib.crc32(padded[i:i + 3].encode()) % self.n_features] += 1.0
+        return vec
+
+    def _idf(self) -> np.ndarray:
+        n_docs = len(self._entries) - len(self._free_rows)
+        return np.log((1.0 + n_docs) / (1.0 + self._df)) + 1.0
+
+    def _weighted_matrix(self) -> np.ndarray:
+        if self._weighted is None:
+            weighted = self._tf * self._idf()
+            norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._weighted = weighted / norms
+        return self._weighted
+
+    def _similarities(self, text: str) -> Optional[np.ndarray]:
+        vec = self._vectorize(text)
+        if not vec.any() or len(self._entries) == len(self._free_rows):
+            return None
+        query = vec * self._idf()
+        query /= np.linalg.norm(query)
+        sims = self._weighted_matrix() @ query
+        now = time.time()
+        for row, entry in enumerate(self._entries):
+            if entry is None or (self.ttl_seconds and now - entry["created"] > self.ttl_seconds):
+                sims[row] = -1.0
+        return sims
+
+    def get(self, query: str) -> Optional[str]:
+        """Return the cached answer of the most similar question, if similar enough"""
+        with self._lock:
+            sims = self._similarities(query)
+            if sims is not None:
+                row = int(np.argmax(sims))
+                if sims[row] >= self.threshold:
+                    entry = self._entries[row]
+                    entry["hits"] += 1
+                    entry["last_used"] = time.time()
+                    self.stats["hits"] += 1
+                    return entry["answer"]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, query: str, answer: str):
+        """Store an answer for a question"""
+        vec = self._vectorize(query)
+        if not vec.any():
+            return
+        with self._lock:
+            if len(self._entries) - len(self._free_rows) >= self.max_entries:
+                live = [r for r, e in enumerate(self._entries) if e is not None]
+                self._remove_row(min(live, key=lambda r: self._entries[r]["last_used"]))
+
+            now = time.time()
+            entry = {"query": query, "answer": answer, "created": now, "last_used": now, "hits": 0}
+            if self._free_rows:
+                row = self._free_rows.pop()
+                self._tf[row] = vec
+                self._entries[row] = entry
+            else:
+                self._tf = np.vstack([self._tf, vec])
+                self._entries.append(entry)
+            self._df += vec > 0
+            self._weighted = None
+
+    def _remove_row(self, row: int):
+        self._df -= self._tf[row] > 0
+        self._tf[row] = 0.0
+        self._entries[row] = None
+        self._free_rows.append(row)
+        self._weighted = None
+
+    def invalidate(self, query: Optional[str] = None, contains: Optional[str] = None) -> int:
+        """
+        Remove cached entries
+
+        Args:
+            query: Remove entries that would be served for this question
+            contains: Remove entries whose question or answer contains this text
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            rows = set()
+            if query is not None:
+                sims = self._similarities(query)
+                if sims is not None:
+                    rows.update(int(r) for r in np.nonzero(sims >= self.threshold)[0])
+            if contains is not None:
+                needle = contains.lower()
+                rows.update(
+                    r for r, e in enumerate(self._entries)
+                    if e is not None and (needle in e["query"].lower() or needle in e["answer"].lower())
+                )
+            for row in rows:
+                if self._entries[row] is not None:
+                    self._remove_row(row)
+            return len(rows)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._tf = np.zeros((0, self.n_features), dtype=np.float32)
+            self._entries = []
+            self._free_rows = []
+            self._df = np.zeros(self.n_features, dtype=np.float32)
+            self._weighted = None
+
+    def __len__(self):
+        return len(self._entries) - len(self._free_rows)
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+
+# Standalone questions are answered the same for everyone, so one cache serves every session
+SHARED_CACHE_ENTRIES = 2000
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Process-wide answer cache shared by every session's advisor"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SemanticCache(max_entries=SHARED_CACHE_ENTRIES)
+    return _shared_cache
+
+
+def replay_query_log(path: str, cache: Optional[SemanticCache] = None,
+                     answer_fn: Optional[Callable[[str], str]] = None) -> Dict:
+    """
+    Replay a recorded query log through a cache and measure its hit rate
+
+    Each line of the log is a JSON object with a "query" and, optionally, the
+    "intent" it was labelled with; hits served from another intent are counted
+    as false hits.
+
+    Args:
+        path: JSON-lines query log
+        cache: Cache to replay through (a fresh one by default)
+        answer_fn: Produces the answer stored on a miss
+
+    Returns:
+        Dictionary with queries, hits, misses, false_hits and hit_rate
+    """
+    if cache is None:
+        cache = SemanticCache()
+    intents = {}
+    hits = misses = false_hits = 0
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            query, intent = record["query"], record.get("intent")
+            answer = cache.get(query)
+            if answer is None:
+                misses += 1
+                answer = answer_fn(query) if answer_fn else f"answer:{intent or query}"
+                cache.put(query, answer)
+                intents[answer] = intent
+            else:
+                hits += 1
+                if intent is not None and intents.get(answer) != intent:
+                    false_hits += 1
+
+    total = hits + misses
+    return {
+        "queries": total,
+        "hits": hits,
+        "misses": misses,
+        "false_hits": false_hits,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # python -m utils.semantic_cache utils/data/sample_query_log.jsonl [threshold]
+    log_path = sys.argv[1]
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.55
+    print(json.dumps(replay_query_log(log_path, SemanticCache(threshold=threshold)), indent=2))
@@ -0,0 +1,135 @@
+"""
+Single-Flight Module
+Coalesces identical in-flight LLM requests across sessions (plain and streaming)
+"""
+
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+
+def request_key(**params) -> str:
+    """Stable key for a request (model, messages, sampling parameters, ...)"""
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Call:
+    """One upstream request and the chunks it has produced so far"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.waiters = 0
+        self.cond = threading.Condition()
+
+    def append(self, chunk: str):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error: Exception = None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def replay(self) -> Iterator[str]:
+        """Yield every chunk from the start, blocking until the call produces more"""
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                pending = self.chunks[index:]
+                done, error = self.done, self.error
+            for chunk in pending:
+                yield chunk
+            index += len(pending)
+            if done and index >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    The first caller for a key makes the request; concurrent callers with the
+    same key wait for (or stream along with) its result instead of calling upstream
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats["followers"] += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.stats["leaders"] += 1
+            return call, True
+
+    def _produce(self, key: str, call: _Call, chunks: Iterable[str]):
+        try:
+            for chunk in chunks:
+                call.append(chunk)
+        except Exception as e:
+            call.finish(e)
+        else:
+            call.finish()
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], str]) -> Tuple[str, bool]:
+        """
+        Run `fn` once for all concurrent callers with the same key
+
+        Returns:
+            (result, shared) - shared is True when another caller's request was reused
+        """
+        call, leader = self._join(key)
+        if leader:
+            self._produce(key, call, _single(fn))
+        return "".join(call.replay()), not leader
+
+    def stream(self, key: str, fn: Callable[[], Iterable[str]]) -> Tuple[Iterator[str], bool]:
+        """
+        Stream `fn()` once for all concurrent callers with the same key
+
+        The leader's request runs on its own thread, so followers keep receiving
+        chunks even if the leader's session stops reading.
+
+        Returns:
+            (chunks, shared) - every caller gets the full stream from the first chunk
+        """
+        call, leader = self._join(key)
+        if leader:
+            threading.Thread(target=self._produce, args=(key, call, _lazy(fn)),
+                             name="single-flight", daemon=True).start()
+        return call.replay(), not leader
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def _single(fn: Callable[[], str]) -> Iterator[str]:
+    yield fn()
+
+
+def _lazy(fn: Callable[[], Iterable[str]]) -> Iterator[str]:
+    yield from fn()
+
+
+# Process-wide instance shared by every session
+single_flight = SingleFlight()
@@ -0,0 +1,151 @@
+"""
+Song Index Module
+In-memory inverted index over a song collection (names, chords and lyric
+words) for searching My Songs without rendering or rescanning every song
+"""
+
+import bisect
+import re
+from typing import Dict, Iterable, List
+
+from .chord_parser import INLINE_RE, parse_chord
+from .song_model import parse_song, song_chords
+
+# Weight of a query term found in each field; a song's score is the sum over query terms
+NAME_WEIGHT = 3
+CHORD_WEIGHT = 2
+LYRIC_WEIGHT = 1
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Chord terms are kept apart from words ("Am" the chord vs "am" in a lyric)
+CHORD_PREFIX = "chord:"
+
+
+def _words(text: str) -> List[str]:
+    return [word.strip("'") for word in WORD_RE.findall(text.lower()) if word.strip("'")]
+
+
+def song_terms(song: Dict) -> Dict[str, int]:
+    """Index terms of a song with their field weights"""
+    model = parse_song(song["content"])
+    terms: Dict[str, int] = {}
+    for section in model["sections"]:
+        for line in section["lines"]:
+            if line["kind"] == "lyric":
+                for word in _words(INLINE_RE.sub(" ", line["text"])):
+                    terms[word] = LYRIC_WEIGHT
+    for chord in song_chords(model):
+        terms[CHORD_PREFIX + chord.lower()] = CHORD_WEIGHT
+    for word in _words(song["name"]):
+        terms[word] = NAME_WEIGHT
+    return terms
+
+
+def _query_terms(token: str) -> List[str]:
+    """Terms a query token may match: the chord it names (lowercase roots accepted) and its words"""
+    terms = []
+    chord = parse_chord(token) or parse_chord(token[:1].upper() + token[1:])
+    if chord:
+        terms.append(CHORD_PREFIX + chord.lower())
+    terms.extend(_words(token))
+    return terms
+
+
+class SongIndex:
+    """
+    Inverted index of a song collection, kept in step with it by add() and remove()
+
+    Searching matches every query token (chord names exactly, words exactly,
+    and the last word as a prefix while it is being typed) and ranks songs by
+    where the tokens were found.
+    """
+
+    def __init__(self, songs: Iterable[Dict] = ()):
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._song_terms: Dict[str, Dict[str, int]] = {}
+        # Collection order, for listing and for ties
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        self._vocabulary: List[str] = []
+        self._vocabulary_stale = False
+        for song in songs:
+            self.add(song)
+
+    def __len__(self) -> int:
+        return len(self._song_terms)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._song_terms
+
+    def add(self, song: Dict):
+        """Index a song (re-indexes it if already present, keeping its place)"""
+        self.add_terms(song["name"], song_terms(song))
+
+    def add_terms(self, name: str, terms: Dict[str, int]):
+        """Index a song by its precomputed terms (see song_terms)"""
+        if name in self._song_terms:
+            self._unpost(name)
+        else:
+            self._order[name] = self._next_order
+            self._next_order += 1
+        self._song_terms[name] = terms
+        for term, weight in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._vocabulary_stale = True
+            postings[name] = weight
+
+    def remove(self, name: str):
+        """Drop a song from the index"""
+        if name in self._song_terms:
+            self._unpost(name)
+            del self._song_terms[name]
+            del self._order[name]
+
+    def _unpost(self, name: str):
+        for term in self._song_terms[name]:
+            postings = self._postings[term]
+            del postings[name]
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_stale = True
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        if self._vocabulary_stale:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_stale = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        return self._vocabulary[start:end]
+
+    def names(self) -> List[str]:
+        """All indexed songs in collection order"""
+        return sorted(self._order, key=self._order.get)
+
+    def search(self, query: str) -> List[str]:
+        """Names of the songs matching every token of `query`, best matches first"""
+        tokens = query.split()
+        if not tokens:
+            return self.names()
+
+        scores: Dict[str, int] = {}
+        for i, token in enumerate(tokens):
+            terms = _query_terms(token)
+            if i == len(tokens) - 1:
+                words = [term for term in terms if not term.startswith(CHORD_PREFIX)]
+                terms += [term for word in words for term in self._prefixed(word)
+                          if term != word and not term.startswith(CHORD_PREFIX)]
+            best: Dict[str, int] = {}
+            for term in terms:
+                for name, weight in self._postings.get(term, {}).items():
+                    if weight > best.get(name, 0):
+                        best[name] = weight
+            if i == 0:
+                scores = best
+            else:
+                scores = {name: score + best[name] for name, score in scores.items() if name in best}
+            if not scores:
+                return []
+        return sorted(scores, key=lambda name: (-scores[name], self._order[name]))
@@ -0,0 +1,245 @@
+"""
+Song Model Module
+Structured chord-sheet model: sections, lines and chord events with their
+column offsets over the lyrics, repeated-section detection, lossless
+round-trip back to text and transposition
+
+A model is plain lists and dicts (JSON-serializable):
+
+    {"sections": [{"name": "Verse 1", "kind": "verse", "repeat_of": None,
+                   "progression_of": None, "lines": [...]}, ...],
+     "newline": "\\n", "endings": None}
+
+Lines:
+    {"kind": "header", "text": "[Verse 1]"}
+    {"kind": "blank", "text": "  "}
+    {"kind": "chords", "parts": [[gap, token, chord or None], ...], "end": "  ", "over": lyric or None}
+    {"kind": "lyric", "text": "I [Am]love you", "chords": [[chord, column], ...]}
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from .chord_parser import CHORD_RE, INLINE_RE, TOKEN_STRIP, parse_chord, tokenize_line
+from .key_detection import NOTE_INDEX, detect_key
+
+SECTION_WORDS = ("intro", "verse", "pre-chorus", "prechorus", "chorus", "bridge", "outro", "solo",
+                 "interlude", "refrain", "hook", "instrumental", "coda", "ending", "tag", "break")
+
+_WORD = r"(?:" + "|".join(SECTION_WORDS) + r")\b"
+# Bare headers only take a number, a short parenthetical and a repeat count, so a lyric
+# starting with a section word ("Break my heart again") is not mistaken for one
+_TAIL = r"(?:\s*\d+[a-z]?)?(?:\s*\([^()]{0,24}\))?"
+
+# "[Verse 1]", "Chorus:", "(Bridge)", "PRE-CHORUS x2", "Verse 2 (acoustic)", "{start_of_chorus}", "{c: Verse}"
+SECTION_RE = re.compile(
+    r"^\s*(?:"
+    r"\{(?:c|comment|start_of_)?:?\s*(?P<chordpro>" + _WORD + r")[^{}]*\}"
+    r"|[\[(]\s*(?P<bracketed>" + _WORD + r")[^\[\](){}]{0,30}[\])]"
+    r"|(?P<labelled>" + _WORD + r")[^\[\](){}:]{0,20}:"
+    r"|(?P<bare>" + _WORD + r")" + _TAIL +
+    r")\s*(?:x\d+)?\s*$",
+    re.IGNORECASE,
+)
+
+PART_RE = re.compile(r"(\s*)(\S+)")
+
+SHARP_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+FLAT_NAMES = ["C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B"]
+
+# Tonics (pitch classes) of keys written with flats
+FLAT_MAJOR_KEYS = {5, 10, 3, 8, 1, 6}  # F Bb Eb Ab Db Gb
+FLAT_MINOR_KEYS = {2, 7, 0, 5, 10, 3}  # Dm Gm Cm Fm Bbm Ebm
+
+
+def _parse_line(line: str) -> Dict:
+    if not line.strip():
+        return {"kind": "blank", "text": line}
+    if SECTION_RE.match(line):
+        return {"kind": "header", "text": line}
+    is_chord_line, events = tokenize_line(line)
+    if is_chord_line:
+        parts = [[gap, token, parse_chord(token)] for gap, token in PART_RE.findall(line)]
+        end = line[len(line.rstrip()):]
+        return {"kind": "chords", "parts": parts, "end": end, "over": None}
+    return {"kind": "lyric", "text": line, "chords": [[chord, column] for chord, column in events]}
+
+
+def _section(name: Optional[str], kind: str) -> Dict:
+    return {"name": name, "kind": kind, "repeat_of": None, "progression_of": None, "lines": []}
+
+
+def parse_song(text: str) -> Dict:
+    """Build the structured model of a chord sheet (see module docstring)"""
+    raw = text.splitlines(keepends=True)
+    bodies = [line.splitlines()[0] for line in raw]
+    endings = [line[len(body):] for line, body in zip(raw, bodies)]
+    newline = max(set(endings) - {""}, key=endings.count, default="\n")
+    # Per-line endings are only kept when the sheet mixes them (or lacks a final newline)
+    uniform = all(e == newline for e in endings[:-1]) and endings[-1:] in ([newline], [])
+    trailing = endings[-1] if endings else ""
+
+    sections = [_section(None, "untitled")]
+    counters: Dict[str, int] = {}
+    for body in bodies:
+        line = _parse_line(body)
+        if line["kind"] == "header":
+            match = SECTION_RE.match(body)
+            kind = match.group(match.lastgroup).lower().replace("prechorus", "pre-chorus")
+            counters[kind] = counters.get(kind, 0) + 1
+            sections.append(_section(kind.title(), kind))
+        sections[-1]["lines"].append(line)
+
+    # Chord lines are aligned over the lyric line that follows them
+    for section in sections:
+        lines = section["lines"]
+        for i, line in enumerate(lines[:-1]):
+            if line["kind"] == "chords" and lines[i + 1]["kind"] == "lyric":
+                line["over"] = i + 1
+
+    if not sections[0]["lines"]:
+        sections.pop(0)
+    _number_sections(sections, counters)
+    _mark_repeats(sections)
+    return {
+        "sections": sections,
+        "newline": newline,
+        "endings": None if uniform else endings,
+        "final_newline": bool(trailing) if uniform else None,
+    }
+
+
+def _number_sections(sections: List[Dict], counters: Dict[str, int]):
+    """"Verse", "Verse" -> "Verse 1", "Verse 2" when a kind occurs more than once"""
+    seen: Dict[str, int] = {}
+    for section in sections:
+        kind = section["kind"]
+        if kind == "untitled":
+            section["name"] = "Intro" if len(sections) > 1 else "Song"
+            continue
+        seen[kind] = seen.get(kind, 0) + 1
+        if counters.get(kind, 0) > 1:
+            section["name"] = f"{section['name']} {seen[kind]}"
+
+
+def section_chords(section: Dict) -> List[str]:
+    """Chord names of a section in reading order"""
+    chords = []
+    for line in section["lines"]:
+        if line["kind"] == "chords":
+            chords.extend(part[2] for part in line["parts"] if part[2])
+        elif line["kind"] == "lyric":
+            chords.extend(chord for chord, _ in line["chords"])
+    return chords
+
+
+def _mark_repeats(sections: List[Dict]):
+    """Point each section at the first earlier one with identical content or chords"""
+    by_content, by_chords = {}, {}
+    for i, section in enumerate(sections):
+        body = tuple(_render_line(line) for line in section["lines"] if line["kind"] not in ("header", "blank"))
+        chords = tuple(section_chords(section))
+        if body and body in by_content:
+            section["repeat_of"] = by_content[body]
+        elif chords and chords in by_chords:
+            section["progression_of"] = by_chords[chords]
+        by_content.setdefault(body, i)
+        if chords:
+            by_chords.setdefault(chords, i)
+
+
+def song_chords(model: Dict) -> List[str]:
+    """Chord names of the whole song in reading order"""
+    return [chord for section in model["sections"] for chord in section_chords(section)]
+
+
+def _render_line(line: Dict) -> str:
+    if line["kind"] == "chords":
+        return "".join(gap + token for gap, token, _ in line["parts"]) + line["end"]
+    return line["text"]
+
+
+def render_song(model: Dict) -> str:
+    """Text of a model; render_song(parse_song(text)) == text"""
+    bodies = [_render_line(line) for section in model["sections"] for line in section["lines"]]
+    if model["endings"] is not None:
+        return "".join(body + ending for body, ending in zip(bodies, model["endings"]))
+    text = model["newline"].join(bodies)
+    return text + model["newline"] if bodies and model["final_newline"] else text
+
+
+def transpose_chord(chord: str, semitones: int, flats: bool = False) -> str:
+    """Transpose a chord token, keeping its spelling of the quality: ("Amin7/G", 2) -> "Bmin7/A" """
+    core = chord.strip(TOKEN_STRIP)
+    match = CHORD_RE.fullmatch(core)
+    if not match:
+        return chord
+    names = FLAT_NAMES if flats else SHARP_NAMES
+
+    def shift(note: str) -> str:
+        note = note.replace("♯", "#").replace("♭", "b")
+        return names[(NOTE_INDEX[note] + semitones) % 12] if note in NOTE_INDEX else note
+
+    new_core = shift(match.group("root")) + match.group("quality")
+    if match.group("bass"):
+        new_core += "/" + shift(match.group("bass"))
+    start = chord.index(core)
+    return chord[:start] + new_core + chord[start + len(core):]
+
+
+def _transpose_parts(parts: List[List], semitones: int, flats: bool) -> List[List]:
+    """Transpose chord tokens, taking up or giving back spaces so later chords keep their columns"""
+    result, drift = [], 0
+    for gap, token, chord in parts:
+        if drift and gap and not gap.strip(" "):
+            # Longer names eat into the next gap (keeping at least one space), shorter ones pad it
+            width = max(1, len(gap) - drift)
+            drift -= len(gap) - width
+            gap = " " * width
+        if chord:
+            new = transpose_chord(token, semitones, flats)
+            drift += len(new) - len(token)
+            token, chord = new, parse_chord(new)
+        result.append([gap, token, chord])
+    return result
+
+
+def transpose_song(model: Dict, semitones: int, flats: Optional[bool] = None) -> Dict:
+    """
+    Transposed copy of a model
+
+    Args:
+        flats: Spell with flats; by default chosen from the key the song moves to
+    """
+    semitones %= 12
+    if flats is None:
+        key = detect_key(song_chords(model))
+        tonic = (NOTE_INDEX[key["tonic"]] + semitones) % 12 if key else 0
+        flats = tonic in (FLAT_MAJOR_KEYS if not key or key["mode"] == "major" else FLAT_MINOR_KEYS)
+
+    sections = []
+    for section in model["sections"]:
+        lines = []
+        for line in section["lines"]:
+            if line["kind"] == "chords":
+                line = dict(line, parts=_transpose_parts(line["parts"], semitones, flats))
+            elif line["kind"] == "lyric" and line["chords"]:
+                text = INLINE_RE.sub(lambda m: "[" + transpose_chord(m.group(1), semitones, flats) + "]", line["text"])
+                line = dict(line, text=text, chords=[[chord, column] for chord, column in tokenize_line(text)[1]])
+            lines.append(line)
+        sections.append(dict(section, lines=lines))
+    return dict(model, sections=sections)
+
+
+def section_outline(model: Dict) -> List[str]:
+    """One line per section: "Chorus 2 (repeat of Chorus 1)", "Verse 2 (same chords as Verse 1)" """
+    sections = model["sections"]
+    outline = []
+    for section in sections:
+        label = section["name"]
+        if section["repeat_of"] is not None:
+            label += f" (repeat of {sections[section['repeat_of']]['name']})"
+        elif section["progression_of"] is not None:
+            label += f" (same chords as {sections[section['progression_of']]['name']})"
+        outline.append(label)
+    return outline
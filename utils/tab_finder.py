@@ -4,19 +4,105 @@ Handles searching and fetching guitar tabs from various sources
 """
 
 import requests
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional
+import copy
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .song_model import parse_song, render_song, transpose_song
+
+# Shared by every session; search results are dropped after TAB_CACHE_TTL_SECONDS
+TAB_CACHE_ENTRIES = 5000
+TAB_CACHE_TTL_SECONDS = float(os.getenv("TAB_CACHE_TTL_SECONDS", "3600"))
+
+
+class TabCache:
+    """
+    Thread-safe LRU cache with a time-to-live
+
+    Concurrent misses for the same key are loaded once: the first caller
+    loads, the others wait for its result. Values are copied in and out, so
+    callers may modify what they get back.
+    """
+
+    def __init__(self, max_entries: int = TAB_CACHE_ENTRIES, ttl_seconds: float = TAB_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared_loads": 0}
+
+    def _get(self, key: str):
+        # Call with the lock held; returns (found, value)
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Cached value for `key`, calling `loader` on a miss"""
+        while True:
+            with self._lock:
+                found, value = self._get(key)
+                if found:
+                    self.stats["hits"] += 1
+                    return copy.deepcopy(value)
+                event = self._loading.get(key)
+                leader = event is None
+                if leader:
+                    event = self._loading[key] = threading.Event()
+                    self.stats["misses"] += 1
+                else:
+                    self.stats["shared_loads"] += 1
+            if leader:
+                break
+            event.wait()
+            with self._lock:
+                found, value = self._get(key)
+                if found:
+                    return copy.deepcopy(value)
+            # The load failed; try it ourselves
+
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
 
 class TabFinder:
     """Main class for finding guitar tabs"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[TabCache] = None):
         self.sources = {
             "ultimate_guitar": "https://www.ultimate-guitar.com",
             "chordify": "https://www.chordify.net",
             "tab_provider": "https://www.tabnabber.com"
         }
-        self.cache = {}
+        self.cache = cache or TabCache()
     
     def search_tabs(self, query: str, source: str = "all") -> List[Dict]:
         """
@@ -34,21 +120,15 @@ class TabFinder:
         song_name = parts[0].strip() if len(parts) > 0 else query
         artist = parts[1].strip() if len(parts) > 1 else ""
         
-        results = []
-        
-        # Check cache first
-        cache_key = f"{song_name}_{artist}_{source}"
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
+        # Same search from any session (any case or spacing) shares one cache entry
+        cache_key = "search:" + json.dumps([" ".join(song_name.lower().split()),
+                                            " ".join(artist.lower().split()), source.lower()])
         try:
             # In production, would call actual APIs
-            results = self._mock_search(song_name, artist, source)
-            self.cache[cache_key] = results
+            return self.cache.get_or_load(cache_key, lambda: self._mock_search(song_name, artist, source))
         except Exception as e:
             print(f"Error searching tabs: {e}")
-        
-        return results
+            return []
     
     def _mock_search(self, song: str, artist: str, source: str) -> List[Dict]:
         """Mock search for demo purposes"""
@@ -84,6 +164,9 @@ class TabFinder:
     
     def get_tab_details(self, tab_id: int) -> Optional[Dict]:
         """Get full details of a specific tab"""
+        return self.cache.get_or_load(f"details:{tab_id}", lambda: self._fetch_tab_details(tab_id))
+    
+    def _fetch_tab_details(self, tab_id: int) -> Optional[Dict]:
         # Placeholder for fetching full tab content
         return {
             "id": tab_id,
@@ -96,8 +179,7 @@ class TabFinder:
     
     def transpose_tab(self, content: str, semitones: int) -> str:
         """Transpose a tab by given number of semitones"""
-        # Placeholder for transposition logic
-        return content
+        return render_song(transpose_song(parse_song(content), semitones))
     
     def get_recommendations(self, skill_level: str, genre: str = "rock") -> List[Dict]:
         """Get recommended tabs based on skill level"""
@@ -119,3 +201,17 @@ class TabFinder:
             ]
         }
         return recommendations.get(skill_level, [])
+
+
+_tab_finder = None
+_tab_finder_lock = threading.Lock()
+
+
+def get_tab_finder() -> TabFinder:
+    """Process-wide TabFinder; its cache is shared by every session"""
+    global _tab_finder
+    if _tab_finder is None:
+        with _tab_finder_lock:
+            if _tab_finder is None:
+                _tab_finder = TabFinder()
+    return _tab_finder
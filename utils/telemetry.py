@@ -0,0 +1,161 @@
+"""
+Telemetry Module
+Per-call LLM telemetry: latency, tokens, cache hits and estimated cost
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# USD per 1K tokens (prompt, completion)
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4-turbo": (0.01, 0.03),
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call (0 for unknown models)"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class CallTimer:
+    """Collects the measurements of one call; finished with Telemetry.record()"""
+
+    def __init__(self, path: str, model: Optional[str] = None, **tags):
+        self.path = path
+        self.model = model
+        self.tags = tags
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.error = None
+
+    def first_token(self):
+        """Mark the arrival of the first token (streaming calls)"""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def add_usage(self, usage):
+        """Add token counts from an OpenAI `response.usage` object"""
+        if usage is not None:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+
+class Telemetry:
+    """Thread-safe rolling window of call records with percentile aggregation"""
+
+    def __init__(self, window: int = 5000):
+        self.records = deque(maxlen=window)
+        self.totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def start(self, path: str, model: Optional[str] = None, **tags) -> CallTimer:
+        """
+        Start timing a call on the given path ("openai", "rule_based", "cache", ...)
+
+        Tags (e.g. route="chat") are stored with the record and can be used in summary()
+        """
+        return CallTimer(path, model, **tags)
+
+    def record(self, timer: CallTimer, **tags) -> Dict:
+        """Finish a call and store its record"""
+        end = time.perf_counter()
+        wall_ms = (end - timer.start) * 1000
+        ttft_ms = ((timer.first_token_at or end) - timer.start) * 1000
+        cost = estimate_cost(timer.model or "", timer.prompt_tokens, timer.completion_tokens)
+
+        record = {
+            "ts": time.time(),
+            "path": timer.path,
+            "model": timer.model,
+            "wall_ms": round(wall_ms, 3),
+            "ttft_ms": round(ttft_ms, 3),
+            "prompt_tokens": timer.prompt_tokens,
+            "completion_tokens": timer.completion_tokens,
+            "retries": timer.retries,
+            "cost_usd": cost,
+            "error": timer.error,
+        }
+        record.update(timer.tags)
+        record.update(tags)
+
+        with self._lock:
+            self.records.append(record)
+            self.totals["calls"] += 1
+            self.totals["prompt_tokens"] += timer.prompt_tokens
+            self.totals["completion_tokens"] += timer.completion_tokens
+            self.totals["cost_usd"] += cost
+            if timer.error:
+                self.totals["errors"] += 1
+        return record
+
+    def summary(self, group_by: str = "path") -> Dict[str, Dict]:
+        """
+        Rolling-window aggregates per group
+
+        Returns:
+            {group: {"calls", "share", "wall_ms": {p50..p99}, "ttft_ms": {...},
+                     "prompt_tokens", "completion_tokens", "cost_usd", "errors", "retries"}}
+        """
+        with self._lock:
+            records = list(self.records)
+
+        groups = {}
+        for record in records:
+            groups.setdefault(str(record.get(group_by)), []).append(record)
+
+        summary = {}
+        for name, items in sorted(groups.items()):
+            wall = np.array([r["wall_ms"] for r in items])
+            ttft = np.array([r["ttft_ms"] for r in items])
+            summary[name] = {
+                "calls": len(items),
+                "share": len(items) / len(records),
+                "wall_ms": dict(zip((f"p{p}" for p in PERCENTILES), np.round(np.percentile(wall, PERCENTILES), 1).tolist())),
+                "ttft_ms": dict(zip((f"p{p}" for p in PERCENTILES), np.round(np.percentile(ttft, PERCENTILES), 1).tolist())),
+                "prompt_tokens": sum(r["prompt_tokens"] for r in items),
+                "completion_tokens": sum(r["completion_tokens"] for r in items),
+                "cost_usd": round(sum(r["cost_usd"] for r in items), 6),
+                "errors": sum(1 for r in items if r["error"]),
+                "retries": sum(r["retries"] for r in items),
+            }
+        return summary
+
+    def export(self) -> str:
+        """Machine-readable JSON export of totals, aggregates and raw records"""
+        with self._lock:
+            records = list(self.records)
+            totals = dict(self.totals)
+        return json.dumps({
+            "exported_at": time.time(),
+            "totals": totals,
+            "by_path": self.summary("path"),
+            "records": records,
+        }, indent=2)
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self.records)[-limit:]
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+            for key in self.totals:
+                self.totals[key] = 0.0 if key == "cost_usd" else 0
+
+
+# Process-wide instance shared by every session
+telemetry = Telemetry()
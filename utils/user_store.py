@@ -0,0 +1,313 @@
+"""
+User Store Module
+Durable per-user data (saved tabs, library, songs, settings) in SQLite
+(WAL), written behind the pages by a background thread
+
+Collections are stored one item per row, so a page mutation writes only the
+item it changed. Writes are coalesced per item in memory and committed in
+batches; loads see writes that have not reached the database yet.
+"""
+
+import atexit
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".guitar_tab_finder", "user_data.db")
+
+# Pending writes are committed every FLUSH_INTERVAL seconds, or sooner once this many are queued
+FLUSH_INTERVAL = 0.5
+FLUSH_BATCH = 2000
+
+READER_CONNECTIONS = 8
+
+LIBRARY_SHELVES = ("favorites", "learning", "mastered")
+
+USER_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# There are no accounts yet: whoever has the ?user= link has the data
+LINK_WARNING = ("🔗 Your saved tabs, library, songs and settings are tied to this page's link (?user=...). "
+                "Anyone with the link can open and change them - bookmark it, but don't share it.")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    user_id TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (user_id, collection, item_key)
+);
+CREATE INDEX IF NOT EXISTS items_by_position ON items (user_id, collection, position);
+"""
+
+# Pending operation per (user_id, collection, item_key): (position, JSON value) or None for a delete
+_Op = Optional[Tuple[int, str]]
+
+
+class UserStore:
+    """
+    SQLite-backed store of per-user collections with a write-behind buffer
+
+    One writer thread owns the write connection and commits each batch in a
+    single transaction; reads use a small pool of connections, which WAL
+    lets run alongside the writer.
+    """
+
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._writer = self._connect()
+        self._writer.executescript(_SCHEMA)
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=READER_CONNECTIONS)
+
+        self._pending: Dict[Tuple[str, str, str], _Op] = {}
+        self._inflight: Dict[Tuple[str, str, str], _Op] = {}
+        self._cond = threading.Condition()
+        self._last_position = 0
+        self._closed = False
+        self.stats = {"writes": 0, "coalesced": 0, "flushes": 0, "rows_written": 0, "errors": 0}
+
+        self._thread = threading.Thread(target=self._flush_loop, name="user-store-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    # Writes
+
+    def _next_position(self) -> int:
+        # Insertion order across restarts (call with the lock held)
+        self._last_position = max(time.time_ns(), self._last_position + 1)
+        return self._last_position
+
+    def _queue(self, key: Tuple[str, str, str], data: Optional[str]):
+        with self._cond:
+            self.stats["writes"] += 1
+            previous = self._pending.get(key, self._inflight.get(key))
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+            if data is None:
+                self._pending[key] = None
+            else:
+                # An item replaced before it reached the database keeps its place
+                position = previous[0] if previous else self._next_position()
+                self._pending[key] = (position, data)
+            if len(self._pending) in (1, FLUSH_BATCH):
+                self._cond.notify()
+
+    def put(self, user_id: str, collection: str, item_key: str, value: Any):
+        """Add or replace one item; new items go to the end of the collection"""
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        self._queue((user_id, collection, str(item_key)), data)
+
+    def delete(self, user_id: str, collection: str, item_key: str):
+        """Remove one item"""
+        self._queue((user_id, collection, str(item_key)), None)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                if len(self._pending) < FLUSH_BATCH and not self._closed:
+                    # Let writes from the same rerun (and other sessions) coalesce into one transaction
+                    self._cond.wait(self.flush_interval)
+                self._inflight, self._pending = self._pending, {}
+            self._write(self._inflight)
+            with self._cond:
+                self._inflight = {}
+                self._cond.notify_all()
+
+    def _write(self, batch: Dict[Tuple[str, str, str], _Op]):
+        now = time.time()
+        puts = [(u, c, k, op[0], op[1], now) for (u, c, k), op in batch.items() if op is not None]
+        deletes = [key for key, op in batch.items() if op is None]
+        try:
+            with self._writer:
+                self._writer.execute("BEGIN IMMEDIATE")
+                if deletes:
+                    self._writer.executemany(
+                        "DELETE FROM items WHERE user_id = ? AND collection = ? AND item_key = ?", deletes)
+                if puts:
+                    # Replacing an item keeps its place in the collection
+                    self._writer.executemany(
+                        "INSERT INTO items (user_id, collection, item_key, position, value, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (user_id, collection, item_key) "
+                        "DO UPDATE SET value = excluded.value, updated = excluded.updated", puts)
+            with self._cond:
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += len(batch)
+        except sqlite3.Error as e:
+            print(f"User store write error ({len(batch)} items will be retried): {e}")
+            with self._cond:
+                self.stats["errors"] += 1
+                # Writes queued since take precedence over the failed batch
+                for key, op in batch.items():
+                    self._pending.setdefault(key, op)
+            time.sleep(self.flush_interval)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything written so far is committed"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._pending or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, self.flush_interval))
+        return True
+
+    def has_pending(self, user_id: str) -> bool:
+        """True while some of a user's writes are not committed yet"""
+        with self._cond:
+            return any(key[0] == user_id for key in self._pending) or \
+                any(key[0] == user_id for key in self._inflight)
+
+    def close(self):
+        """Commit pending writes and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=10)
+
+    # Reads
+
+    def _rows(self, user_id: str, collection: str, start: Optional[str], end: Optional[str],
+              newest: Optional[int], values: bool = True) -> List[Tuple[str, int, str]]:
+        sql = ("SELECT item_key, position, " + ("value" if values else "'null'")
+               + " FROM items WHERE user_id = ? AND collection = ?")
+        params: List[Any] = [user_id, collection]
+        if start is not None:
+            sql += " AND item_key >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND item_key < ?"
+            params.append(end)
+        if newest is not None:
+            sql += " ORDER BY position DESC LIMIT ?"
+            params.append(newest)
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def items(self, user_id: str, collection: str, start: Optional[str] = None,
+              end: Optional[str] = None, newest: Optional[int] = None,
+              values: bool = True) -> List[Tuple[str, Any]]:
+        """
+        (item_key, value) pairs of a collection in insertion order, including unflushed writes
+
+        Args:
+            start, end: Only keys in [start, end)
+            newest: Only the last `newest` items
+            values: False to skip reading and decoding values (they come back as None)
+        """
+        def wanted(key: Tuple[str, str, str]) -> bool:
+            return (key[:2] == (user_id, collection) and (start is None or key[2] >= start)
+                    and (end is None or key[2] < end))
+
+        # Snapshot the buffer before reading, so a batch committed in between is still seen
+        with self._cond:
+            overlay = {k[2]: op for k, op in self._inflight.items() if wanted(k)}
+            overlay.update({k[2]: op for k, op in self._pending.items() if wanted(k)})
+        try:
+            found = {key: (position, data) for key, position, data in
+                     self._rows(user_id, collection, start, end, newest, values)}
+        except sqlite3.Error as e:
+            print(f"User store read error: {e}")
+            found = {}
+        for key, op in overlay.items():
+            if op is None:
+                found.pop(key, None)
+            elif key in found:
+                found[key] = (found[key][0], op[1])
+            else:
+                found[key] = op
+        ordered = sorted(found.items(), key=lambda item: item[1][0])
+        if newest is not None:
+            ordered = ordered[-newest:] if newest else []
+        if not values:
+            return [(key, None) for key, _ in ordered]
+        return [(key, json.loads(data)) for key, (_, data) in ordered]
+
+    def get(self, user_id: str, collection: str, item_key: str) -> Any:
+        """One item's value, or None if it does not exist"""
+        item_key = str(item_key)
+        found = self.items(user_id, collection, start=item_key, end=item_key + "\x00")
+        return found[0][1] if found else None
+
+    def keys(self, user_id: str, collection: str) -> List[str]:
+        """Item keys of a collection in insertion order, without reading the values"""
+        return [key for key, _ in self.items(user_id, collection, values=False)]
+
+    def load_list(self, user_id: str, collection: str) -> List[Any]:
+        """Values of a collection in insertion order"""
+        return [value for _, value in self.items(user_id, collection)]
+
+    def load_dict(self, user_id: str, collection: str) -> Dict[str, Any]:
+        """Collection as {item_key: value}"""
+        return dict(self.items(user_id, collection))
+
+    def load_library(self, user_id: str) -> Dict[str, List[str]]:
+        """My Library shelves ({"favorites": [...], "learning": [...], "mastered": [...]})"""
+        return {shelf: self.load_list(user_id, f"library/{shelf}") for shelf in LIBRARY_SHELVES}
+
+
+def session_user_id(session_state: MutableMapping, query_params: MutableMapping) -> str:
+    """
+    The browser session's user id, kept in the URL (?user=...) so a bookmarked
+    or reopened link finds the same data; new visitors get a fresh id
+
+    The id is the only credential, so pages show LINK_WARNING and keep chat
+    history out of the store.
+    """
+    user_id = session_state.get("user_id") or query_params.get("user")
+    if not user_id or not USER_ID_RE.match(user_id):
+        user_id = uuid.uuid4().hex
+    session_state["user_id"] = user_id
+    # Page navigation drops query parameters; put the id back on every page
+    if query_params.get("user") != user_id:
+        query_params["user"] = user_id
+    return user_id
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_user_store() -> UserStore:
+    """Process-wide store (database file from USER_STORE_PATH)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = UserStore(os.getenv("USER_STORE_PATH", DEFAULT_STORE_PATH))
+                atexit.register(_store.close)
+    return _store
@@ -0,0 +1,393 @@
+"""
+Voicings Module
+Fret-level chord shapes and a fingering-based difficulty model: every chord is
+scored from its easiest voicing (fret span, barre, fingers, position) once, and
+songs are scored as vectorized lookups into the precomputed table; chord changes
+are costed from a cached shape-to-shape transition matrix
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .chord_parser import split_chord
+from .key_detection import NOTE_INDEX
+
+MUTED = -1
+
+# Open-position shapes, low E to high e (-1 = muted); E and A chords come from the movable shapes at fret 0
+OPEN_SHAPES = {
+    "C": [-1, 3, 2, 0, 1, 0], "Cmaj7": [-1, 3, 2, 0, 0, 0], "C7": [-1, 3, 2, 3, 1, 0],
+    "Cadd9": [-1, 3, 2, 0, 3, 0], "C6": [-1, 3, 2, 2, 1, 0],
+    "D": [-1, -1, 0, 2, 3, 2], "Dm": [-1, -1, 0, 2, 3, 1], "D7": [-1, -1, 0, 2, 1, 2],
+    "Dmaj7": [-1, -1, 0, 2, 2, 2], "Dm7": [-1, -1, 0, 2, 1, 1], "Dsus2": [-1, -1, 0, 2, 3, 0],
+    "Dsus4": [-1, -1, 0, 2, 3, 3], "D6": [-1, -1, 0, 2, 0, 2], "Dadd9": [-1, -1, 0, 2, 3, 0],
+    "G": [3, 2, 0, 0, 0, 3], "G7": [3, 2, 0, 0, 0, 1], "Gmaj7": [3, 2, 0, 0, 0, 2],
+    "G6": [3, 2, 0, 0, 0, 0], "Gsus4": [3, 3, 0, 0, 1, 3], "Gadd9": [3, 0, 0, 2, 0, 3],
+    "B7": [-1, 2, 1, 2, 0, 2], "Fmaj7": [-1, -1, 3, 2, 1, 0], "Em6": [0, 2, 2, 0, 2, 0],
+}
+
+# Movable shapes as fret offsets from the root fret (None = muted)
+E_SHAPES = {  # root on the low E string
+    "": [0, 2, 2, 1, 0, 0], "m": [0, 2, 2, 0, 0, 0], "7": [0, 2, 0, 1, 0, 0],
+    "m7": [0, 2, 0, 0, 0, 0], "maj7": [0, None, 1, 1, 0, None], "sus4": [0, 2, 2, 2, 0, 0],
+    "7sus4": [0, 2, 0, 2, 0, 0], "5": [0, 2, 2, None, None, None], "m7b5": [0, None, 0, 0, -1, None],
+}
+A_SHAPES = {  # root on the A string
+    "": [None, 0, 2, 2, 2, 0], "m": [None, 0, 2, 2, 1, 0], "7": [None, 0, 2, 0, 2, 0],
+    "m7": [None, 0, 2, 0, 1, 0], "maj7": [None, 0, 2, 1, 2, 0], "sus2": [None, 0, 2, 2, 0, 0],
+    "sus4": [None, 0, 2, 2, 3, 0], "7sus4": [None, 0, 2, 0, 3, 0], "6": [None, 0, 2, 2, 2, 2],
+    "m6": [None, 0, 2, 2, 1, 2], "9": [None, 0, -1, 0, 0, 0], "5": [None, 0, 2, 2, None, None],
+    "dim": [None, 0, 1, 2, 1, None], "dim7": [None, 0, 1, -1, 1, None],
+    "aug": [None, 0, -1, -1, -2, None], "m7b5": [None, 0, 1, 0, 1, None],
+}
+SHAPE_ROOT_STRINGS = ((E_SHAPES, NOTE_INDEX["E"]), (A_SHAPES, NOTE_INDEX["A"]))
+
+# Qualities without a shape of their own fall back to the nearest playable one, at a penalty
+QUALITY_FALLBACKS = [
+    ("maj", "maj7"), ("m7", "m7"), ("m9", "m7"), ("m11", "m7"), ("m13", "m7"), ("mMaj", "m"),
+    ("madd", "m"), ("m6", "m6"), ("m", "m"), ("add", ""), ("69", "6"), ("6/9", "6"),
+    ("sus2", "sus2"), ("2", "sus2"), ("sus", "sus4"), ("4", "sus4"),
+    ("dim", "dim"), ("aug", "aug"), ("7", "7"), ("9", "9"), ("11", "7"), ("13", "7"),
+]
+EXTENSION_PENALTY = 1.0
+SLASH_PENALTY = 0.75
+
+# Score = BASE + weighted features, clipped to 1-10
+BASE_SCORE = 1.0
+SPAN_WEIGHT = 0.5
+BARRE_WEIGHT = 2.5
+FINGER_WEIGHT = 0.35
+POSITION_WEIGHT = 0.1
+INNER_MUTE_WEIGHT = 0.5
+CLOSED_WEIGHT = 1.25
+
+# Transition cost = finger moves + lifts/placements + hand shift + barre change - anchored fingers
+MOVE_COST = 1.0
+MOVE_DISTANCE_COST = 0.25
+PLACE_COST = 0.5
+SHIFT_COST = 0.2
+BARRE_CHANGE_COST = 2.5
+ANCHOR_CREDIT = 0.25
+
+# Upper score bounds of the Beginner and Intermediate grades
+GRADE_LIMITS = (3.5, 6.0)
+GRADES = ("Beginner", "Intermediate", "Advanced")
+
+
+def fingering_features(frets: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Fingering features of many voicings at once
+
+    Args:
+        frets: (n, 6) fret numbers, low E to high e, -1 for muted strings
+
+    Returns:
+        {"span", "barre", "fingers", "position", "inner_mutes", "closed", "score"} arrays of length n
+    """
+    frets = np.asarray(frets, dtype=float).reshape(-1, 6)
+    fretted = frets > 0
+    n_fretted = fretted.sum(axis=1)
+    highest = np.where(fretted, frets, -np.inf).max(axis=1)
+    lowest = np.where(fretted, frets, np.inf).min(axis=1)
+    any_fretted = n_fretted > 0
+    span = np.where(any_fretted, highest - lowest, 0)
+    position = np.where(any_fretted, lowest, 0)
+
+    # More than four fretted strings means the index finger has to lie across several of them
+    barre = n_fretted > 4
+    above_barre = (fretted & (frets > lowest[:, None])).sum(axis=1)
+    fingers = np.where(barre, 1 + above_barre, n_fretted)
+
+    # Muted strings between sounding ones have to be damped by a fretting finger
+    sounding = frets >= 0
+    first = sounding.argmax(axis=1)
+    last = 5 - sounding[:, ::-1].argmax(axis=1)
+    columns = np.arange(6)
+    inside = (columns >= first[:, None]) & (columns <= last[:, None])
+    inner_mutes = (inside & ~sounding).sum(axis=1)
+
+    # Closed shapes (no open strings, no barre) stretch every finger up the neck
+    closed = any_fretted & ~barre & ~(frets == 0).any(axis=1)
+
+    score = (BASE_SCORE + SPAN_WEIGHT * span + BARRE_WEIGHT * barre
+             + FINGER_WEIGHT * np.maximum(0, fingers - 2) + POSITION_WEIGHT * position
+             + INNER_MUTE_WEIGHT * inner_mutes + CLOSED_WEIGHT * closed)
+    return {
+        "span": span.astype(int), "barre": barre, "fingers": fingers.astype(int),
+        "position": position.astype(int), "inner_mutes": inner_mutes.astype(int),
+        "closed": closed,
+        "score": np.clip(score, 1.0, 10.0),
+    }
+
+
+def transition_costs(frets: np.ndarray, barre: np.ndarray, position: np.ndarray) -> np.ndarray:
+    """
+    Pairwise cost of changing between voicings, computed for all pairs at once
+
+    Args:
+        frets: (n, 6) fret numbers, -1 for muted strings
+        barre, position: per-voicing features from fingering_features
+
+    Returns:
+        (n, n) matrix; [i, j] is the cost of going from voicing i to voicing j
+    """
+    frets = np.asarray(frets, dtype=float)
+    a, b = frets[:, None, :], frets[None, :, :]
+    fretted_a, fretted_b = a > 0, b > 0
+    both = fretted_a & fretted_b
+    anchored = (both & (a == b)).sum(axis=2)
+    moved = both & (a != b)
+    cost = (MOVE_COST * moved.sum(axis=2)
+            + MOVE_DISTANCE_COST * np.where(moved, np.abs(a - b), 0).sum(axis=2)
+            + PLACE_COST * (fretted_a ^ fretted_b).sum(axis=2)
+            + SHIFT_COST * np.abs(position[:, None] - position[None, :])
+            + BARRE_CHANGE_COST * (barre[:, None] != barre[None, :])
+            - ANCHOR_CREDIT * anchored)
+    cost = np.maximum(cost, 0.0)
+    np.fill_diagonal(cost, 0.0)
+    return cost
+
+
+def grade(score: float) -> str:
+    """Beginner / Intermediate / Advanced for a difficulty score"""
+    return GRADES[int(np.searchsorted(GRADE_LIMITS, score, side="right"))]
+
+
+def chord_voicings(root: str, quality: str) -> List[List[int]]:
+    """Every known voicing of a chord (open shape plus movable E- and A-shapes)"""
+    if root not in NOTE_INDEX:
+        return []
+    pitch = NOTE_INDEX[root]
+    voicings = []
+    open_shape = OPEN_SHAPES.get(root + quality)
+    if open_shape:
+        voicings.append(list(open_shape))
+    for shapes, string_pitch in SHAPE_ROOT_STRINGS:
+        offsets = shapes.get(quality)
+        if offsets is None:
+            continue
+        fret = (pitch - string_pitch) % 12
+        # Shapes reaching below their root fret move up an octave
+        if fret + min(o for o in offsets if o is not None) < 0:
+            fret += 12
+        voicings.append([MUTED if o is None else fret + o for o in offsets])
+    return voicings
+
+
+def base_quality(quality: str) -> Optional[str]:
+    """Nearest quality with a known shape ("m9" -> "m7", "add9" -> ""), None if unplayable"""
+    if quality in E_SHAPES or quality in A_SHAPES:
+        return quality
+    for prefix, fallback in QUALITY_FALLBACKS:
+        if quality.startswith(prefix):
+            return fallback
+    return None
+
+
+class VoicingTable:
+    """
+    Precomputed difficulty of every chord name
+
+    Every root x shape quality is scored up front; other names (extensions,
+    slash chords) are derived from their base chord on first lookup and
+    appended, so song scoring stays a pure array lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._rows: List[Dict] = []
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._transitions: Optional[np.ndarray] = None
+
+        names, voicings, owners = [], [], []
+        qualities = sorted(set(E_SHAPES) | set(A_SHAPES) | {split_chord(name)[1] for name in OPEN_SHAPES})
+        for root in NOTE_INDEX:
+            for quality in qualities:
+                shapes = chord_voicings(root, quality)
+                if shapes:
+                    names.append(root + quality)
+                    voicings.extend(shapes)
+                    owners.extend([len(names) - 1] * len(shapes))
+
+        features = fingering_features(np.array(voicings))
+        owners = np.array(owners)
+        for i, name in enumerate(names):
+            candidates = np.flatnonzero(owners == i)
+            best = candidates[np.argmin(features["score"][candidates])]
+            self._add(name, {
+                "frets": voicings[best],
+                **{key: values[best].item() for key, values in features.items()},
+            })
+
+    def _add(self, name: str, row: Dict) -> int:
+        row = dict(row, chord=name, score=round(float(row["score"]), 2))
+        # Derived chords share their base chord's shape (and its row in the transition matrix)
+        row.setdefault("shape", len(self._rows))
+        row["grade"] = grade(row["score"])
+        self._ids[name] = len(self._rows)
+        self._rows.append(row)
+        self._arrays = None
+        return self._ids[name]
+
+    def chord_id(self, chord: str) -> Optional[int]:
+        """Row of a normalized chord name, derived and added on first use (None if unplayable)"""
+        index = self._ids.get(chord)
+        if index is not None:
+            return index
+        root, quality, bass = split_chord(chord)
+        base = base_quality(quality)
+        base_id = self._ids.get(root + base) if base is not None else None
+        if base_id is None:
+            return None
+        penalty = (EXTENSION_PENALTY if base != quality else 0.0) + (SLASH_PENALTY if bass and bass != root else 0.0)
+        base_row = self._rows[base_id]
+        with self._lock:
+            if chord in self._ids:
+                return self._ids[chord]
+            return self._add(chord, dict(base_row, score=min(10.0, base_row["score"] + penalty)))
+
+    def chord(self, chord: str) -> Optional[Dict]:
+        """Difficulty record of one chord: frets, span, barre, fingers, position, score, grade"""
+        index = self.chord_id(chord)
+        return self._rows[index] if index is not None else None
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Column arrays over all rows (rebuilt only after new chords were added)"""
+        with self._lock:
+            # Built and read under the lock _add() takes, so the arrays cover every id handed out
+            arrays = self._arrays
+            if arrays is None or len(arrays["score"]) != len(self._rows):
+                arrays = self._arrays = {
+                    "score": np.array([r["score"] for r in self._rows]),
+                    "barre": np.array([r["barre"] for r in self._rows]),
+                    "shape": np.array([r["shape"] for r in self._rows]),
+                }
+            return arrays
+
+    def score_songs(self, songs: Sequence[Sequence[str]]) -> List[Optional[Dict]]:
+        """
+        Difficulty of many songs in one pass
+
+        Chord names become row ids, then per-song reductions run over one flat
+        array. A song's score mixes its hardest chord and its average chord.
+
+        Returns:
+            One {"score", "grade", "hardest", "mean", "barre_chords"} dict per song,
+            None for songs without playable chords
+        """
+        ids, lengths = [], []
+        known = self._ids.get
+        for chords in songs:
+            song_ids = [i for c in chords if (i := known(c)) is not None or (i := self.chord_id(c)) is not None]
+            ids.extend(song_ids)
+            lengths.append(len(song_ids))
+        if not ids:
+            return [None] * len(songs)
+
+        arrays = self.arrays()
+        ids = np.array(ids)
+        lengths = np.array(lengths)
+        scores = arrays["score"][ids]
+        barre = arrays["barre"][ids].astype(int)
+
+        nonempty = lengths > 0
+        starts = (np.cumsum(lengths) - lengths)[nonempty]
+        hardest = np.maximum.reduceat(scores, starts)
+        mean = np.add.reduceat(scores, starts) / lengths[nonempty]
+        barre_chords = np.add.reduceat(barre, starts)
+        song_scores = 0.5 * hardest + 0.5 * mean
+
+        results: List[Optional[Dict]] = [None] * len(songs)
+        for out, song in enumerate(np.flatnonzero(nonempty)):
+            score = round(float(song_scores[out]), 2)
+            results[song] = {
+                "score": score,
+                "grade": grade(score),
+                "hardest": round(float(hardest[out]), 2),
+                "mean": round(float(mean[out]), 2),
+                "barre_chords": int(barre_chords[out]),
+            }
+        return results
+
+
+    def transition_matrix(self) -> np.ndarray:
+        """Cost of every shape-to-shape change (computed once, then cached)"""
+        matrix = self._transitions
+        if matrix is None:
+            with self._lock:
+                if self._transitions is None:
+                    shapes = [r for r in self._rows if r["shape"] == self._ids[r["chord"]]]
+                    self._transitions = transition_costs(
+                        np.array([r["frets"] for r in shapes]),
+                        np.array([r["barre"] for r in shapes]),
+                        np.array([r["position"] for r in shapes]),
+                    )
+                matrix = self._transitions
+        return matrix
+
+    def transition_cost(self, a: str, b: str) -> Optional[float]:
+        """Cost of changing from chord a to chord b (None if either is unplayable)"""
+        ia, ib = self.chord_id(a), self.chord_id(b)
+        if ia is None or ib is None:
+            return None
+        return float(self.transition_matrix()[self._rows[ia]["shape"], self._rows[ib]["shape"]])
+
+    def hardest_transitions(self, changes: Dict[Tuple[str, str], int], limit: int = 3) -> List[Dict]:
+        """
+        Chord changes of a song ranked by cost x occurrences
+
+        Args:
+            changes: {(from, to): count}, e.g. chord_parser.transitions(sequence)
+
+        Returns:
+            [{"from", "to", "count", "cost", "weighted"}, ...], hardest first
+        """
+        pairs = [(a, b, n, self.chord_id(a), self.chord_id(b)) for (a, b), n in sorted(changes.items())]
+        pairs = [p for p in pairs if p[3] is not None and p[4] is not None]
+        if not pairs:
+            return []
+        shape = self.arrays()["shape"]
+        matrix = self.transition_matrix()
+        costs = matrix[shape[[p[3] for p in pairs]], shape[[p[4] for p in pairs]]]
+        weighted = costs * np.array([p[2] for p in pairs])
+        order = np.argsort(-weighted, kind="stable")[:limit]
+        return [{"from": pairs[i][0], "to": pairs[i][1], "count": pairs[i][2],
+                 "cost": round(float(costs[i]), 2), "weighted": round(float(weighted[i]), 2)}
+                for i in order]
+
+
+_voicing_table = None
+_voicing_table_lock = threading.Lock()
+
+
+def get_voicing_table() -> VoicingTable:
+    """Process-wide voicing table, built on first use"""
+    global _voicing_table
+    if _voicing_table is None:
+        with _voicing_table_lock:
+            if _voicing_table is None:
+                _voicing_table = VoicingTable()
+    return _voicing_table
+
+
+def chord_difficulty(chord: str) -> Optional[Dict]:
+    """Difficulty record of a normalized chord name (see VoicingTable.chord)"""
+    return get_voicing_table().chord(chord)
+
+
+def score_songs(songs: Sequence[Sequence[str]]) -> List[Optional[Dict]]:
+    """Difficulty of many songs (see VoicingTable.score_songs)"""
+    return get_voicing_table().score_songs(songs)
+
+
+def transition_cost(a: str, b: str) -> Optional[float]:
+    """Cost of changing from chord a to chord b (see VoicingTable.transition_cost)"""
+    return get_voicing_table().transition_cost(a, b)
+
+
+def hardest_transitions(changes: Dict[Tuple[str, str], int], limit: int = 3) -> List[Dict]:
+    """Chord changes ranked by cost x occurrences (see VoicingTable.hardest_transitions)"""
+    return get_voicing_table().hardest_transitions(changes, limit)